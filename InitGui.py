@@ -1,7 +1,9 @@
+import MachinekitStartup
+
 class MachinekitWorkbench(Workbench):
     '''Registration and loading of the Machinekit workbench'''
-    import machinekit
-    Icon = machinekit.FileResource('machinekiticon.svg')
+    import MachinekitResources
+    Icon = MachinekitResources.FileResource('machinekiticon.svg')
     MenuText = "Machinekit"
     ToolTip = "Workbench to interact with machinkit controlling a CNC"
 
@@ -22,8 +24,10 @@ class MachinekitWorkbench(Workbench):
         MachinekitCommands.Deactivated()
 
 Gui.addWorkbench(MachinekitWorkbench)
+MachinekitStartup.mark('workbench registered')
 
 import MachinekitPreferences
 if MachinekitPreferences.startOnLoad():
     import MachinekitCommands
     MachinekitCommands.Activated()
+    MachinekitStartup.mark('commands activated')
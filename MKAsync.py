@@ -0,0 +1,218 @@
+# asyncio based engine to interact with MK instances without Qt.
+#
+# This is an alternative to the I/O thread used by the workbench (see machinekit.py) for
+# headless scripts which monitor one or more MK instances from a single process. Every
+# service of every MK instance is served by its own coroutine and all of them share the
+# same event loop - there is no timer and no thread per machine.
+#
+# Status changes can be awaited:
+#
+#   async def monitor(instance):
+#       engine = MKAsyncEngine()
+#       mk = engine.add(instance)
+#       async for service, updated in mk.changes():
+#           print(mk['status.motion.position.actual'])
+#
+# The instance is anything providing the MachinekitInstance interface, typically one
+# discovered by MachinekitInstance.ServiceMonitor.
+#
+# The heartbeat of each service is supervised the same way the I/O thread does it (see
+# machinekit.Machinekit._superviseLocked), a stale service gets its socket replaced with
+# backoff until MK responds again.
+
+import asyncio
+import machinekit
+import machinetalk.protobuf.message_pb2 as MESSAGE
+import machinetalk.protobuf.types_pb2 as TYPES
+import time
+import traceback
+import zmq
+import zmq.asyncio
+
+from MKLog              import PathLog
+from machinekit         import _MKServiceRegister
+
+class MKAsyncMachinekit(object):
+    '''Qt free representation of a MK instance driven by MKAsyncEngine.
+    Provides the same hierarchical access to all services as machinekit.Machinekit.'''
+
+    HousekeepingInterval = 0.5
+    ReceiveBatch = 100 # max number of messages processed per socket in one go
+
+    def __init__(self, engine, instance):
+        self.engine = engine
+        self.instance = instance
+        self.service = {}
+        self.task = {}
+        self.listener = []
+        self.nam = None
+        self.heartbeatState = {}
+        for service in _MKServiceRegister:
+            self.service[service] = None
+
+    def __getitem__(self, index):
+        name, _, path = index.partition('.')
+        service = self.service.get(name)
+        if service:
+            if path:
+                return service.get(path)
+            return service
+        return None
+
+    name = machinekit.Machinekit.name
+
+    def isValid(self):
+        '''Return True if the basic status and command services are available.'''
+        return not (self['status'] is None or not self['status'].isValid() or self['command'] is None)
+
+    def changed(self, service, msg):
+        '''Callback invoked by the framework when one of the services received an update.'''
+        for queue in self.listener:
+            queue.put_nowait((service, msg))
+
+    async def changes(self):
+        '''changes() ... asynchronous iterator over all (service, msg) updates of the receiver.'''
+        queue = asyncio.Queue()
+        self.listener.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.listener.remove(queue)
+
+    async def waitUntil(self, condition, timeout=None):
+        '''waitUntil(condition, timeout=None) ... wait until condition() returns True.
+        Raises asyncio.TimeoutError if that doesn't happen within timeout seconds.'''
+        async def wait():
+            async for service, msg in self.changes():
+                if condition():
+                    return
+        if not condition():
+            await asyncio.wait_for(wait(), timeout)
+
+    async def _receive(self, name, service):
+        '''Coroutine processing all messages received by the given service. Everything pending
+        on the socket is handed to the service as a single batch.'''
+        while True:
+            msgs = [await service.socket.recv_multipart()]
+            try:
+                while len(msgs) < self.ReceiveBatch:
+                    msgs.append(await service.socket.recv_multipart(zmq.NOBLOCK))
+            except zmq.Again:
+                pass
+            containers = []
+            now = time.monotonic()
+            for msg in msgs:
+                rx = MESSAGE.Container()
+                try:
+                    rx.ParseFromString(msg[-1])
+                except Exception as e:
+                    PathLog.error("%s.%s exception: %s" % (self.name(), name, e))
+                    continue
+                service.heartbeatReceived(rx, now)
+                # pings only feed the heartbeat
+                if rx.type != TYPES.MT_PING:
+                    containers.append(rx)
+            try:
+                service.processBatch(containers)
+            except Exception:
+                traceback.print_exc()
+
+    def _addService(self, name, endpoint):
+        service = _MKServiceRegister[name](self.engine.context, name, endpoint.properties)
+        service.engine = self.engine
+        service.attach(self)
+        self.service[name] = service
+        self.task[name] = asyncio.ensure_future(self._receive(name, service))
+
+    def _supervise(self, name, service, now):
+        '''Internal - checks the heartbeat of the given service and reconnects it if it went stale.'''
+        heartbeat = service.heartbeat
+        if heartbeat.pingDue(now):
+            service.sendPing()
+        state = heartbeat.check(now)
+        if self.heartbeatState.get(name, heartbeat.Unknown) != state:
+            self.heartbeatState[name] = state
+            if state == heartbeat.Stale:
+                PathLog.warning("%s.%s is stale" % (self.name(), name))
+        if heartbeat.reconnectDue(now):
+            PathLog.info("Reconnecting %s.%s (%d)" % (self.name(), name, heartbeat.reconnects + 1))
+            self.task.pop(name).cancel()
+            service.reconnect(self.engine.context)
+            self.task[name] = asyncio.ensure_future(self._receive(name, service))
+            heartbeat.reconnected(now)
+
+    def _removeService(self, name):
+        service = self.service[name]
+        self.task.pop(name).cancel()
+        self.heartbeatState.pop(name, None)
+        service.detach(self)
+        service.socket.close(linger=0)
+        self.service[name] = None
+        if name == 'status':
+            for tn in service.topicNames():
+                self.changed(service[tn], None)
+
+    def _updateServices(self):
+        for name in self.service:
+            ep = self.instance.endpointFor(name)
+            service = self.service[name]
+            if service and (ep is None or ep.dsn != service.dsn):
+                self._removeService(name)
+                service = None
+            if service is None and not ep is None:
+                self._addService(name, ep)
+
+    async def run(self):
+        '''Coroutine tracking the receiver's services and doing all periodic housekeeping.'''
+        try:
+            while True:
+                self._updateServices()
+                now = time.monotonic()
+                for name, service in self.service.items():
+                    if service:
+                        service.ping()
+                        self._supervise(name, service, now)
+                await asyncio.sleep(self.HousekeepingInterval)
+        finally:
+            for name in [name for name in self.service if self.service[name]]:
+                self._removeService(name)
+
+class MKAsyncEngine(object):
+    '''Engine owning all sockets of the MK instances added to it. All MK instances are served
+    by the given event loop, which defaults to the running loop the engine is created in.'''
+
+    def __init__(self, loop=None):
+        self.context = zmq.asyncio.Context()
+        self.loop = loop if loop else asyncio.get_running_loop()
+        self.mk = {}
+
+    def add(self, instance):
+        '''add(instance) ... start serving the given MachinekitInstance and return its MKAsyncMachinekit.'''
+        mk = self.mk.get(instance.uuid)
+        if mk is None:
+            mk = MKAsyncMachinekit(self, instance)
+            mk.runner = asyncio.ensure_future(mk.run(), loop=self.loop)
+            self.mk[instance.uuid] = mk
+        return mk
+
+    def remove(self, instance):
+        '''remove(instance) ... stop serving the given MachinekitInstance.'''
+        mk = self.mk.pop(instance.uuid, None)
+        if mk:
+            mk.runner.cancel()
+
+    def instances(self):
+        '''Return a list of all MKAsyncMachinekit instances served by the receiver.'''
+        return list(self.mk.values())
+
+    def send(self, socket, buf):
+        '''send(socket, buf) ... send buf through socket from the engine's event loop.'''
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running == self.loop:
+            socket.send(buf)
+        else:
+            self.loop.call_soon_threadsafe(socket.send, buf)
@@ -0,0 +1,340 @@
+# Throughput benchmarks for the status processing hot path.
+#
+# A corpus of status containers is fed through the different stages of the status
+# processing and the cost of each stage is reported per topic:
+#   parse      ... MESSAGE.Container.ParseFromString
+#   handler    ... MKServiceStatusHandler*.processIncremental - the merge itself
+#   process    ... MKServiceStatus.process - dispatch, merge and observer notification
+#   batch      ... MKServiceStatus.processBatch - as done by the I/O thread, 10 messages of a topic per batch
+#   attr       ... the paths the docks look up, resolved the way __getitem__ used to (see legacyGetitem)
+#   getitem    ... Machinekit.__getitem__ for the same paths, using compiled accessors
+#   bulk       ... Machinekit.get for all of those paths in a single call
+#
+# The corpus is generated by MKSimulator with the tool moving on a circle, which is what
+# a running job looks like: mostly motion updates with the occasional io, task and
+# interp update. Alternatively a corpus can be saved to and loaded from a file, or taken
+# from the status messages of a MK recording.
+#
+# For each stage the report shows msg/s, µs/msg and the memory allocated per message:
+#   B/msg      ... peak memory allocated while processing a message, as reported by tracemalloc
+#   blk/msg    ... memory blocks still allocated after processing a message
+# Memory is measured in a separate pass because tracing slows everything down considerably.
+#
+#   python3 MKBenchmark.py --count 20000
+#   python3 MKBenchmark.py --json > before.json
+
+import argparse
+import json
+import machinetalk.protobuf.message_pb2 as MESSAGE
+import machinetalk.protobuf.types_pb2 as TYPES
+import struct
+import sys
+import time
+import tracemalloc
+import zmq
+
+import MKRecorder
+import MKSimulator
+import machinekit
+
+from MKServiceStatus import MKServiceStatus
+
+Topics = ['motion', 'config', 'io', 'task', 'interp']
+
+Paths = [
+        'status.motion.position.actual',
+        'status.motion.line',
+        'status.motion.feed.rate',
+        'status.motion.state',
+        'status.config.velocity.linear.default',
+        'status.config.name',
+        'status.io.tool.nr',
+        'status.io.estop',
+        'status.task.task.mode',
+        'status.interp.state',
+        ]
+
+def legacyReturnAttribute(attr, path):
+    '''Copy of the original returnAttribute, the baseline of the attr stage.'''
+    if len(path) > 0:
+        rest = path[1:]
+        if type(attr) == dict:
+            return legacyReturnAttribute(attr[path[0]], rest)
+        if type(attr) == list:
+            index = int(path[0])
+            if hasattr(attr[0], 'index'):
+                for element in attr:
+                    if element.index == index:
+                        return legacyReturnAttribute(element, rest)
+                return attr[path[0]] # this will throw, we didn't find what we were looking for
+            else:
+                return legacyReturnAttribute(attr[index], rest)
+        return legacyReturnAttribute(attr.__getattribute__(path[0]), rest)
+    return attr
+
+def legacyGetitem(mk, index):
+    '''Resolve index the way Machinekit.__getitem__ originally did: split the path on every lookup
+    and walk it with the original returnAttribute.'''
+    path = index.split('.')
+    service = mk.service.get(path[0])
+    if service:
+        if len(path) > 1:
+            path = path[1:]
+            handler = service.handler[path[0]]
+            if len(path) > 1:
+                if handler.valid:
+                    return legacyReturnAttribute(handler.__getattribute__(path[1]), path[2:])
+                return None
+            return handler
+        return service
+    return None
+
+class _CorpusSimulator(MKSimulator.MKSimulator):
+    '''Simulator collecting the status updates instead of publishing them.'''
+
+    def __init__(self):
+        super().__init__(rate=100, circle=True)
+        self.corpus = []
+
+    def _publish(self, service, topic, container):
+        if service == 'status':
+            self.corpus.append((topic, container))
+
+def generateCorpus(count):
+    '''generateCorpus(count) ... return a list of (topic, serialized container), starting with
+    the full update of each topic followed by count incremental updates.'''
+    sim = _CorpusSimulator()
+    for topic in Topics:
+        sim._publish('status', topic, sim._status(topic, True))
+    while len(sim.corpus) < len(Topics) + count:
+        sim._move(0.01)
+        if sim.line % 25 == 0:
+            sim._statusIncremental('task', lambda c: setattr(c.emc_status_task, 'read_line', sim.line))
+        if sim.line % 50 == 0:
+            sim.feedrate = 2.0 - sim.feedrate
+            sim._statusIncremental('motion', lambda c: setattr(c.emc_status_motion, 'feedrate', sim.feedrate))
+        if sim.line % 100 == 0:
+            sim._statusIncremental('interp', lambda c: setattr(c.emc_status_interp, 'interp_state', sim.line % 200 // 100 + 1))
+        if sim.line % 500 == 0:
+            sim.pin['number'][3] = sim.line % 2
+            sim._statusIncremental('io', lambda c: setattr(c.emc_status_io, 'tool_in_spindle', sim.pin['number'][3]))
+    return [(topic, c.SerializeToString()) for topic, c in sim.corpus[:len(Topics) + count]]
+
+def saveCorpus(path, corpus):
+    '''saveCorpus(path, corpus) ... write corpus to path.'''
+    with open(path, 'wb') as f:
+        for topic, buf in corpus:
+            t = topic.encode()
+            f.write(struct.pack('<BI', len(t), len(buf)))
+            f.write(t)
+            f.write(buf)
+
+def loadCorpus(path):
+    '''loadCorpus(path) ... return the corpus stored in path, which can also be a MK recording (see MKRecorder).'''
+    corpus = []
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(MKRecorder.Magic):
+        for timestamp, service, frames in MKRecorder.MKRecording(path):
+            if service == 'status' and len(frames) > 1:
+                c = MESSAGE.Container()
+                c.ParseFromString(frames[-1])
+                if c.type != TYPES.MT_PING:
+                    corpus.append((frames[0].decode(), frames[-1]))
+        return corpus
+    i = 0
+    while i < len(data):
+        tlen, blen = struct.unpack_from('<BI', data, i)
+        i += 5
+        topic = data[i:i+tlen].decode()
+        i += tlen
+        corpus.append((topic, data[i:i+blen]))
+        i += blen
+    return corpus
+
+class _Observer(object):
+    '''Stand-in for Machinekit, counting the notifications.'''
+
+    def __init__(self):
+        self.notifications = 0
+
+    def changed(self, service, updated):
+        self.notifications += 1
+
+class _Instance(object):
+    uuid = b'benchmark'
+
+def statusService(context):
+    '''statusService(context) ... return a MKServiceStatus which isn't connected to anything.'''
+    properties = {b'service': b'status', b'uuid': b'benchmark', b'dsn': b'inproc://benchmark'}
+    service = MKServiceStatus(context, 'status', properties)
+    service.attach(_Observer())
+    return service
+
+def parse(corpus):
+    containers = []
+    for topic, buf in corpus:
+        c = MESSAGE.Container()
+        c.ParseFromString(buf)
+        containers.append((topic, c))
+    return containers
+
+class Benchmark(object):
+    '''Runs all stages over a corpus and collects the results per stage and topic.'''
+
+    def __init__(self, corpus, repeat=3, lookups=100000):
+        self.corpus = corpus
+        self.repeat = repeat
+        self.lookups = lookups
+        self.context = zmq.Context()
+        self.result = {}
+
+    def _record(self, stage, topic, count, seconds):
+        r = self.result.setdefault(stage, {}).setdefault(topic, {'count': 0, 'seconds': 0.0, 'blocks': 0.0, 'bytes': 0.0})
+        r['count'] += count
+        r['seconds'] += seconds
+
+    def _prepared(self):
+        '''Return a status service which processed all full updates and the remaining incremental updates.'''
+        service = statusService(self.context)
+        containers = parse(self.corpus)
+        full = [c for t, c in containers if c.type == TYPES.MT_EMCSTAT_FULL_UPDATE]
+        incremental = [(t, c) for t, c in containers if c.type != TYPES.MT_EMCSTAT_FULL_UPDATE]
+        for c in full:
+            service.process(c)
+        return service, incremental
+
+    def _perTopic(self, items, fn):
+        '''Time fn(item) for each (topic, item), accumulated per topic.'''
+        clock = time.perf_counter
+        times = {}
+        counts = {}
+        for topic, item in items:
+            begin = clock()
+            fn(item)
+            times[topic] = times.get(topic, 0.0) + clock() - begin
+            counts[topic] = counts.get(topic, 0) + 1
+        return times, counts
+
+    def _allocations(self, items, fn):
+        '''Measure the memory allocated by fn(item) for each (topic, item), returns a dictionary
+        of [peak bytes, retained blocks, count] per topic.'''
+        allocations = {}
+        blocks = sys.getallocatedblocks
+        tracemalloc.start()
+        try:
+            for topic, item in items:
+                current = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                before = blocks()
+                fn(item)
+                after = blocks()
+                a = allocations.setdefault(topic, [0, 0, 0])
+                a[0] += tracemalloc.get_traced_memory()[1] - current
+                a[1] += after - before
+                a[2] += 1
+        finally:
+            tracemalloc.stop()
+        return allocations
+
+    def _stage(self, stage, items, fn, sample):
+        for i in range(self.repeat):
+            times, counts = self._perTopic(items, fn)
+            for topic in times:
+                self._record(stage, topic, counts[topic], times[topic])
+        # tracing is expensive, only trace the first sample messages of each topic
+        traced = []
+        seen = {}
+        for topic, item in items:
+            if seen.get(topic, 0) < sample:
+                seen[topic] = seen.get(topic, 0) + 1
+                traced.append((topic, item))
+        for topic, (size, blocks, count) in self._allocations(traced, fn).items():
+            r = self.result[stage][topic]
+            r['bytes'] = size / count
+            r['blocks'] = blocks / count
+
+    def run(self, sample=50):
+        '''run(sample=50) ... run all stages, allocations are traced for the first sample messages of each topic.'''
+        def parseOne(buf):
+            MESSAGE.Container().ParseFromString(buf)
+        self._stage('parse', self.corpus, parseOne, sample)
+
+        service, incremental = self._prepared()
+        def handlerOne(container):
+            handler = service.handlerFor(container)
+            handler.processIncremental(handler.handlerObject(container))
+        self._stage('handler', incremental, handlerOne, sample)
+
+        service, incremental = self._prepared()
+        self._stage('process', incremental, service.process, sample)
+
+        service, incremental = self._prepared()
+        # the handlers are independent of each other, batching the messages of each topic
+        # separately keeps their order within the topic
+        pending = {}
+        batches = []
+        for topic, container in incremental:
+            batch = pending.setdefault(topic, [])
+            batch.append(container)
+            if len(batch) == 10:
+                batches.append((topic, batch))
+                pending[topic] = []
+        batches.extend([(topic, batch) for topic, batch in pending.items() if batch])
+        self._stage('batch', batches, service.processBatch, sample)
+        # report the batches per message
+        sizes = {}
+        for topic, batch in batches:
+            sizes.setdefault(topic, []).append(len(batch))
+        for topic, r in self.result['batch'].items():
+            size = sum(sizes[topic]) / len(sizes[topic])
+            r['count'] = round(r['count'] * size)
+            r['blocks'] /= size
+            r['bytes'] /= size
+
+        mk = machinekit.Machinekit(_Instance())
+        mk.service['status'] = service
+        lookups = [(path.split('.')[1], path) for path in Paths]
+        lookups = lookups * (self.lookups // len(lookups))
+        self._stage('attr', lookups, lambda index: legacyGetitem(mk, index), sample)
+        self._stage('getitem', lookups, mk.__getitem__, sample)
+        bulk = [('all', Paths)] * (self.lookups // len(Paths))
+        self._stage('bulk', bulk, lambda paths: mk.get(*paths), sample)
+        # report the lookups per path
+        for r in self.result['bulk'].values():
+            r['count'] *= len(Paths)
+            r['blocks'] /= len(Paths)
+            r['bytes'] /= len(Paths)
+
+        self.context.destroy(linger=0)
+        return self.result
+
+    def report(self, out=sys.stdout):
+        '''report(out=sys.stdout) ... print the results as a table.'''
+        out.write("%-8s %-8s %9s %12s %10s %10s %10s\n" % ('stage', 'topic', 'msgs', 'msg/s', 'us/msg', 'blk/msg', 'B/msg'))
+        for stage, topics in self.result.items():
+            for topic, r in sorted(topics.items()):
+                count = r['count']
+                seconds = r['seconds']
+                out.write("%-8s %-8s %9d %12.0f %10.2f %10.1f %10.0f\n" % (stage, topic, count, count / seconds if seconds else 0, 1e6 * seconds / count, r['blocks'], r['bytes']))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the status processing')
+    parser.add_argument('--count', help='number of incremental updates to generate', type=int, default=10000)
+    parser.add_argument('--repeat', help='number of passes over the corpus', type=int, default=3)
+    parser.add_argument('--sample', help='number of messages per topic traced for allocations', type=int, default=50)
+    parser.add_argument('--load', help='load the corpus from the given file')
+    parser.add_argument('--save', help='save the corpus to the given file')
+    parser.add_argument('--json', help='print the raw results as json', action='store_true')
+    args = parser.parse_args()
+
+    corpus = loadCorpus(args.load) if args.load else generateCorpus(args.count)
+    if args.save:
+        saveCorpus(args.save, corpus)
+    benchmark = Benchmark(corpus, args.repeat)
+    benchmark.run(args.sample)
+    if args.json:
+        json.dump(benchmark.result, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        benchmark.report()
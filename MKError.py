@@ -45,3 +45,14 @@ class MKErrorOperator(MKError):
     def origin(self):
         return 'OP'
 
+class MKErrorFollowing(MKError):
+    '''Class used for warnings of the following error monitor, see MKFollowingError.'''
+    def __init__(self, lvl, msg, index, line, ferror, limit):
+        super().__init__(lvl, msg)
+        self.index = index
+        self.line = line
+        self.ferror = ferror
+        self.limit = limit
+
+    def origin(self):
+        return 'FERROR'
@@ -0,0 +1,228 @@
+# Following error monitor of program runs.
+#
+# Once enabled (see Machinekit.enableFollowingErrorMonitor) the motion handler hands each
+# update it merged to the monitor. While the interpreter is running a program the monitor
+# keeps streaming statistics of the following error of each axis, sampled whenever an update
+# changed it:
+#   * a histogram with logarithmic bins, p50 and p99 are derived from it
+#   * the max following error and the program line (status.motion.line) it occured on
+#   * the max following error of each axis per program line
+# Each program run gets its own MKFollowingErrorRun, the last few are kept around.
+#
+# The limit of the following error depends on the velocity of the axis, the same way MK
+# computes it:
+#   limit = max(ferror.min, ferror.max * abs(velocity) / maxV)
+# with the values from status.config.axis. Whenever the following error of an axis crosses
+# fraction of that limit an MKErrorFollowing is notified through the error path, just like
+# the errors and messages MK sends. The axis has to drop below the threshold again before
+# it raises another notification.
+#
+#   monitor = mk.enableFollowingErrorMonitor(fraction=0.7)
+#   ...
+#   for index, stats in monitor.runs[-1].summary().items():
+#       print(index, stats['p50'], stats['p99'], stats['max'], stats['line'])
+
+import array
+import collections
+import math
+import time
+
+from MKError import MKErrorFollowing, MKErrorLevel
+
+from machinetalk.protobuf.status_pb2 import EMC_TASK_INTERP_IDLE
+
+class MKFerrorHistogram(object):
+    '''Streaming histogram of positive values with logarithmic bins, BinsPerDecade bins
+    per decade between 10**LogMin and 10**LogMax.'''
+
+    __slots__ = ('bins', 'count', 'max', 'sum')
+
+    LogMin        = -7
+    LogMax        = 1
+    BinsPerDecade = 20
+
+    def __init__(self):
+        self.bins = array.array('L', bytes(array.array('L').itemsize * self.size()))
+        self.count = 0
+        self.max = 0.0
+        self.sum = 0.0
+
+    @classmethod
+    def size(cls):
+        return (cls.LogMax - cls.LogMin) * cls.BinsPerDecade + 1
+
+    def add(self, value):
+        '''add(value) ... add value to the histogram.'''
+        if value > 0.0:
+            b = int((math.log10(value) - self.LogMin) * self.BinsPerDecade) + 1
+            if b < 1:
+                b = 1
+            elif b >= len(self.bins):
+                b = len(self.bins) - 1
+        else:
+            b = 0
+        self.bins[b] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        '''percentile(p) ... return the upper bound of the bin holding the p-th percentile, 0 <= p <= 100.'''
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100.0)
+        total = 0
+        for b, n in enumerate(self.bins):
+            total += n
+            if total >= rank and n:
+                if b == 0:
+                    return 0.0
+                return min(self.max, 10 ** (self.LogMin + b / self.BinsPerDecade))
+        return self.max
+
+    def mean(self):
+        '''Return the mean of all values added.'''
+        return self.sum / self.count if self.count else 0.0
+
+class MKFollowingErrorRun(object):
+    '''Following error statistics of a single program run.'''
+
+    def __init__(self, file=None):
+        self.file = file
+        self.started = time.time()
+        self.finished = None
+        self.histogram = {} # axis index -> MKFerrorHistogram
+        self.max = {}       # axis index -> (max following error, line)
+        self.lines = {}     # line -> array of the max following error of each axis, in order of index
+        self.index = []     # axis indices in the order of the arrays in lines
+        self.row = {}       # axis index -> row of the axis in the arrays
+        self.current = array.array('d') # last following error of each axis
+        self.alerts = []    # list of all MKErrorFollowing raised during the run
+
+    def add(self, line, axes):
+        '''add(line, axes) ... add the following errors of the given axes on line, the following errors
+        of all other axes didn't change.'''
+        for axis in axes:
+            if not axis.index in self.row:
+                self.row[axis.index] = len(self.index)
+                self.index.append(axis.index)
+                self.histogram[axis.index] = MKFerrorHistogram()
+                self.max[axis.index] = (0.0, line)
+                self.current.append(0.0)
+                for maxima in self.lines.values():
+                    maxima.append(0.0)
+        maxima = self.lines.get(line)
+        if maxima is None:
+            # an axis which isn't sampled on line keeps the following error it had before
+            maxima = self.lines.setdefault(line, array.array('d', self.current))
+        histogram = self.histogram
+        for axis in axes:
+            row = self.row[axis.index]
+            ferror = abs(axis.ferror_current)
+            self.current[row] = ferror
+            histogram[axis.index].add(ferror)
+            if ferror > maxima[row]:
+                maxima[row] = ferror
+                if ferror > self.max[axis.index][0]:
+                    self.max[axis.index] = (ferror, line)
+
+    def worstLines(self, index, count=10):
+        '''worstLines(index, count=10) ... return the list of (line, max following error) of the count lines
+        with the largest following error of the given axis.'''
+        row = self.row[index]
+        return sorted([(line, maxima[row]) for line, maxima in self.lines.items()], key=lambda lm: -lm[1])[:count]
+
+    def summary(self):
+        '''Return a dictionary with count, p50, p99, mean, max and the line of max for each axis index.'''
+        return {index: {
+            'count': h.count,
+            'p50':   h.percentile(50),
+            'p99':   h.percentile(99),
+            'mean':  h.mean(),
+            'max':   self.max[index][0],
+            'line':  self.max[index][1],
+            } for index, h in self.histogram.items()}
+
+class MKFollowingErrorMonitor(object):
+    '''Tracks the following errors of all axes during program runs and notifies alert with an
+    MKErrorFollowing if an axis crosses fraction of its following error limit.'''
+
+    Fraction = 0.8
+    Runs     = 10  # number of program runs kept
+
+    def __init__(self, status, alert=None, fraction=None):
+        self.status = status
+        self.alert = alert
+        self.fraction = fraction if fraction else self.Fraction
+        self.runs = collections.deque(maxlen=self.Runs)
+        self.run = None   # the MKFollowingErrorRun of the current program, if there is one
+        self.above = {}   # axis index -> True if the axis is above the threshold
+        self.axes = None  # status.motion.axis of the last sample, all axes are sampled if it was replaced
+        self.paths = {}   # axis index -> updated path of its following error
+
+    def limit(self, index, velocity):
+        '''limit(index, velocity) ... return the following error limit of the axis at the given velocity,
+        None if status.config is not available.'''
+        config = self.status.handler['config']
+        try:
+            axis = config.axis.element(index)
+        except (AttributeError, KeyError):
+            return None
+        if axis.maxV > 0:
+            return max(axis.ferror.min, axis.ferror.max * abs(velocity) / axis.maxV)
+        return axis.ferror.max
+
+    def isRunning(self):
+        '''Return True if the interpreter is running a program.'''
+        interp = self.status.handler['interp']
+        return getattr(interp, 'state', EMC_TASK_INTERP_IDLE) != EMC_TASK_INTERP_IDLE
+
+    def updatedAxes(self, motion, updated):
+        '''updatedAxes(motion, updated) ... return the list of axes whose following error is in updated.'''
+        if not motion.axis is self.axes:
+            # a full update, which replaced all axes
+            self.axes = motion.axis
+            return list(motion.axis)
+        axes = []
+        updated = set(updated)
+        for axis in motion.axis:
+            path = self.paths.get(axis.index)
+            if path is None:
+                path = self.paths.setdefault(axis.index, "axis.%d.ferror_current" % axis.index)
+            if path in updated:
+                axes.append(axis)
+        return axes
+
+    def sample(self, motion, updated):
+        '''sample(motion, updated) ... callback from the motion handler after it merged an update of the
+        given paths.'''
+        if not self.isRunning():
+            if self.run:
+                self.run.finished = time.time()
+                self.run = None
+            return
+        if self.run is None:
+            self.run = MKFollowingErrorRun(getattr(self.status.handler['task'], 'file', None))
+            self.runs.append(self.run)
+            self.above = {}
+            self.axes = None # sample all axes at the start of the run
+        line = motion.line
+        axes = self.updatedAxes(motion, updated)
+        self.run.add(line, axes)
+
+        fraction = self.fraction
+        for axis in axes:
+            ferror = abs(axis.ferror_current)
+            limit = self.limit(axis.index, axis.velocity)
+            if not limit:
+                continue
+            above = ferror > fraction * limit
+            if above != self.above.get(axis.index, False):
+                self.above[axis.index] = above
+                if above:
+                    msg = "axis %d following error %.6f exceeds %d%% of its limit %.6f on line %d" % (axis.index, ferror, round(100 * fraction), limit, line)
+                    error = MKErrorFollowing(MKErrorLevel.Text, [msg], axis.index, line, ferror, limit)
+                    self.run.alerts.append(error)
+                    if self.alert:
+                        self.alert(error)
@@ -0,0 +1,103 @@
+# Heartbeat supervision of a single MK service.
+#
+# machinetalk publishers announce their keepalive interval in the pparams of the full
+# update and the MT_PING messages they send whenever there's nothing else to publish. A
+# subscriber which doesn't receive anything for Liveness keepalive intervals has lost its
+# publisher. The command services (DEALER/ROUTER) on the other hand respond to MT_PING
+# with MT_PING_ACKNOWLEDGE, which gives us their round trip time.
+#
+# The heartbeat only keeps track of the state, it's up to the framework (see
+# Machinekit._superviseLocked) to send the pings and to reconnect stale services.
+
+class MKHeartbeat(object):
+    '''Tracks the liveness, jitter and round trip time of a service.'''
+
+    Unknown = 'unknown' # keepalive not known yet, service is not supervised
+    Alive   = 'alive'
+    Stale   = 'stale'   # nothing received for Liveness keepalive intervals
+
+    Liveness   = 2    # number of missed keepalive intervals before the service goes stale
+    BackoffMin = 0.5  # seconds between the first reconnect attempts
+    BackoffMax = 16.0 # upper limit for the exponential backoff of reconnect attempts
+
+    def __init__(self, now, pingInterval=None):
+        self.pingInterval = pingInterval
+        self.keepalive = pingInterval
+        self.state = self.Unknown
+        self.last = now
+        self.lastPing = None
+        self.jitter = 0.0
+        self.interval = None
+        self.pingSent = None
+        self.rtt = None
+        self.rttAvg = None
+        self.backoff = self.BackoffMin
+        self.nextReconnect = None
+        self.reconnects = 0
+
+    def received(self, now, ping=False, keepalive=None):
+        '''received(now, ping=False, keepalive=None) ... account for a message received at now.
+        keepalive is the interval in ms announced by the publisher, if any.'''
+        if keepalive:
+            self.keepalive = keepalive / 1000.0
+        if ping:
+            if not self.lastPing is None:
+                interval = now - self.lastPing
+                if not self.interval is None:
+                    # RFC 3550 style interarrival jitter
+                    self.jitter += (abs(interval - self.interval) - self.jitter) / 16
+                self.interval = interval
+            self.lastPing = now
+        self.last = now
+        if self.keepalive:
+            self.state = self.Alive
+            self.backoff = self.BackoffMin
+            self.nextReconnect = None
+
+    def acknowledged(self, now):
+        '''acknowledged(now) ... the remote end acknowledged the last ping.'''
+        if not self.pingSent is None:
+            self.rtt = now - self.pingSent
+            self.rttAvg = self.rtt if self.rttAvg is None else self.rttAvg + (self.rtt - self.rttAvg) / 8
+            self.pingSent = None
+        self.received(now)
+
+    def pingDue(self, now):
+        '''pingDue(now) ... return True if it's time to ping the remote end, and assume the ping is sent.'''
+        if self.pingInterval and (self.pingSent is None or (now - self.pingSent) >= self.pingInterval):
+            self.pingSent = now
+            return True
+        return False
+
+    def check(self, now):
+        '''check(now) ... update and return the state of the service.'''
+        if self.state == self.Alive and (now - self.last) > self.Liveness * self.keepalive:
+            self.state = self.Stale
+            self.nextReconnect = now
+        return self.state
+
+    def reconnectDue(self, now):
+        '''reconnectDue(now) ... return True if the service should be reconnected.'''
+        return self.state == self.Stale and not self.nextReconnect is None and now >= self.nextReconnect
+
+    def reconnected(self, now):
+        '''reconnected(now) ... the service was reconnected, schedule the next attempt with backoff.'''
+        self.reconnects += 1
+        self.nextReconnect = now + self.backoff
+        self.backoff = min(2 * self.backoff, self.BackoffMax)
+        self.pingSent = None
+        self.lastPing = None
+        self.interval = None
+
+    def asDict(self):
+        '''Return the receiver's state as dictionary, all durations in ms.'''
+        def ms(seconds):
+            return None if seconds is None else 1000 * seconds
+        return {
+                'state'      : self.state,
+                'keepalive'  : ms(self.keepalive),
+                'jitter'     : ms(self.jitter),
+                'rtt'        : ms(self.rtt),
+                'rttAvg'     : ms(self.rttAvg),
+                'reconnects' : self.reconnects,
+                }
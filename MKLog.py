@@ -0,0 +1,95 @@
+# Logging shim for the core classes.
+#
+# Inside FreeCAD all logging goes through Path's PathLog, just like the rest of the
+# workbench. Without FreeCAD a stand-in with the same interface is provided which
+# forwards everything to python's logging module, so the core classes can be used
+# by scripts and tools which don't have FreeCAD installed.
+#
+# Usage is the same as for PathLog:
+#   from MKLog import PathLog
+
+import logging
+import os
+import sys
+
+class _PathLog(object):
+    '''Stand-in for PathScripts.PathLog based on python's logging module.'''
+
+    class Level:
+        RESET   = -1
+        ERROR   = 0
+        WARNING = 1
+        NOTICE  = 2
+        INFO    = 3
+        DEBUG   = 4
+
+    _Level = {
+            Level.ERROR   : logging.ERROR,
+            Level.WARNING : logging.WARNING,
+            Level.NOTICE  : logging.INFO + 5,
+            Level.INFO    : logging.INFO,
+            Level.DEBUG   : logging.DEBUG,
+            }
+
+    _tracking = set()
+
+    @staticmethod
+    def _module(depth=2):
+        return os.path.splitext(os.path.basename(sys._getframe(depth).f_code.co_filename))[0]
+
+    @staticmethod
+    def thisModule():
+        '''Return the name of the calling module.'''
+        return _PathLog._module()
+
+    @staticmethod
+    def setLevel(level, module=None):
+        '''setLevel(level, module=None) ... set the log level of module, or the root logger if None.'''
+        logger = logging.getLogger(module)
+        if level == _PathLog.Level.RESET:
+            logger.setLevel(logging.NOTSET)
+        else:
+            logger.setLevel(_PathLog._Level[level])
+
+    @staticmethod
+    def trackModule(module=None):
+        '''trackModule(module=None) ... enable track() for module, or the calling module if None.'''
+        _PathLog._tracking.add(module if module else _PathLog._module())
+
+    @staticmethod
+    def untrackModule(module=None):
+        '''untrackModule(module=None) ... disable track() for module, or the calling module if None.'''
+        _PathLog._tracking.discard(module if module else _PathLog._module())
+
+    @staticmethod
+    def track(*args):
+        module = _PathLog._module()
+        if module in _PathLog._tracking:
+            frame = sys._getframe(1)
+            logging.getLogger(module).log(_PathLog._Level[_PathLog.Level.DEBUG], "%s(%d).%s(%s)" % (module, frame.f_lineno, frame.f_code.co_name, ', '.join([str(a) for a in args])))
+
+    @staticmethod
+    def debug(msg):
+        logging.getLogger(_PathLog._module()).debug(msg)
+
+    @staticmethod
+    def info(msg):
+        logging.getLogger(_PathLog._module()).info(msg)
+
+    @staticmethod
+    def notice(msg):
+        logging.getLogger(_PathLog._module()).log(_PathLog._Level[_PathLog.Level.NOTICE], msg)
+
+    @staticmethod
+    def warning(msg):
+        logging.getLogger(_PathLog._module()).warning(msg)
+
+    @staticmethod
+    def error(msg):
+        logging.getLogger(_PathLog._module()).error(msg)
+
+try:
+    import PathScripts.PathLog as PathLog
+except ImportError:
+    logging.addLevelName(_PathLog._Level[_PathLog.Level.NOTICE], 'NOTICE')
+    PathLog = _PathLog
@@ -0,0 +1,131 @@
+# Metrics of the communication with a MK instance.
+#
+# Metrics are collected per service, if enabled (see Machinekit.enableMetrics):
+#   messages   ... number of messages received, including pings
+#   bytes      ... number of bytes received
+#   batches    ... number of batches handed to the service
+#   parse      ... time spent decoding the protobuf containers, per message
+#   process    ... time spent in the service's handlers, per batch
+#   emit       ... time spent emitting the signals, including all connected slots
+#   frame      ... time spent emitting statusFrameUpdate, including all connected slots
+#
+# All timings are kept in histograms with power of 2 buckets in µs, which is plenty to
+# tell whether the time goes into the network, protobuf decoding, the handlers or the UI.
+#
+# From the python console:
+#   mk.enableMetrics()
+#   print(mk.metrics().report())
+
+class MKHistogram(object):
+    '''Histogram of durations, bucket i counts the samples below 2^i µs.'''
+
+    Buckets = 32
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * self.Buckets
+
+    def add(self, seconds):
+        '''add(seconds) ... record a duration.'''
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), self.Buckets - 1)] += 1
+
+    def mean(self):
+        '''Return the average duration in seconds.'''
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        '''percentile(p) ... return the upper bound in seconds of the bucket holding the p-th percentile.'''
+        threshold = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= threshold:
+                return (1 << i) / 1e6
+        return 0.0
+
+    def asDict(self):
+        '''Return the receiver as dictionary, all durations in µs.'''
+        return {
+                'count'   : self.count,
+                'mean'    : 1e6 * self.mean(),
+                'p50'     : 1e6 * self.percentile(50),
+                'p99'     : 1e6 * self.percentile(99),
+                'max'     : 1e6 * self.max,
+                'buckets' : {(1 << i): n for i, n in enumerate(self.buckets) if n},
+                }
+
+class MKServiceMetrics(object):
+    '''The metrics of a single service.'''
+
+    Timings = ['parse', 'process', 'emit', 'frame']
+
+    def __init__(self):
+        self.parse = MKHistogram()
+        self.process = MKHistogram()
+        self.emit = MKHistogram()
+        self.frame = MKHistogram()
+        self.reset()
+
+    def reset(self):
+        self.messages = 0
+        self.bytes = 0
+        self.batches = 0
+        for timing in self.Timings:
+            getattr(self, timing).reset()
+
+    def received(self, frames):
+        '''received(frames) ... account for a multipart message.'''
+        self.messages += 1
+        self.bytes += sum([len(f) for f in frames])
+
+    def asDict(self):
+        d = {'messages': self.messages, 'bytes': self.bytes, 'batches': self.batches}
+        for timing in self.Timings:
+            histogram = getattr(self, timing)
+            if histogram.count:
+                d[timing] = histogram.asDict()
+        return d
+
+class MKMetrics(object):
+    '''Metrics of all services of a MK instance, indexed by service name.'''
+
+    def __init__(self):
+        self.service = {}
+
+    def __getitem__(self, name):
+        metrics = self.service.get(name)
+        if metrics is None:
+            metrics = self.service.setdefault(name, MKServiceMetrics())
+        return metrics
+
+    def reset(self):
+        '''Reset the metrics of all services.'''
+        for metrics in self.service.values():
+            metrics.reset()
+
+    def asDict(self):
+        '''Return all metrics as a dictionary, all durations in µs.'''
+        return {name: metrics.asDict() for name, metrics in self.service.items()}
+
+    def report(self):
+        '''Return a human readable table of all metrics.'''
+        lines = ["%-9s %8s %10s %8s   %-7s %8s %8s %8s %8s" % ('service', 'msgs', 'bytes', 'batches', 'timing', 'count', 'mean', 'p99', 'max')]
+        for name, metrics in sorted(self.service.items()):
+            prefix = "%-9s %8d %10d %8d" % (name, metrics.messages, metrics.bytes, metrics.batches)
+            for timing in metrics.Timings:
+                h = getattr(metrics, timing)
+                if h.count:
+                    lines.append("%s   %-7s %8d %8.1f %8.0f %8.0f" % (prefix, timing, h.count, 1e6 * h.mean(), 1e6 * h.percentile(99), 1e6 * h.max))
+                    prefix = ' ' * len(prefix)
+            if prefix.strip():
+                lines.append(prefix)
+        return '\n'.join(lines)
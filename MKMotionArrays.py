@@ -0,0 +1,98 @@
+# NumPy view of status.motion for vectorised checks and DRO math.
+#
+# All positions and offsets of status.motion are MKPosition instances, the vectors in here
+# are views of their arrays, they share the memory and reflect each update without any
+# copying. The per axis values (homed, velocity, ferror and the limit switches) live in
+# MKAxis instances, they are copied into arrays by the motion handler whenever an update
+# changes them.
+#
+# The arrays are only maintained once they were requested (see Machinekit.motionArrays),
+# which requires numpy. Like the rest of the status they are updated by the I/O thread,
+# hold Machinekit.lock to get a consistent view of all of them.
+#
+#   arrays = mk.motionArrays()
+#   print(arrays.workPosition(), arrays.isHomed(), arrays.inLimits(mk['status.config']))
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # no vectorised view of the status
+
+
+class MKMotionArrays(object):
+    '''Vectors of all positions and offsets, and arrays of per axis values of status.motion.
+    Positions and offsets are indexed by axis in the order of MKPosition.Axes, the per
+    axis arrays are indexed by row, see index for the axis index of each row.'''
+
+    Positions = ['actual', 'current', 'joint', 'joint_actual', 'dtg']
+    Offsets   = ['g5x', 'g92']
+
+    # per axis array -> (dtype, accessor of the MKAxis value, updated attribute of the axis)
+    Axis = {
+            'homed'          : (bool,  lambda axis: axis.homed,               'homed'),
+            'velocity'       : (float, lambda axis: axis.velocity,            'velocity'),
+            'ferror'         : (float, lambda axis: axis.ferror_current,      'ferror_current'),
+            'ferrorHighmark' : (float, lambda axis: axis.ferror_highmark,     'ferror_highmark'),
+            'softMin'        : (bool,  lambda axis: axis.limit['soft'].min,   'limit.soft.min'),
+            'softMax'        : (bool,  lambda axis: axis.limit['soft'].max,   'limit.soft.max'),
+            'hardMin'        : (bool,  lambda axis: axis.limit['hard'].min,   'limit.hard.min'),
+            'hardMax'        : (bool,  lambda axis: axis.limit['hard'].max,   'limit.hard.max'),
+            }
+
+    def __init__(self, motion):
+        if numpy is None:
+            raise ImportError("MKMotionArrays require numpy")
+        self.bind(motion)
+
+    def bind(self, motion):
+        '''bind(motion) ... (re)create all vectors and arrays for the motion handler, required
+        whenever the handler replaced its positions or axes.'''
+        self.position = {name: numpy.frombuffer(motion.position[name].data) for name in self.Positions}
+        self.offset = {name: numpy.frombuffer(motion.offset[name].data) for name in self.Offsets}
+        self.index = numpy.array([axis.index for axis in motion.axis], dtype=int)
+        self.row = {axis.index: row for row, axis in enumerate(motion.axis)}
+        self.updater = {}
+        for name, (dtype, value, attr) in self.Axis.items():
+            array = numpy.array([value(axis) for axis in motion.axis], dtype=dtype)
+            self.__setattr__(name, array)
+            self.updater[attr] = (array, value)
+
+    def merged(self, motion, updated):
+        '''merged(motion, updated) ... callback from the motion handler after it merged an update.'''
+        for path in updated:
+            if path.startswith('axis.'):
+                _, index, attr = (path + '.').split('.', 2)
+                if not attr:
+                    # an axis was added
+                    self.bind(motion)
+                    return
+                updater = self.updater.get(attr[:-1])
+                if updater:
+                    array, value = updater
+                    array[self.row[int(index)]] = value(motion.axis.element(int(index)))
+
+    def workPosition(self, offset='g5x'):
+        '''workPosition(offset='g5x') ... return the actual position in the work coordinate system.'''
+        return self.position['actual'] - self.offset[offset]
+
+    def isHomed(self):
+        '''Return True if all axes are homed.'''
+        return bool(self.homed.all())
+
+    def isLimited(self):
+        '''Return an array with True for each axis which is on one of its soft or hard limits.'''
+        return self.softMin | self.softMax | self.hardMin | self.hardMax
+
+    def limits(self, config):
+        '''limits(config) ... return the arrays of min and max position limit of each axis from status.config.'''
+        limit = [config.axis.element(int(index)).limit for index in self.index]
+        return numpy.array([l.min for l in limit]), numpy.array([l.max for l in limit])
+
+    def inLimits(self, config, position=None):
+        '''inLimits(config, position=None) ... return an array with True for each axis whose position is
+        within the position limits of status.config, position defaults to the actual position.'''
+        if position is None:
+            position = self.position['actual']
+        p = position[self.index]
+        lo, hi = self.limits(config)
+        return (p >= lo) & (p <= hi)
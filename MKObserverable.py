@@ -2,6 +2,9 @@
 
 class MKObserverable(object):
     '''Internal base class for propagating changes to an arbitrary list of observers.'''
+
+    __slots__ = ('observers',)
+
     def __init__(self):
         self.observers = []
 
@@ -0,0 +1,192 @@
+# Recording and replay of the raw traffic received from a MK instance.
+#
+# A recording is an append-only file of all multipart messages as they were received
+# from the sockets, the frames are written as is without parsing or re-serialising them.
+# The file starts with Magic, followed by a record per message:
+#   <d   ... monotonic timestamp in seconds, relative to the start of the recording
+#   <B   ... length of the service name
+#   <B   ... number of frames
+#   the service name ('status', 'error', ...)
+#   for each frame: <I length, followed by the frame itself
+#
+# Recording is started and stopped through Machinekit.startRecording/stopRecording. A
+# recording can be replayed into any Machinekit instance with MKReplay, either at the
+# recorded speed, faster, or as fast as possible:
+#
+#   mk = MKReplay.machinekit()
+#   MKReplay('shopfloor.mkrec', speed=None).replay(mk)
+
+import MachinekitInstance
+import machinetalk.protobuf.message_pb2 as MESSAGE
+import machinetalk.protobuf.types_pb2 as TYPES
+import struct
+import threading
+import time
+
+from MKLog import PathLog
+
+Magic  = b'MKREC\x01\n'
+Record = struct.Struct('<dBB')
+Frame  = struct.Struct('<I')
+
+class MKRecorder(object):
+    '''Writes all messages handed to it to a recording file.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(Magic)
+            self.start = time.monotonic()
+        else:
+            # appending to an existing recording, continue where it left off
+            self.start = time.monotonic() - max([r[0] for r in MKRecording(path)] + [0])
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def record(self, service, frames):
+        '''record(service, frames) ... append the multipart message frames received by service.'''
+        name = service.encode()
+        buf = [Record.pack(time.monotonic() - self.start, len(name), len(frames)), name]
+        for frame in frames:
+            buf.append(Frame.pack(len(frame)))
+            buf.append(frame)
+        with self.lock:
+            if self.file:
+                self.file.write(b''.join(buf))
+                self.count += 1
+
+    def flush(self):
+        '''Write all buffered records to the file.'''
+        with self.lock:
+            if self.file:
+                self.file.flush()
+
+    def close(self):
+        '''Finish the recording.'''
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+        PathLog.info("recorded %d messages to %s" % (self.count, self.path))
+
+class MKRecording(object):
+    '''Iterator over the records of a recording file, each record is a tuple of
+    (timestamp, service, frames).'''
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        if not self.data.startswith(Magic):
+            raise ValueError("%s is not a MK recording" % path)
+
+    def __iter__(self):
+        data = self.data
+        end = len(data)
+        i = len(Magic)
+        while i + Record.size <= end:
+            timestamp, slen, count = Record.unpack_from(data, i)
+            i += Record.size
+            service = data[i:i+slen].decode()
+            i += slen
+            frames = []
+            for f in range(count):
+                if i + Frame.size > end:
+                    i = end + 1
+                    break
+                flen, = Frame.unpack_from(data, i)
+                i += Frame.size
+                frames.append(data[i:i+flen])
+                i += flen
+            if i > end:
+                # the recording was cut short, most likely the process died while writing
+                break
+            yield (timestamp, service, frames)
+
+    def services(self):
+        '''Return the names of all services in the recording.'''
+        return sorted(set([service for t, service, frames in self]))
+
+class MKReplay(object):
+    '''Injects a recording into a Machinekit instance. speed is the factor by which the replay
+    is accelerated, None replays all messages as fast as possible.'''
+
+    def __init__(self, path, speed=1.0):
+        self.recording = MKRecording(path)
+        self.speed = speed
+        self.count = 0
+
+    @classmethod
+    def machinekit(cls, uuid=b'replay'):
+        '''Return a Machinekit instance which is not connected to any MK, suitable for replays.'''
+        import machinekit
+        return machinekit.Machinekit(MachinekitInstance.MachinekitInstance(uuid, {b'uuid': uuid}))
+
+    def _service(self, mk, name):
+        service = mk.service.get(name)
+        if service is None:
+            import machinekit
+            cls = machinekit._MKServiceRegister.get(name)
+            if cls is None:
+                return None
+            properties = {b'service': name.encode(), b'uuid': mk.instance.uuid, b'dsn': ("inproc://replay-%s" % name).encode()}
+            service = cls(mk.Context, name, properties)
+            service.attach(mk)
+            mk.service[name] = service
+        return service
+
+    def _inject(self, mk, name, batch):
+        service = self._service(mk, name)
+        containers = []
+        for frames in batch:
+            rx = MESSAGE.Container()
+            try:
+                rx.ParseFromString(frames[-1])
+            except Exception as e:
+                PathLog.error("%s exception: %s" % (name, e))
+                continue
+            if rx.type != TYPES.MT_PING:
+                containers.append(rx)
+        if service and containers:
+            with mk.lock:
+                service.processBatch(containers)
+        self.count += len(batch)
+
+    def replay(self, mk, batch=None):
+        '''replay(mk, batch=None) ... inject all recorded messages into mk and return the time it took.
+        Consecutive messages of the same service which are due are processed as one batch, just like
+        the I/O thread does, up to batch (Machinekit.ReceiveBatch by default) messages at a time.'''
+        if batch is None:
+            batch = mk.ReceiveBatch
+        begin = time.monotonic()
+        pending = []
+        pendingService = None
+        for timestamp, service, frames in self.recording:
+            if pending and (service != pendingService or len(pending) >= batch):
+                self._inject(mk, pendingService, pending)
+                pending = []
+            if self.speed:
+                delay = begin + timestamp / self.speed - time.monotonic()
+                if delay > 0:
+                    if pending:
+                        self._inject(mk, pendingService, pending)
+                        pending = []
+                    time.sleep(delay)
+            pending.append(frames)
+            pendingService = service
+        if pending:
+            self._inject(mk, pendingService, pending)
+        return time.monotonic() - begin
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay a MK recording')
+    parser.add_argument('recording', help='recording file to replay')
+    parser.add_argument('--speed', help='replay speed factor, 0 for as fast as possible', type=float, default=1.0)
+    args = parser.parse_args()
+
+    replay = MKReplay(args.recording, args.speed if args.speed else None)
+    mk = MKReplay.machinekit()
+    seconds = replay.replay(mk)
+    print("replayed %d messages of %s in %.3fs" % (replay.count, replay.recording.services(), seconds))
@@ -1,10 +1,17 @@
 # Base classes for MK services implementing the basic interface
+import machinetalk.protobuf.message_pb2 as MESSAGE
+import machinetalk.protobuf.types_pb2 as TYPES
+import time
 import zmq
 
+from MKHeartbeat    import MKHeartbeat
 from MKObserverable import *
 
 class MKService(MKObserverable):
     '''The base class of all services'''
+
+    PingInterval = None # seconds between pings for services which acknowledge them
+
     def __init__(self, name, properties):
         super().__init__()
 
@@ -14,6 +21,8 @@ class MKService(MKObserverable):
         self.name    = self.service.decode()
         self.serviceName = name
         self.quit = False
+        self.engine = None
+        self.heartbeat = MKHeartbeat(time.monotonic(), self.PingInterval)
 
     def setTermination(self):
         '''Sets the receiver to be terminated - most likely the remote endpoint went away.'''
@@ -30,6 +39,53 @@ class MKService(MKObserverable):
         Must be overwritten by subclasses.'''
         pass
 
+    def processBatch(self, containers):
+        '''Called by the framework with all protobuf containers which were pending
+        on the receiver's socket, in the order they were received.
+        Can be overwritten by subclasses which are able to merge the notifications.'''
+        for container in containers:
+            self.process(container)
+
+    def get(self, path):
+        '''get(path) ... return the receiver's attribute for the given dotted path.
+        Can be overwritten by subclasses with a faster lookup.'''
+        return self[path.split('.')]
+
+    def connect(self, context):
+        '''connect(context) ... create the receiver's socket and connect it to MK.
+        Must be overwritten by subclasses.'''
+        pass
+
+    def reconnect(self, context):
+        '''reconnect(context) ... replace the receiver's socket with a freshly connected one.
+        Called by the framework from the thread owning the socket, when the service went stale.'''
+        self.socket.close(linger=0)
+        self.connect(context)
+
+    def heartbeatReceived(self, container, now):
+        '''heartbeatReceived(container, now) ... called by the framework for every container received
+        from MK, including pings, to keep track of the service's heartbeat.'''
+        keepalive = container.pparams.keepalive_timer if container.HasField('pparams') else None
+        if container.type == TYPES.MT_PING_ACKNOWLEDGE:
+            self.heartbeat.acknowledged(now)
+        else:
+            self.heartbeat.received(now, container.type == TYPES.MT_PING, keepalive)
+
+    def sendPing(self):
+        '''Send a MT_PING to MK, only sensible for services which acknowledge them (see PingInterval).'''
+        container = MESSAGE.Container()
+        container.type = TYPES.MT_PING
+        self.send(container.SerializeToString())
+
+    def send(self, buf):
+        '''send(buf) ... send the serialized buf to MK through the receiver's socket.
+        If the receiver is driven by an I/O engine the buffer is handed to the engine which
+        takes care of sending it from the thread owning the socket.'''
+        if self.engine is None:
+            self.socket.send(buf)
+        else:
+            self.engine.send(self.socket, buf)
+
     def ping(self):
         '''Periodically alled by the framework regardless of any messages being
         received for the receiver. Can be used for timed tasks and housekeeping
@@ -42,6 +98,11 @@ class MKServiceSubscribe(MKService):
     '''The base class for publish/subscribe based services'''
     def __init__(self, context, name, properties):
         MKService.__init__(self, name, properties)
+        self.connect(context)
+
+    def connect(self, context):
+        '''Create the SUB socket and subscribe to all topics. Publishers send a full update for every
+        new subscription, which is how a reconnected service gets back in sync.'''
         self.socket = context.socket(zmq.SUB)
         subs = self.topicNames()
         if not subs:
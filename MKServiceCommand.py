@@ -62,7 +62,7 @@ class CommandSequence(object):
                     self.wait = command
                 else:
                     self.msgs.append(command)
-                    self.service.sendCommand(command)
+                    self.service.sendCommandLocked(command)
 
     def ping(self):
         '''Periodically called by the framework - checks if the receiver is still waiting for
@@ -76,16 +76,24 @@ class MKServiceCommand(MKService):
     The receiver keeps track of the service's state and the completion status of any commands
     that have been sent to MK.'''
 
+    PingInterval = 2.0
+
     def __init__(self, context, name, properties):
         MKService.__init__(self, name, properties)
+        self.connect(context)
+        self.commandID = itertools.count()
+        # commands are sent from the GUI while responses are processed by the I/O thread
+        self.locked = threading.RLock()
+        self.outstandingMsgs = {}
+        self.compounds = []
+        self.changedMsgs = [] # commands whose observers get notified once the lock is released
+
+    def connect(self, context):
+        '''Create the DEALER socket, each connection gets its own identity.'''
         self.identity = uuid.uuid1()
         self.socket = context.socket(zmq.DEALER)
         self.socket.identity = str(self.identity).encode()
         self.socket.connect(self.dsn)
-        self.commandID = itertools.count()
-        self.locked = threading.Lock()
-        self.outstandingMsgs = {}
-        self.compounds = []
 
     def topicName(self):
         '''The service's name.'''
@@ -100,17 +108,27 @@ class MKServiceCommand(MKService):
             return next(self.commandID)
 
     def msgChanged(self, msg):
-        '''internal callback when the status of a tracked command has changed.'''
+        '''internal callback when the status of a tracked command has changed, must be called with the lock held.
+        The observers are notified by notifyChanged, after the lock was released.'''
         for compound in self.compounds:
             compound.processCommand(msg)
         self.compounds = [compound for compound in self.compounds if compound.isActive()]
 
-        self.notifyObservers(msg)
+        self.changedMsgs.append(msg)
 
         if msg.isCompleted() and self.outstandingMsgs.get(msg.msg.ticket):
             #print("del [%d]: %s" % (msg.msg.ticket, msg))
             del self.outstandingMsgs[msg.msg.ticket]
 
+    def notifyChanged(self):
+        '''internal - notify the observers of all commands which changed, must be called without holding the lock
+        so observers can send commands from any thread.'''
+        with self.locked:
+            msgs = self.changedMsgs
+            self.changedMsgs = []
+        for msg in msgs:
+            self.notifyObservers(msg)
+
     def process(self, container):
         '''process(container) ... called by the framework when a proto buf message from MK's
         command service was received.'''
@@ -120,30 +138,40 @@ class MKServiceCommand(MKService):
             print('')
             self.setTermination()
             return
-                
+
+        if container.type == TYPES.MT_PING_ACKNOWLEDGE:
+            return
+
         if container.HasField('reply_ticket'):
-            msg = self.outstandingMsgs.get(container.reply_ticket)
-            if msg:
-                msg = self.outstandingMsgs[container.reply_ticket]
-                if container.type == TYPES.MT_EMCCMD_EXECUTED:
-                    msg.msgExecuted()
-                if container.type == TYPES.MT_EMCCMD_COMPLETED:
-                    msg.msgCompleted()
-                self.msgChanged(msg)
-            else:
-                print("process(%s) - unknown ticket" % container)
+            with self.locked:
+                msg = self.outstandingMsgs.get(container.reply_ticket)
+                if msg:
+                    if container.type == TYPES.MT_EMCCMD_EXECUTED:
+                        msg.msgExecuted()
+                    if container.type == TYPES.MT_EMCCMD_COMPLETED:
+                        msg.msgCompleted()
+                    self.msgChanged(msg)
+                else:
+                    print("process(%s) - unknown ticket" % container)
+            self.notifyChanged()
         else:
             print("process(%s)" % container)
 
     def sendCommand(self, msg):
         '''Sends a command to MK.'''
+        with self.locked:
+            self.sendCommandLocked(msg)
+        self.notifyChanged()
+
+    def sendCommandLocked(self, msg):
+        '''Sends a command to MK, must be called with the lock held.'''
         ticket = self.newTicket()
         msg.msg.ticket = ticket
         buf = msg.serializeToString()
         self.outstandingMsgs[ticket] = msg
         #print("add [%d]: %s" % (ticket, msg))
         msg.msgSent()
-        self.socket.send(buf)
+        self.send(buf)
         if not msg.expectsResponses():
             msg.msgCompleted()
             self.msgChanged(msg)
@@ -161,18 +189,23 @@ class MKServiceCommand(MKService):
         all outstanding commands before sending the next commands to MK. The inner list are commands which
         are sent to MK in parallel.'''
         command = CommandSequence(self, sequence)
-        self.compounds.append(command)
-        command.start()
+        with self.locked:
+            self.compounds.append(command)
+            command.start()
+        self.notifyChanged()
 
     def abortCommandSequence(self):
         '''Assuming there is a command sequence being processed this call will stop sending any more commands
         from those sequences to MK.'''
-        self.compounds = []
+        with self.locked:
+            self.compounds = []
 
     def ping(self):
         '''Periodically called by framework. Used to track the status of command sequences and trigger sending
         the next batch if appropriate.'''
-        for compound in self.compounds:
-            compound.ping()
-        self.compounds = [compound for compound in self.compounds if compound.isActive()]
+        with self.locked:
+            for compound in self.compounds:
+                compound.ping()
+            self.compounds = [compound for compound in self.compounds if compound.isActive()]
+        self.notifyChanged()
 
@@ -1,6 +1,5 @@
 # Classes to directly interact with the MK HAL layer.
 
-import PathScripts.PathLog as PathLog
 import itertools
 import machinetalk.protobuf.object_pb2 as OBJECT
 import machinetalk.protobuf.types_pb2 as TYPES
@@ -10,6 +9,7 @@ import zmq
 
 from MKCommand import *
 from MKError   import *
+from MKLog     import PathLog
 from MKService import *
 
 PathLog.setLevel(PathLog.Level.INFO, PathLog.thisModule())
@@ -29,6 +29,9 @@ PinValue = {
 
 class Pin(object):
     '''Helper class represing a specific pin in HAL.'''
+
+    __slots__ = ('name', 'handle', 'type', 'dir', 'value')
+
     def __init__(self, container):
         self.name = container.name.split('.')[-1]
         self.handle = container.handle
@@ -169,12 +172,11 @@ def protoDump(obj, prefix=''):
 class MKServiceHalCommand(MKService):
     '''Class to interact directly with MK's HAL service.'''
 
+    PingInterval = 2.0
+
     def __init__(self, context, name, properties):
         MKService.__init__(self, name, properties)
-        self.identity = uuid.uuid1()
-        self.socket = context.socket(zmq.DEALER)
-        self.socket.identity = str(self.identity).encode()
-        self.socket.connect(self.dsn)
+        self.connect(context)
         self.commandID = itertools.count()
         self.locked = threading.Lock()
 
@@ -182,6 +184,13 @@ class MKServiceHalCommand(MKService):
         # components? signals? anything else?
         #self.sendCommand(MKCommand(TYPES.MT_HALRCOMMAND_DESCRIBE))
 
+    def connect(self, context):
+        '''Create the DEALER socket, each connection gets its own identity.'''
+        self.identity = uuid.uuid1()
+        self.socket = context.socket(zmq.DEALER)
+        self.socket.identity = str(self.identity).encode()
+        self.socket.connect(self.dsn)
+
     def newTicket(self):
         '''Return a unique value to be used as the ticket so responses can be matched to their request.'''
         with self.locked:
@@ -194,12 +203,14 @@ class MKServiceHalCommand(MKService):
         msg.msg.serial = ticket
         buf = msg.serializeToString()
         msg.msgSent()
-        self.socket.send(buf)
+        self.send(buf)
 
     def process(self, container):
         '''Called by the framework when MK's HAL service sends a response message to a command.'''
         if container.type == TYPES.MT_HALRCOMMAND_DESCRIPTION:
             protoDump(container)
+        elif container.type == TYPES.MT_PING_ACKNOWLEDGE:
+            pass
         else:
             print('halrcmd', container)
 
@@ -11,11 +11,18 @@
 # the split since it seems one needs all of them anyway to do anything
 # sensible.
 
-import PathScripts.PathLog as PathLog
+import array
+import collections.abc
+import operator
+import threading
 import traceback
+import types
 
+from MKLog import PathLog
 from MKObserverable import *
 from MKService import *
+from MKSnapshot import MKStatusSnapshot, freeze
+from MKUpdated import MKUpdated, Paths
 
 from machinetalk.protobuf.status_pb2 import *
 from machinetalk.protobuf.types_pb2 import MT_EMCSTAT_FULL_UPDATE
@@ -31,6 +38,10 @@ def returnAttribute(attr, path):
         rest = path[1:]
         if type(attr) == dict:
             return returnAttribute(attr[path[0]], rest)
+        if type(attr) == MKIndexedList:
+            return returnAttribute(attr.element(int(path[0])), rest)
+        if type(attr) == MKPosition:
+            return returnAttribute(attr[path[0]], rest)
         if type(attr) == list:
             index = int(path[0])
             if hasattr(attr[0], 'index'):
@@ -43,11 +54,103 @@ def returnAttribute(attr, path):
         return returnAttribute(attr.__getattribute__(path[0]), rest)
     return attr
 
+def indexedElement(attr, index):
+    '''indexedElement(attr, index) ... return the element of the list attr whose index attribute is index.'''
+    for element in attr:
+        if element.index == index:
+            return element
+    raise IndexError("no element with index %d" % index)
+
+def composePath(steps):
+    '''composePath(steps) ... return a function applying all functions in steps in order.'''
+    if not steps:
+        return lambda o: o
+    if len(steps) == 1:
+        return steps[0]
+    first = steps[0]
+    rest = composePath(steps[1:])
+    return lambda o: rest(first(o))
+
+def compilePath(attr, path):
+    '''compilePath(attr, path) ... return a function which, applied to an object of the same structure as attr,
+    returns what returnAttribute(attr, path) returns. The structure of attr determines how each step is resolved,
+    which is why the function has to be compiled again if the structure changes.
+    Will throw if path cannot be resolved successfully.'''
+    steps = []
+    names = [] # consecutive attribute names, resolved by a single attrgetter
+    for name in path:
+        if type(attr) in (dict, MKIndexedList, MKPosition, list) and names:
+            steps.append(operator.attrgetter('.'.join(names)))
+            names = []
+        if type(attr) == dict:
+            steps.append(operator.itemgetter(name))
+            attr = attr[name]
+        elif type(attr) == MKIndexedList:
+            index = int(name)
+            steps.append(lambda o, index=index: o.element(index))
+            attr = attr.element(index)
+        elif type(attr) == MKPosition:
+            i = MKPosition.Index[name]
+            steps.append(lambda o, i=i: o.data[i])
+            attr = attr[name]
+        elif type(attr) == list:
+            index = int(name)
+            if hasattr(attr[0], 'index'):
+                steps.append(lambda o, index=index: indexedElement(o, index))
+                attr = indexedElement(attr, index)
+            else:
+                steps.append(operator.itemgetter(index))
+                attr = attr[index]
+        else:
+            names.append(name)
+            attr = attr.__getattribute__(name)
+    if names:
+        steps.append(operator.attrgetter('.'.join(names)))
+    return composePath(steps)
+
+class MKIndexedList(list):
+    '''List of axes or tools, which also provides direct access to each element by its index attribute.
+    Updates of the corresponding repeated proto field are dispatched to the elements in a single pass.'''
+
+    def __init__(self, cls, protos):
+        super().__init__([cls(proto) for proto in protos])
+        self.cls = cls
+        self.byIndex = {element.index: element for element in self}
+        self.paths = {} # index -> {attribute -> updated path}, so updates don't format any strings
+
+    def element(self, index):
+        '''element(index) ... return the element with the given index, raises KeyError if there is none.'''
+        return self.byIndex[index]
+
+    def merge(self, protos, name):
+        '''merge(protos, name) ... merge each proto into the element with the same index, elements which
+        don't exist yet are added. Return the list of updated attributes prefixed with name and index.'''
+        updated = []
+        for proto in protos:
+            element = self.byIndex.get(proto.index)
+            if element is None:
+                element = self.cls(proto)
+                self.append(element)
+                self.byIndex[element.index] = element
+                updated.append("%s.%d" % (name, element.index))
+            else:
+                paths = self.paths.get(element.index)
+                if paths is None:
+                    paths = self.paths.setdefault(element.index, {})
+                for u in element.merge(proto):
+                    path = paths.get(u)
+                    if path is None:
+                        path = paths.setdefault(u, "%s.%d.%s" % (name, element.index, u))
+                    updated.append(path)
+        return updated
+
 class MKServiceContainer(MKObserverable):
     '''Base class to provide string based access to hierarchical attributes.
     All containers are expected to be accessed by [] with a collection of
     hierarchical attribute names.'''
 
+    __slots__ = ('valid',)
+
     def __init__(self, valid):
         super().__init__()
         self.valid = valid
@@ -66,88 +169,196 @@ class MKServiceContainer(MKObserverable):
 class minmax(MKServiceContainer):
     '''Class to deal with settings which have a min and a max value (like limits).
     Optionally support for a default value.'''
+
+    __slots__ = ('min', 'max', 'default')
+
     def __init__(self, min, max, default=None):
         super().__init__(True)
         self.min = min
         self.max = max
         self.default = default
 
-def mergeMinMax(mm, name, proto, attr, default=None):
-    '''mergeMinMax(mm, name, proto, attr, default=None) ... merge the values of mm with the
-    min_<attr> and max_<attr> values stored in proto (if any).
-    Return a list of hierarchical strings of the values which were updated.'''
-    maxAttr = "max_%s" % attr
-    minAttr = "min_%s" % attr
+class MKPosition(collections.abc.MutableMapping):
+    '''Position of all 9 axes, stored as a fixed array of doubles in the order of Axes.
+    Behaves like a dictionary of axis name vs. axis position, data holds the raw array.'''
 
-    if '' == default:
-        default = "default_%s" % attr
+    __slots__ = ('data',)
 
-    updated = []
-    if proto.HasField(minAttr):
-        mm.min = proto.__getattribute__(minAttr)
-        updated.append("%s.min" % name)
-    if proto.HasField(maxAttr):
-        mm.max = proto.__getattribute__(maxAttr)
-        updated.append("%s.max" % name)
-    if not default is None:
-        if proto.HasField(default):
-            mm.default = proto.__getattribute__(default)
-            updated.append("%s.default" % name)
+    Axes  = ('x', 'y', 'z', 'a', 'b', 'c', 'u', 'v', 'w')
+    Index = {axis: i for i, axis in enumerate(Axes)}
+
+    def __init__(self, values=None):
+        self.data = array.array('d', values if values else [0.0] * len(self.Axes))
+
+    def __getitem__(self, axis):
+        return self.data[self.Index[axis]]
+
+    def __setitem__(self, axis, value):
+        self.data[self.Index[axis]] = value
+
+    def __delitem__(self, axis):
+        raise TypeError("axes of a position cannot be removed")
+
+    def __iter__(self):
+        return iter(self.Axes)
+
+    def __len__(self):
+        return len(self.Axes)
 
-    return updated
+    def __contains__(self, axis):
+        return axis in self.Index
+
+    def keys(self):
+        return self.Axes
+
+    def values(self):
+        return list(self.data)
+
+    def items(self):
+        return zip(self.Axes, self.data)
+
+    def copy(self):
+        return MKPosition(self.data)
+
+    def asDict(self):
+        '''Return the receiver as a plain dictionary.'''
+        return dict(zip(self.Axes, self.data))
+
+    def merge(self, position):
+        '''merge(position) ... update the axes set in the proto buf position.'''
+        data = self.data
+        index = self.Index
+        for field, value in position.ListFields():
+            data[index[field.name]] = value
+
+    def __repr__(self):
+        return repr(self.asDict())
 
 def defaultPosition():
     '''Helper function to return the origin position for all axes.'''
-    return {'x':0.0, 'y':0.0, 'z':0.0, 'a':0.0, 'b':0.0, 'c':0.0, 'u':0.0, 'v':0.0, 'w':0.0}
-
-def extractPosition(position):
-    '''Return a dictionary of axis name vs. axis position for all axes which are stored in the proto buf position.'''
-    pos = {}
-    for d in ['x', 'y', 'z', 'a', 'b', 'c', 'u', 'v', 'w']:
-        if position.HasField(d):
-            pos[d] = position.__getattribute__(d)
-    return pos
-
-def mergePosition(self, posDict, name, proto, attr):
-    '''mergePosition(self, posDict, name, proto, attr) ... update self with the position attr stored in proto.
-    Return a list with the hierarchical name of the updated position (posDict.name).'''
-    if proto.HasField(attr):
-        pos = extractPosition(proto.__getattribute__(attr))
-        if posDict is None:
-            dst = self.__getattribute__(name)
-            dst.update(pos)
-            return [name]
-        else:
-            dst = self.__getattribute__(posDict)
-            dst[name].update(pos)
-            return ["%s.%s" % (posDict, name)]
-    return []
-
-def mergeMember(self, member, proto, attr = None):
-    '''mergeMember(self, member, proto, attr=None) ... update self's attribute member with the value stored in proto as attr.
-    If attr is None the member is assumed to have the same name as attr.'''
-
-    if attr is None:
-        attr = member
-    if proto.HasField(attr):
-        self.__setattr__(member, proto.__getattribute__(attr))
-        return [member]
-    return []
-
-def mergeDictionary(self, member, name, proto, attr):
-    '''mergeDictionary(self, member, name, proto, attr) ... assuming the attribute self.member is a dictionary
-    update its key name with the value stored in proto as attr.'''
-    if attr is None:
-        attr = name
-    if proto.HasField(attr):
-        dst = self.__getattribute__(member)
-        dst[name] = proto.__getattribute__(attr)
-        return ["%s.%s" % (member, name)]
-    return []
+    return MKPosition()
+
+# The merge of status protos is table driven. Each handler declares a list of rules which map
+# the proto's fields to the handler's attributes. From those an MKMerge is built once, which maps
+# each field name to the action merging it. Merging a proto only visits the fields it carries
+# (ListFields), which for a typical incremental update are just a few.
+#
+# All rules take the name of the attribute as dotted path, the first element is the attribute
+# of the receiver, any remaining elements are keys of dictionaries. The same name is reported
+# as updated.
+
+def _resolver(name):
+    path = name.split('.')
+    attr = path[0]
+    keys = path[1:]
+    if not keys:
+        return lambda obj: obj.__getattribute__(attr)
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda obj: obj.__getattribute__(attr)[key]
+    def resolve(obj):
+        o = obj.__getattribute__(attr)
+        for key in keys:
+            o = o[key]
+        return o
+    return resolve
+
+def ruleMember(member, attr=None):
+    '''ruleMember(member, attr=None) ... proto field attr is stored as the receiver's member, attr defaults to member.'''
+    def merge(obj, value, updated):
+        obj.__setattr__(member, value)
+        updated.append(member)
+    return [(attr if attr else member, merge)]
+
+def ruleDictionary(member, name, attr):
+    '''ruleDictionary(member, name, attr) ... proto field attr is stored as key name of the receiver's dictionary member.'''
+    path = "%s.%s" % (member, name)
+    def merge(obj, value, updated):
+        obj.__getattribute__(member)[name] = value
+        updated.append(path)
+    return [(attr, merge)]
+
+def ruleMinMax(name, attr, default=None):
+    '''ruleMinMax(name, attr, default=None) ... proto fields min_<attr> and max_<attr> are stored in the minmax name.
+    If default is not None the given proto field is stored as the default, \'\' is short for default_<attr>.'''
+    resolve = _resolver(name)
+    def mergeAttribute(key):
+        path = "%s.%s" % (name, key)
+        def merge(obj, value, updated):
+            resolve(obj).__setattr__(key, value)
+            updated.append(path)
+        return merge
+    rules = [("min_%s" % attr, mergeAttribute('min')), ("max_%s" % attr, mergeAttribute('max'))]
+    if '' == default:
+        default = "default_%s" % attr
+    if not default is None:
+        rules.append((default, mergeAttribute('default')))
+    return rules
+
+def rulePosition(name, attr):
+    '''rulePosition(name, attr) ... the axes of the proto position attr are merged into the position dictionary name.'''
+    resolve = _resolver(name)
+    def merge(obj, value, updated):
+        resolve(obj).merge(value)
+        updated.append(name)
+    return [(attr, merge)]
+
+def rulePins(name):
+    '''rulePins(name) ... the values of the repeated proto field name are stored in the list name by their index.'''
+    def merge(obj, pins, updated):
+        dst = obj.__getattribute__(name)
+        for p in pins:
+            dst[p.index] = p.value
+        updated.append(name)
+    return [(name, merge)]
+
+def ruleIndexed(name, attr):
+    '''ruleIndexed(name, attr) ... the elements of the repeated proto field attr are merged into the MKIndexedList name.'''
+    resolve = _resolver(name)
+    def merge(obj, value, updated):
+        updated.extend(resolve(obj).merge(value, name))
+    return [(attr, merge)]
+
+def ruleCall(attr, fn):
+    '''ruleCall(attr, fn) ... proto field attr is merged by calling fn(obj, value, updated).'''
+    return [(attr, fn)]
+
+class MKMerge(object):
+    '''Merges protos of the given descriptor according to the given rules (see rule... above).'''
+
+    def __init__(self, descriptor, rules):
+        self.descriptor = descriptor
+        self.action = {}
+        for rule in rules:
+            for field, action in rule:
+                if not field in descriptor.fields_by_name:
+                    raise ValueError("%s has no field %s" % (descriptor.full_name, field))
+                self.action[field] = action
+
+    def merge(self, obj, proto):
+        '''merge(obj, proto) ... merge all fields of proto into obj and return the list of updated attributes.'''
+        updated = []
+        action = self.action
+        for field, value in proto.ListFields():
+            merge = action.get(field.name)
+            if merge:
+                merge(obj, value, updated)
+        return updated
 
 class MKAxisConfig(MKServiceContainer):
     '''Class used to hold the configuration of an axis in service status.config.'''
 
+    __slots__ = ('index', 'limit', 'ferror', 'type', 'maxV', 'maxA', 'home_sequence')
+
+    Merge = MKMerge(EmcStatusConfigAxis.DESCRIPTOR, [
+        ruleMinMax('limit', 'position_limit'),
+        ruleMinMax('ferror', 'ferror'),
+        ruleMember('type', 'axis_type'),
+        ruleMember('maxV', 'max_velocity'),
+        ruleMember('maxA', 'max_acceleration'),
+        ruleMember('home_sequence'),
+        ])
+
     def __init__(self, axis):
         super().__init__(True)
         self.index = axis.index
@@ -158,21 +369,32 @@ class MKAxisConfig(MKServiceContainer):
         self.maxA = axis.max_acceleration
         self.home_sequence = axis.home_sequence
 
-    def merge(self, container):
-        updated = []
-        for axis in container.axis:
-            if axis.index == self.index:
-                updated += mergeMinMax(self.limit, 'limit', axis, 'position_limit')
-                updated += mergeMinMax(self.ferror, 'ferror', axis, 'ferror')
-                updated += mergeMember(self, 'type', axis, 'axis_type')
-                updated += mergeMember(self, 'maxV', axis, 'max_velocity')
-                updated += mergeMember(self, 'maxA', axis, 'max_acceleration')
-                updated += mergeMember(self, 'home_sequence', axis)
-        return ["axis.%d.%s" % (self.index, u) for u in updated]
+    def merge(self, axis):
+        '''merge(axis) ... update the receiver with the axis config proto, see MKIndexedList.'''
+        return self.Merge.merge(self, axis)
 
 class MKAxis(MKServiceContainer):
     '''Class used to track all values of an axis in service status.motion.'''
 
+    __slots__ = ('index', 'enabled', 'fault', 'ferror_current', 'ferror_highmark', 'homed', 'homing',
+            'limit', 'inpos', 'input', 'output', 'override_limits', 'velocity')
+
+    Merge = MKMerge(EmcStatusMotionAxis.DESCRIPTOR, [
+        ruleMember('enabled'),
+        ruleMember('fault'),
+        ruleMember('ferror_current'),
+        ruleMember('ferror_highmark'),
+        ruleMember('homed'),
+        ruleMember('homing'),
+        ruleMember('inpos'),
+        ruleMember('input'),
+        ruleMember('output'),
+        ruleMember('override_limits'),
+        ruleMember('velocity'),
+        ruleMinMax('limit.soft', 'soft_limit'),
+        ruleMinMax('limit.hard', 'hard_limit'),
+        ])
+
     def __init__(self, axis):
         super().__init__(True)
         self.index = axis.index
@@ -191,32 +413,21 @@ class MKAxis(MKServiceContainer):
         self.override_limits = axis.override_limits
         self.velocity = axis.velocity
 
-    def merge(self, container):
-        updated = []
-        for axis in container.axis:
-            if axis.index == self.index:
-                updated += mergeMember(self, 'enabled', axis)
-                updated += mergeMember(self, 'fault', axis)
-                updated += mergeMember(self, 'ferror_current', axis)
-                updated += mergeMember(self, 'ferror_highmark', axis)
-                updated += mergeMember(self, 'homed', axis)
-                updated += mergeMember(self, 'homing', axis)
-                updated += mergeMember(self, 'inpos', axis)
-                updated += mergeMember(self, 'input', axis)
-                updated += mergeMember(self, 'output', axis)
-                updated += mergeMember(self, 'override_limits', axis)
-                updated += mergeMember(self, 'velocity', axis)
-                updated += mergeMinMax(self.limit['soft'], 'limit.soft', axis, 'soft_limit')
-                updated += mergeMinMax(self.limit['hard'], 'limit.hard', axis, 'hard_limit')
-        return ["axis.%d.%s" % (self.index, u) for u in updated]
+    def merge(self, axis):
+        '''merge(axis) ... update the receiver with the axis status proto, see MKIndexedList.'''
+        return self.Merge.merge(self, axis)
 
 
 class MKServiceStatusHandler(MKServiceContainer):
     '''Base class for all service update handlers implementing the common interface.'''
 
+    __slots__ = ('fullUpdated', 'generation', 'paths')
+
     def __init__(self):
         super().__init__(False)
         self.fullUpdated = []
+        self.generation = 0 # incremented whenever processFull rebuilds the receiver's attributes
+        self.paths = Paths.scope(self.topicName())
 
     def isValid(self):
         '''Return True if the receiver service is fully initialised - which means it has
@@ -225,12 +436,20 @@ class MKServiceStatusHandler(MKServiceContainer):
 
     def process(self, container):
         '''Callback invoked to process a status update proto buf.'''
+        updated = self.update(container)
+        if updated:
+            self.notifyObservers(self.paths.updated(updated))
+
+    def update(self, container):
+        '''update(container) ... apply the status update proto buf to the receiver without notifying
+        any observers. Return the list of updated attributes, observers are notified with the
+        MKUpdated of that list.'''
         obj = self.handlerObject(container)
-        updated = self.fullUpdated
         if container.type == MT_EMCSTAT_FULL_UPDATE:
             PathLog.debug("update full: %s" % self.topicName())
             updated = self.processFull(obj)
             self.fullUpdated = updated
+            self.generation += 1
             self.valid = True
         elif self.isValid():
             PathLog.debug("update incr: %s" % self.topicName())
@@ -238,8 +457,7 @@ class MKServiceStatusHandler(MKServiceContainer):
         else:
             PathLog.debug("update ignd: %s" % self.topicName())
             updated = None
-        if updated:
-            self.notifyObservers(updated)
+        return updated
 
     def handlerObject(self, container):
         '''handlerObject(container) ... returns the object of interest in the receiver.
@@ -262,9 +480,32 @@ class MKServiceStatusHandler(MKServiceContainer):
         pass
 
 
+def mergeIncrements(obj, value, updated):
+    obj.increments = value.split(',')
+    updated.append('increments')
+
 class MKServiceStatusHandlerConfig(MKServiceStatusHandler):
     '''Class to track all status.config settings and updates.'''
 
+    __slots__ = ('override', 'velocity', 'name', 'units', 'axis', 'axis_mask', 'increments', 'remote_path')
+
+    Merge = MKMerge(EmcStatusConfig.DESCRIPTOR, [
+        ruleMinMax('override.feed', 'feed_override'),
+        ruleMinMax('override.spindle', 'spindle_override', default='default_spindle_speed'),
+        ruleMinMax('velocity.linear', 'linear_velocity', default=''),
+        ruleMinMax('velocity.angular', 'angular_velocity', default=''),
+        ruleDictionary('velocity', 'max', 'max_velocity'),
+        ruleDictionary('velocity', 'default', 'default_velocity'),
+        ruleMember('name'),
+        ruleMember('axis_mask'),
+        ruleMember('remote_path'),
+        ruleDictionary('units', 'time', 'time_units'),
+        ruleDictionary('units', 'angular', 'angular_units'),
+        ruleDictionary('units', 'linear', 'linear_units'),
+        ruleIndexed('axis', 'axis'),
+        ruleCall('increments', mergeIncrements),
+        ])
+
     def topicName(self):
         return 'status.config'
 
@@ -285,7 +526,7 @@ class MKServiceStatusHandlerConfig(MKServiceStatusHandler):
         self.units['time'] = config.time_units
         self.units['angular'] = config.angular_units
         self.units['linear'] = config.linear_units
-        self.axis = [MKAxisConfig(axis) for axis in config.axis]
+        self.axis = MKIndexedList(MKAxisConfig, config.axis)
         self.axis_mask = config.axis_mask
         self.increments = config.increments.split(',')
         self.remote_path = config.remote_path
@@ -293,32 +534,74 @@ class MKServiceStatusHandlerConfig(MKServiceStatusHandler):
         return self.processIncremental(config)
 
     def processIncremental(self, config):
-        updated = []
-        updated += mergeMinMax(self.override['feed'], 'override.feed', config, 'feed_override')
-        updated += mergeMinMax(self.override['spindle'], 'override.spindle', config, 'spindle_override', default='default_spindle_speed')
-        updated += mergeMinMax(self.velocity['linear'], 'velocity.linear', config, 'linear_velocity', default='')
-        updated += mergeMinMax(self.velocity['angular'], 'velocity.angular', config, 'angular_velocity', default='')
-        updated += mergeDictionary(self, 'velocity', 'max', config, 'max_velocity')
-        updated += mergeDictionary(self, 'velocity', 'default', config, 'default_velocity')
-        updated += mergeMember(self, 'name', config)
-        updated += mergeMember(self, 'axis_mask', config)
-        updated += mergeMember(self, 'remote_path', config)
-        updated += mergeDictionary(self, 'units', 'time', config, 'time_units')
-        updated += mergeDictionary(self, 'units', 'angular', config, 'angular_units')
-        updated += mergeDictionary(self, 'units', 'linear', config, 'linear_units')
-
-        for axis in self.axis:
-            updated += axis.merge(config)
-
-        if config.HasField('increments'):
-            self.increments = config.increments.split(',')
-            updated.append('increments')
-
-        return updated
+        return self.Merge.merge(self, config)
 
 class MKServiceStatusHandlerMotion(MKServiceStatusHandler):
     '''Class to track and update status.motion attributes.'''
 
+    __slots__ = ('adaptive_feed', 'ain', 'aout', 'din', 'dout', 'limit', 'block_delete', 'current_line',
+            'current_vel', 'delay_left', 'distance_left', 'enabled', 'feed', 'position', 'g5x_index',
+            'offset', 'axis', 'id', 'inpos', 'paused', 'state', 'rotation_xy', 'line', 'type', 'mode',
+            'probe', 'spindle', 'queue', 'max', 'arrays', 'telemetry', 'monitor')
+
+    Merge = MKMerge(EmcStatusMotion.DESCRIPTOR, [
+        rulePins('ain'),
+        rulePins('aout'),
+        rulePins('din'),
+        rulePins('dout'),
+        rulePins('limit'),
+        ruleIndexed('axis', 'axis'),
+        ruleMember('id'),
+        ruleMember('inpos'),
+        ruleMember('paused'),
+        ruleMember('state'),
+        ruleMember('rotation_xy'),
+        ruleMember('line', 'motion_line'),
+        ruleMember('type', 'motion_type'),
+        ruleMember('mode', 'motion_mode'),
+        ruleMember('g5x_index'),
+        ruleMember('block_delete'),
+        ruleMember('current_line'),
+        ruleMember('current_vel'),
+        ruleMember('delay_left'),
+        ruleMember('distance_left', 'distance_to_go'),
+        ruleMember('enabled'),
+        ruleMember('adaptive_feed', 'adaptive_feed_enabled'),
+        rulePosition('position.actual', 'actual_position'),
+        rulePosition('position.current', 'position'),
+        rulePosition('position.joint', 'joint_position'),
+        rulePosition('position.joint_actual', 'joint_actual_position'),
+        rulePosition('position.dtg', 'dtg'),
+        rulePosition('offset.g5x', 'g5x_offset'),
+        rulePosition('offset.g92', 'g92_offset'),
+        ruleDictionary('feed', 'hold', 'feed_hold_enabled'),
+        ruleDictionary('feed', 'override', 'feed_override_enabled'),
+        ruleDictionary('feed', 'rate', 'feedrate'),
+        ruleDictionary('feed', 'rapid', 'rapidrate'),
+        ruleDictionary('probe', 'active', 'probing'),
+        ruleDictionary('probe', 'tripped', 'probe_tripped'),
+        ruleDictionary('probe', 'value', 'probe_val'),
+        ruleDictionary('probe', 'position', 'probed_position'),
+        ruleDictionary('spindle', 'brake', 'spindle_brake'),
+        ruleDictionary('spindle', 'dir', 'spindle_direction'),
+        ruleDictionary('spindle', 'enabled', 'spindle_enabled'),
+        ruleDictionary('spindle', 'increasing', 'spindle_increasing'),
+        ruleDictionary('spindle', 'override', 'spindle_override_enabled'),
+        ruleDictionary('spindle', 'speed', 'spindle_speed'),
+        ruleDictionary('spindle', 'rate', 'spindlerate'),
+        ruleDictionary('queue', 'active', 'active_queue'),
+        ruleDictionary('queue', 'current', 'queue'),
+        ruleDictionary('queue', 'full', 'queue_full'),
+        ruleDictionary('max', 'velocity', 'max_velocity'),
+        ruleDictionary('max', 'acceleration', 'max_acceleration'),
+        ])
+
+    def __init__(self):
+        super().__init__()
+        self.arrays = None # MKMotionArrays, if requested
+        self.telemetry = None # MKTelemetry, if enabled
+        self.monitor = None # MKFollowingErrorMonitor, if enabled
+
     def topicName(self):
         return 'status.motion'
 
@@ -351,7 +634,9 @@ class MKServiceStatusHandlerMotion(MKServiceStatusHandler):
         self.offset = {}
         self.offset['g5x'] = defaultPosition()
         self.offset['g92'] = defaultPosition()
-        self.axis = [MKAxis(axis) for axis in motion.axis]
+        self.axis = MKIndexedList(MKAxis, motion.axis)
+        if self.arrays:
+            self.arrays.bind(self)
 
         self.id = motion.id
         self.inpos = motion.inpos
@@ -371,78 +656,31 @@ class MKServiceStatusHandlerMotion(MKServiceStatusHandler):
         return self.processIncremental(motion)
 
     def processIncremental(self, motion):
-        updated = []
-
-        def mergePins(dst, motion, pinsName):
-            pins = motion.__getattribute__(pinsName)
-            for p in pins:
-                dst[p.index] = p.value
-            return len(pins) > 0
-
-        def updatePins(upd, dst, motion, pinsName):
-            if mergePins(dst, motion, pinsName):
-                upd.append(pinsName)
-
-        updatePins(updated, self.ain,   motion, 'ain')
-        updatePins(updated, self.aout,  motion, 'aout')
-        updatePins(updated, self.din,   motion, 'din')
-        updatePins(updated, self.dout,  motion, 'dout')
-        updatePins(updated, self.limit, motion, 'limit')
-
-        for axis in self.axis:
-            updated += axis.merge(motion)
-
-        updated += mergeMember(self, 'id', motion)
-        updated += mergeMember(self, 'inpos', motion)
-        updated += mergeMember(self, 'paused', motion)
-        updated += mergeMember(self, 'state', motion)
-        updated += mergeMember(self, 'rotation_xy', motion)
-        updated += mergeMember(self, 'line', motion, 'motion_line')
-        updated += mergeMember(self, 'type', motion, 'motion_type')
-        updated += mergeMember(self, 'mode', motion, 'motion_mode')
-        updated += mergeMember(self, 'g5x_index', motion)
-        updated += mergeMember(self, 'block_delete', motion)
-        updated += mergeMember(self, 'current_line', motion)
-        updated += mergeMember(self, 'current_vel', motion)
-        updated += mergeMember(self, 'delay_left', motion)
-        updated += mergeMember(self, 'distance_left', motion, 'distance_to_go')
-        updated += mergeMember(self, 'enabled', motion)
-        updated += mergeMember(self, 'adaptive_feed', motion, 'adaptive_feed_enabled')
-
-        updated += mergePosition(self, 'position', 'actual', motion, 'actual_position')
-        updated += mergePosition(self, 'position', 'current', motion, 'position')
-        updated += mergePosition(self, 'position', 'joint', motion, 'joint_position')
-        updated += mergePosition(self, 'position', 'joint_actual', motion, 'joint_actual_position')
-        updated += mergePosition(self, 'position', 'dtg', motion, 'dtg')
-        updated += mergePosition(self, 'offset', 'g5x', motion, 'g5x_offset')
-        updated += mergePosition(self, 'offset', 'g92', motion, 'g92_offset')
-
-        updated += mergeDictionary(self, 'feed', 'hold', motion, 'feed_hold_enabled')
-        updated += mergeDictionary(self, 'feed', 'override', motion, 'feed_override_enabled')
-        updated += mergeDictionary(self, 'feed', 'rate', motion, 'feedrate')
-        updated += mergeDictionary(self, 'feed', 'rapid', motion, 'rapidrate')
-        updated += mergeDictionary(self, 'probe', 'active', motion, 'probing')
-        updated += mergeDictionary(self, 'probe', 'tripped', motion, 'probe_tripped')
-        updated += mergeDictionary(self, 'probe', 'value', motion, 'probe_val')
-        updated += mergeDictionary(self, 'probe', 'position', motion, 'probed_position')
-        updated += mergeDictionary(self, 'spindle', 'brake', motion, 'spindle_brake')
-        updated += mergeDictionary(self, 'spindle', 'dir', motion, 'spindle_direction')
-        updated += mergeDictionary(self, 'spindle', 'enabled', motion, 'spindle_enabled')
-        updated += mergeDictionary(self, 'spindle', 'increasing', motion, 'spindle_increasing')
-        updated += mergeDictionary(self, 'spindle', 'override', motion, 'spindle_override_enabled')
-        updated += mergeDictionary(self, 'spindle', 'speed', motion, 'spindle_speed')
-        updated += mergeDictionary(self, 'spindle', 'rate', motion, 'spindlerate')
-        updated += mergeDictionary(self, 'queue', 'active', motion, 'active_queue')
-        updated += mergeDictionary(self, 'queue', 'current', motion, 'queue')
-        updated += mergeDictionary(self, 'queue', 'full', motion, 'queue_full')
-        updated += mergeDictionary(self, 'max', 'velocity', motion, 'max_velocity')
-        updated += mergeDictionary(self, 'max', 'acceleration', motion, 'max_acceleration')
-
+        updated = self.Merge.merge(self, motion)
+        if self.arrays:
+            self.arrays.merged(self, updated)
+        if not self.telemetry is None:
+            self.telemetry.sample(self)
+        if self.monitor:
+            self.monitor.sample(self, updated)
         return updated
 
-class MKTool:
+class MKTool(object):
     '''POD class to track a tool stored in MK's tooltable.'''
 
+    __slots__ = ('index', 'id', 'diameter', 'frontangle', 'backangle', 'orientation', 'offset', 'comment', 'pocket')
+
+    Merge = MKMerge(EmcToolData.DESCRIPTOR, [
+        ruleMember('id'),
+        ruleMember('diameter'),
+        ruleMember('frontangle'),
+        ruleMember('backangle'),
+        ruleMember('orientation'),
+        ruleMember('comment'),
+        ruleMember('pocket'),
+        rulePosition('offset', 'offset'),
+        ])
+
     def __init__(self, tool):
         self.index = tool.index
         self.id = tool.id
@@ -454,23 +692,27 @@ class MKTool:
         self.comment = ''
         self.pocket = tool.pocket
 
-    def merge(self, container):
-        updated = []
-        for tool in container.tool_table:
-            if tool.index == self.index:
-                updated += mergeMember(self, 'id', tool)
-                updated += mergeMember(self, 'diameter', tool)
-                updated += mergeMember(self, 'frontangle', tool)
-                updated += mergeMember(self, 'backangle', tool)
-                updated += mergeMember(self, 'orientation', tool)
-                updated += mergeMember(self, 'comment', tool)
-                updated += mergeMember(self, 'pocket', tool)
-                updated += mergePosition(self, None, 'offset', tool, 'offset')
-        return ["tool.table.%d.%s" % (self.index, u) for u in updated]
+    def merge(self, tool):
+        '''merge(tool) ... update the receiver with the tool proto, see MKIndexedList.'''
+        return self.Merge.merge(self, tool)
 
 class MKServiceStatusHandlerIO(MKServiceStatusHandler):
     '''Class tracking all status.io attributes and updates.'''
 
+    __slots__ = ('estop', 'flood', 'lube', 'lube_level', 'mist', 'tool', 'pocket_prepped')
+
+    Merge = MKMerge(EmcStatusIo.DESCRIPTOR, [
+        ruleMember('estop'),
+        ruleMember('flood'),
+        ruleMember('lube'),
+        ruleMember('lube_level'),
+        ruleMember('mist'),
+        ruleMember('pocket_prepped'),
+        rulePosition('tool.offset', 'tool_offset'),
+        ruleDictionary('tool', 'nr', 'tool_in_spindle'),
+        ruleIndexed('tool.table', 'tool_table'),
+        ])
+
     def topicName(self):
         return 'status.io'
 
@@ -485,34 +727,34 @@ class MKServiceStatusHandlerIO(MKServiceStatusHandler):
         self.mist = io.mist
         self.tool = {}
         self.tool['offset'] = defaultPosition()
-        self.tool['table'] = [MKTool(tool) for tool in io.tool_table]
+        self.tool['table'] = MKIndexedList(MKTool, io.tool_table)
         self.tool['nr'] = io.tool_in_spindle
         self.pocket_prepped = io.pocket_prepped
 
         return self.processIncremental(io)
 
     def processIncremental(self, io):
-        updated = []
-
-        updated += mergeMember(self, 'estop', io)
-        updated += mergeMember(self, 'flood', io)
-        updated += mergeMember(self, 'lube', io)
-        updated += mergeMember(self, 'lube_level', io)
-        updated += mergeMember(self, 'mist', io)
-        updated += mergeMember(self, 'pocket_prepped', io)
-
-        updated += mergePosition(self, 'tool', 'offset', io, 'tool_offset')
-        updated += mergeDictionary(self, 'tool', 'nr', io, 'tool_in_spindle')
-
-        for tool in self.tool['table']:
-            updated += tool.merge(io)
-
-        return updated
+        return self.Merge.merge(self, io)
 
 
 class MKServiceStatusHandlerTask(MKServiceStatusHandler):
     '''Class to track all status.task attributes and updates.'''
 
+    __slots__ = ('serial', 'state', 'file', 'input_timeout', 'optional_stop', 'line', 'task')
+
+    Merge = MKMerge(EmcStatusTask.DESCRIPTOR, [
+        ruleMember('serial', 'echo_serial_number'),
+        ruleMember('state', 'exec_state'),
+        ruleMember('file'),
+        ruleMember('input_timeout'),
+        ruleMember('optional_stop'),
+        ruleDictionary('line', 'nr', 'read_line'),
+        ruleDictionary('line', 'total', 'total_lines'),
+        ruleDictionary('task', 'mode', 'task_mode'),
+        ruleDictionary('task', 'state', 'task_state'),
+        ruleDictionary('task', 'paused', 'task_paused'),
+        ])
+
     def topicName(self):
         return 'status.task'
 
@@ -531,24 +773,122 @@ class MKServiceStatusHandlerTask(MKServiceStatusHandler):
         return self.processIncremental(task)
 
     def processIncremental(self, task):
-        updated = []
+        return self.Merge.merge(self, task)
+
+
+def gcodeName(value):
+    '''gcodeName(value) ... return the G-code of the interp value, which is the code times 10 (e.g. 591 is 'G59.1').'''
+    return "G%d" % (value // 10) if value % 10 == 0 else "G%d.%d" % (value // 10, value % 10)
+
+def mergeCodes(codes, protos):
+    '''mergeCodes(codes, protos) ... return the list of (index, value) of codes with the values of
+    the gcode or mcode protos merged in, or None if none of the values changed.'''
+    current = dict(codes)
+    changed = False
+    for code in protos:
+        if current.get(code.index) != code.value:
+            current[code.index] = code.value
+            changed = True
+    return sorted(current.items()) if changed else None
+
+class MKModalState(object):
+    '''Decoded modal state of the interpreter from the active gcodes and mcodes of status.interp.
+    G-code groups hold the active code (e.g. plane = 'G17', wcs = 'G59.1'), spindle the active M-code
+    ('M3', 'M4' or 'M5'), mist and flood whether the coolant is on. Groups MK didn't report are None.'''
+
+    __slots__ = ('motion', 'plane', 'units', 'distance', 'arcDistance', 'feedMode', 'wcs', 'cutterComp',
+            'toolLength', 'retract', 'pathControl', 'latheMode', 'spindleMode', 'spindle', 'mist', 'flood', 'overrides')
+
+    # The position of a group in the gcodes vector differs between MK versions, but each modal
+    # G-code is unique to its group. Index 0 is the sequence number, 1 the motion mode and 2 the
+    # non-modal code of the current block, all others are decoded by value.
+    GCodes = {
+            'plane'       : [170, 171, 180, 181, 190, 191],
+            'units'       : [200, 210],
+            'distance'    : [900, 910],
+            'arcDistance' : [901, 911],
+            'feedMode'    : [930, 940, 950],
+            'wcs'         : [540, 550, 560, 570, 580, 590, 591, 592, 593],
+            'cutterComp'  : [400, 410, 411, 420, 421],
+            'toolLength'  : [430, 431, 432, 433, 490],
+            'retract'     : [980, 990],
+            'pathControl' : [610, 611, 640],
+            'latheMode'   : [70, 80],
+            'spindleMode' : [960, 970],
+            }
+    GCodeGroup = {value: group for group, values in GCodes.items() for value in values}
+
+    def __init__(self, gcodes, mcodes):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        self.mist = False
+        self.flood = False
+        for index, value in gcodes:
+            if index == 1:
+                if value >= 0:
+                    self.motion = gcodeName(value)
+            elif index > 2:
+                group = self.GCodeGroup.get(value)
+                if group:
+                    setattr(self, group, gcodeName(value))
+        for index, value in mcodes:
+            if index > 0:
+                if value in (3, 4, 5):
+                    self.spindle = "M%d" % value
+                elif value == 7:
+                    self.mist = True
+                elif value == 8:
+                    self.flood = True
+                elif value in (48, 49):
+                    self.overrides = "M%d" % value
+
+    def _values(self):
+        return tuple([getattr(self, name) for name in self.__slots__])
+
+    def __eq__(self, other):
+        return type(other) == MKModalState and self._values() == other._values()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def codes(self):
+        '''Return the list of all active codes, G-codes first.'''
+        codes = [getattr(self, name) for name in ['motion'] + list(self.GCodes) + ['spindle']]
+        if self.mist:
+            codes.append('M7')
+        if self.flood:
+            codes.append('M8')
+        if not (self.mist or self.flood):
+            codes.append('M9')
+        codes.append(self.overrides)
+        return [code for code in codes if code]
+
+    def isMetric(self):
+        '''Return True if the program units are mm.'''
+        return self.units == 'G21'
+
+    def isAbsolute(self):
+        '''Return True if the distance mode is absolute.'''
+        return self.distance == 'G90'
+
+    def __repr__(self):
+        return "MKModalState(%s)" % ' '.join(self.codes())
 
-        updated += mergeMember(self, 'serial', task, 'echo_serial_number')
-        updated += mergeMember(self, 'state', task, 'exec_state')
-        updated += mergeMember(self, 'file', task)
-        updated += mergeMember(self, 'input_timeout', task)
-        updated += mergeMember(self, 'optional_stop', task)
-        updated += mergeDictionary(self, 'line', 'nr', task, 'read_line')
-        updated += mergeDictionary(self, 'line', 'total', task, 'total_lines')
-        updated += mergeDictionary(self, 'task', 'mode', task, 'task_mode')
-        updated += mergeDictionary(self, 'task', 'state', task, 'task_state')
-        updated += mergeDictionary(self, 'task', 'paused', task, 'task_paused')
+class MKServiceStatusHandlerInterpreter(MKServiceStatusHandler):
+    '''Class to track all status.interp attributes and updates. The gcodes and mcodes are only
+    reported if any of their values changed, their decoded state is kept in modal.'''
 
-        return updated
+    __slots__ = ('command', 'state', 'error', 'units', 'gcodes', 'mcodes', 'settings', 'modal')
 
-
-class MKServiceStatusHandlerInterpreter(MKServiceStatusHandler):
-    '''Class to track all status.interp attributes and updates.'''
+    Merge = MKMerge(EmcStatusInterp.DESCRIPTOR, [
+        ruleMember('command'),
+        ruleMember('state', 'interp_state'),
+        ruleMember('error', 'interpreter_errcode'),
+        ruleMember('units', 'program_units'),
+        ])
 
     def topicName(self):
         return 'status.interp'
@@ -564,33 +904,39 @@ class MKServiceStatusHandlerInterpreter(MKServiceStatusHandler):
         self.gcodes = []
         self.mcodes = []
         self.settings = {}
+        self.modal = MKModalState([], [])
 
         updated = self.processIncremental(interp)
 
         # make sure gcodes and mcodes are included although the list might be empty
-        if not 'gcodes' in updated:
-            updated.append('gcodes')
-        if not 'mcodes' in updated:
-            updated.append('mcodes')
+        for name in ['gcodes', 'mcodes', 'modal']:
+            if not name in updated:
+                updated.append(name)
 
         return updated
 
     def processIncremental(self, interp):
-        updated = []
-
-        updated += mergeMember(self, 'command', interp)
-        updated += mergeMember(self, 'state', interp, 'interp_state')
-        updated += mergeMember(self, 'error', interp, 'interpreter_errcode')
-        updated += mergeMember(self, 'units', interp, 'program_units')
-
-        gcodes = len(self.gcodes)
-        self.gcodes = [(code.index, code.value) for code in interp.gcodes]
-        if self.gcodes or gcodes > 0:
-            updated.append('gcodes')
-        mcodes = len(self.mcodes)
-        self.mcodes = [(code.index, code.value) for code in interp.mcodes]
-        if self.mcodes or mcodes > 0:
-            updated.append('mcodes')
+        updated = self.Merge.merge(self, interp)
+
+        changed = False
+        if interp.gcodes:
+            gcodes = mergeCodes(self.gcodes, interp.gcodes)
+            if not gcodes is None:
+                self.gcodes = gcodes
+                updated.append('gcodes')
+                changed = True
+        if interp.mcodes:
+            mcodes = mergeCodes(self.mcodes, interp.mcodes)
+            if not mcodes is None:
+                self.mcodes = mcodes
+                updated.append('mcodes')
+                changed = True
+        if changed:
+            # the sequence number changes with every block, the modal state hardly ever
+            modal = MKModalState(self.gcodes, self.mcodes)
+            if modal != self.modal:
+                self.modal = modal
+                updated.append('modal')
 
         for setting in interp.settings:
             if setting.index == 0:
@@ -609,6 +955,8 @@ class MKServiceStatusHandlerInterpreter(MKServiceStatusHandler):
 class MKServiceStatus(MKServiceSubscribe):
     '''Gets and displayes the emc status with the help of the ....Handler... classes above.'''
 
+    CompiledPaths = 512 # max number of compiled path accessors kept in the cache
+
     def __init__(self, context, name, properties):
         MKServiceSubscribe.__init__(self, context, name, properties)
         self.handler = {
@@ -619,6 +967,15 @@ class MKServiceStatus(MKServiceSubscribe):
                 'task':   MKServiceStatusHandlerTask()
                 }
         self.pingme = []
+        self.compiled = {}     # path -> (handler, generation, getter), read by the GUI and the I/O thread
+        self.compiledLock = threading.Lock()
+        self.version = 0       # number of messages applied which changed the status
+        self.snapshot = None   # MKStatusSnapshot of version, if enabled
+        self.snapshotValues = {} # topic -> values of snapshot, never modified once published
+        self.snapshotPending = {} # topic -> paths updated since snapshot, None if all of them
+        self.snapshotGetters = {}
+        self.store = None      # MKStatusStore, if the status gets saved
+        self.stale = set()     # topics whose status was preloaded and not yet updated by MK
 
     def topicNames(self):
         return ['motion', 'config', 'io', 'task', 'interp']
@@ -629,6 +986,36 @@ class MKServiceStatus(MKServiceSubscribe):
             return self.handler[path[0]][path[1:]]
         return self.handler[path[0]]
 
+    def get(self, path):
+        '''get(path) ... return the attribute for the dotted path, e.g. 'motion.position.actual.x'.
+        The path is compiled into an accessor on first use which is cached until the handler
+        processes the next full update. Once the cache is full the oldest accessor is evicted.'''
+        entry = self.compiled.get(path)
+        if entry:
+            handler, generation, getter = entry
+            if handler.generation == generation:
+                return getter(handler)
+        topic, _, rest = path.partition('.')
+        handler = self.handler[topic]
+        if not rest:
+            return handler
+        if not handler.valid:
+            return None
+        names = rest.split('.')
+        try:
+            getter = compilePath(handler, names)
+        except (AttributeError, KeyError, IndexError, ValueError):
+            # let the handler deal with the error
+            return handler[names]
+        # lookups don't need the lock, only concurrent inserts and evictions have to be serialised
+        with self.compiledLock:
+            compiled = self.compiled
+            compiled.pop(path, None)
+            compiled[path] = (handler, handler.generation, getter)
+            if len(compiled) > self.CompiledPaths:
+                del compiled[next(iter(compiled))]
+        return getter(handler)
+
     def isValid(self, topics=None):
         '''Return True if all topics are registered and valid.'''
         if topics is None:
@@ -639,19 +1026,132 @@ class MKServiceStatus(MKServiceSubscribe):
                 return False
         return True
 
-    def process(self, container):
+    def isStale(self, topic=None):
+        '''isStale(topic=None) ... return True if topic, or any topic if None, still holds the preloaded
+        status instead of the one from MK.'''
+        if topic is None:
+            return len(self.stale) != 0
+        return topic in self.stale
+
+    def preload(self, containers):
+        '''preload(containers) ... apply the full updates of a previously saved status, see MKStatusStore.
+        All topics updated are stale until MK sends its full update.'''
+        self.processBatch(containers)
+        for container in containers:
+            handler = self.handlerFor(container)
+            if handler:
+                self.stale.add(handler.topicName()[7:])
+
+    def handlerFor(self, container):
+        '''handlerFor(container) ... return the handler responsible for the given container, or None.'''
         if container.HasField('emc_status_config'):
-            self.handler['config'].process(container)
-        elif container.HasField('emc_status_interp'):
-            self.handler['interp'].process(container)
-        elif container.HasField('emc_status_io'):
-            self.handler['io'].process(container)
-        elif container.HasField('emc_status_motion'):
-            self.handler['motion'].process(container)
-        elif container.HasField('emc_status_task'):
-            self.handler['task'].process(container)
-        else:
-            PathLog.notice("status[%s]: %s" % (container.type, [s[0].name for s in container.ListFields()]))
+            return self.handler['config']
+        if container.HasField('emc_status_interp'):
+            return self.handler['interp']
+        if container.HasField('emc_status_io'):
+            return self.handler['io']
+        if container.HasField('emc_status_motion'):
+            return self.handler['motion']
+        if container.HasField('emc_status_task'):
+            return self.handler['task']
+        PathLog.notice("status[%s]: %s" % (container.type, [s[0].name for s in container.ListFields()]))
+        return None
+
+    def enableSnapshots(self):
+        '''Start tracking the changes for MKStatusSnapshot and publish the first one, from then on a new
+        snapshot is published after each processed batch, see MKSnapshot and publishSnapshot.
+        Must be called with the Machinekit lock held.'''
+        if self.snapshot is None:
+            for topic, handler in self.handler.items():
+                if handler.valid:
+                    self.snapshotValues[topic] = {p: freeze(self._snapshotValue(handler, p)) for p in handler.fullUpdated}
+            self.snapshot = MKStatusSnapshot(self.version, {t: types.MappingProxyType(v) for t, v in self.snapshotValues.items()})
+
+    def publishSnapshot(self):
+        '''Publish the MKStatusSnapshot of the current version and return it. Only the paths updated since
+        the last snapshot are frozen, all other values are shared with it. Called by the I/O thread once
+        per processed batch, must be called with the Machinekit lock held.'''
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        if self.snapshotPending or snapshot.version != self.version:
+            topics = dict(snapshot.topics)
+            for topic, paths in self.snapshotPending.items():
+                handler = self.handler[topic]
+                if paths is None:
+                    values = {}
+                    paths = handler.fullUpdated
+                else:
+                    values = self.snapshotValues.get(topic, {}).copy()
+                for path in paths:
+                    values[path] = freeze(self._snapshotValue(handler, path))
+                self.snapshotValues[topic] = values
+                topics[topic] = types.MappingProxyType(values)
+            self.snapshotPending = {}
+            self.snapshot = MKStatusSnapshot(self.version, topics)
+        return self.snapshot
+
+    def _snapshotValue(self, handler, path):
+        entry = self.snapshotGetters.get((handler, path))
+        if entry is None or entry[0] != handler.generation:
+            entry = (handler.generation, compilePath(handler, path.split('.')))
+            self.snapshotGetters[(handler, path)] = entry
+        return entry[1](handler)
+
+    def _applied(self, handler, updated):
+        '''Internal - account for a message which updated the given paths of handler. Nothing is copied
+        or frozen here, the next published snapshot picks up all paths updated by the batch.'''
+        self.version += 1
+        if self.snapshot:
+            topic = handler.topicName()[7:]
+            pending = self.snapshotPending
+            if updated is handler.fullUpdated:
+                # a full update replaces all values of the topic
+                pending[topic] = None
+            else:
+                paths = pending.get(topic, ())
+                if paths == ():
+                    pending[topic] = set(updated)
+                elif not paths is None:
+                    paths.update(updated)
+
+    def _tracked(self, handler, container):
+        '''Internal - account for a message which updated handler in the store and the stale topics.'''
+        if self.store or self.stale:
+            topic = handler.topicName()[7:]
+            if self.store:
+                self.store.track(topic, container)
+            if container.type == MT_EMCSTAT_FULL_UPDATE:
+                self.stale.discard(topic)
+
+    def process(self, container):
+        handler = self.handlerFor(container)
+        if handler:
+            updated = handler.update(container)
+            if updated:
+                self._tracked(handler, container)
+                self._applied(handler, updated)
+                if self.snapshot:
+                    self.publishSnapshot()
+                handler.notifyObservers(handler.paths.updated(updated))
+
+    def processBatch(self, containers):
+        '''Apply all containers, but notify the observers of each handler only once with all
+        attributes updated by the entire batch. Incremental updates only carry the changed
+        values so none of them can be dropped, it's the notifications which get conflated.'''
+        updates = {}
+        for container in containers:
+            handler = self.handlerFor(container)
+            if handler:
+                updated = handler.update(container)
+                if updated:
+                    self._tracked(handler, container)
+                    self._applied(handler, updated)
+                    updates[handler] = updates.get(handler, 0) | handler.paths.mask(updated)
+        if updates and self.snapshot:
+            self.publishSnapshot()
+        for handler, mask in updates.items():
+            handler.notifyObservers(MKUpdated(mask, handler.paths))
 
     def ping(self):
         for observer in self.pingme:
@@ -0,0 +1,82 @@
+# Qt free signals used by the core classes to notify their clients.
+#
+# Most notifications originate in the I/O thread. Instead of calling the clients directly
+# the core classes post them to the installed backend, which decides in which thread and
+# when they get processed. The default backend processes everything right away in the
+# calling thread, which is what scripts and tools without an event loop want.
+#
+# The workbench installs a Qt backend (see MachinekitQt) which hands all notifications
+# over to the GUI thread.
+
+import threading
+
+class MKBoundSignal(object):
+    '''The signal of a specific object - see MKSignal.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = []
+
+    def connect(self, slot):
+        '''connect(slot) ... slot gets invoked with the arguments of each emit.'''
+        with self.lock:
+            self.slots = self.slots + [slot]
+
+    def disconnect(self, slot):
+        '''disconnect(slot) ... slot no longer gets invoked.'''
+        with self.lock:
+            self.slots = [s for s in self.slots if s != slot]
+
+    def emit(self, *args):
+        '''emit(*args) ... invoke all connected slots with the given arguments.'''
+        for slot in self.slots:
+            slot(*args)
+
+class MKSignal(object):
+    '''Declares a signal as class attribute, similar to Qt's Signal. Each instance of the
+    class gets its own MKBoundSignal with connect, disconnect and emit.'''
+
+    def __init__(self, *types):
+        self.types = types
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        signal = obj.__dict__.get(self.name)
+        if signal is None:
+            signal = obj.__dict__.setdefault(self.name, MKBoundSignal())
+        return signal
+
+class MKDirectBackend(object):
+    '''Default backend which processes all notifications right away in the calling thread.'''
+
+    def post(self, fn, *args):
+        '''post(fn, *args) ... invoke fn(*args).'''
+        fn(*args)
+
+    def postDelayed(self, ms, fn):
+        '''postDelayed(ms, fn) ... invoke fn(), there's no event loop to delay it.'''
+        fn()
+
+_Backend = MKDirectBackend()
+
+def setBackend(backend):
+    '''setBackend(backend) ... install backend for processing all notifications.'''
+    global _Backend
+    _Backend = backend
+
+def backend():
+    '''Return the currently installed backend.'''
+    return _Backend
+
+def post(fn, *args):
+    '''post(fn, *args) ... have the backend invoke fn(*args).'''
+    _Backend.post(fn, *args)
+
+def postDelayed(ms, fn):
+    '''postDelayed(ms, fn) ... have the backend invoke fn() after ms milliseconds.'''
+    _Backend.postDelayed(ms, fn)
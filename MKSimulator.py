@@ -0,0 +1,524 @@
+# Local stand-in for a Machinekit controller, used for tests and benchmarks.
+#
+# The simulator speaks the same protobuf/ZMQ protocol the MKService* classes consume:
+#   * status   ... XPUB, full update for each new subscriber, incremental updates after that
+#   * error    ... XPUB, see error(), text() and display()
+#   * command  ... ROUTER, every command is acknowledged with MT_EMCCMD_EXECUTED/COMPLETED
+#   * halrcomp ... XPUB, provides the fc_manualtoolchange component, see toolChange()
+#   * halrcmd  ... ROUTER, sets pins of fc_manualtoolchange
+# Optionally the services are also announced through the same JSON format as
+# machinekit-local/rest-services, which allows the workbench to discover the simulator.
+#
+# The simulated machine is very basic, it only tracks what the workbench needs: estop,
+# power, task mode, homing, jogging and the feed override. Additionally the tool can be
+# moved on a circle in the XY plane to generate a constant stream of motion updates at
+# the configured rate.
+#
+#   python3 MKSimulator.py --rate 200 --http 8088
+#
+# and add 'localhost:8088' to the REST servers in the workbench preferences.
+
+import argparse
+import http.server
+import json
+import machinetalk.protobuf.message_pb2 as MESSAGE
+import machinetalk.protobuf.object_pb2 as OBJECT
+import machinetalk.protobuf.status_pb2 as STATUS
+import machinetalk.protobuf.types_pb2 as TYPES
+import math
+import queue
+import threading
+import time
+import traceback
+import uuid
+import zmq
+
+import MachinekitInstance
+
+Axes = ['x', 'y', 'z']
+
+class MKSimulator(object):
+    '''A simulated MK instance, all services are served by a single thread.'''
+
+    KeepaliveMS = 2000
+
+    def __init__(self, name='mksim', rate=50, circle=False, host='127.0.0.1', http=None):
+        self.name = name
+        self.rate = rate
+        self.circle = circle
+        self.host = host
+        self.httpPort = http
+        self.uuid = str(uuid.uuid4())
+        self.context = zmq.Context()
+        self.socket = {}
+        self.dsn = {}
+        self.pending = queue.Queue()
+        self.thread = None
+        self.httpd = None
+        self.quit = False
+        self.suspended = False
+        self.published = 0
+
+        # the simulated machine
+        self.estop = True
+        self.enabled = False
+        self.mode = STATUS.EMC_TASK_MODE_MANUAL
+        self.homed = [False for axis in Axes]
+        self.position = {axis: 0.0 for axis in Axes}
+        self.jog = {}
+        self.feedrate = 1.0
+        self.line = 0
+        self.angle = 0.0
+        self.pin = {
+                'change'  : [1, TYPES.HAL_BIT, TYPES.HAL_IN,  False],
+                'changed' : [2, TYPES.HAL_BIT, TYPES.HAL_OUT, False],
+                'number'  : [3, TYPES.HAL_S32, TYPES.HAL_IN,  0],
+                }
+
+    # public interface
+
+    def start(self):
+        '''Bind all services and start serving them.'''
+        self._bind('status',   zmq.XPUB)
+        self._bind('error',    zmq.XPUB)
+        self._bind('command',  zmq.ROUTER)
+        self._bind('halrcomp', zmq.XPUB)
+        self._bind('halrcmd',  zmq.ROUTER)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        if not self.httpPort is None:
+            self.httpd = http.server.ThreadingHTTPServer((self.host, self.httpPort), self._requestHandler())
+            self.httpPort = self.httpd.server_address[1]
+            threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        '''Stop serving and close all sockets.'''
+        self.quit = True
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+        for socket in self.socket.values():
+            socket.close(linger=0)
+        self.socket = {}
+
+    def services(self):
+        '''Return a dictionary of all service announcements - in the format of rest-services.'''
+        services = {}
+        for s, dsn in self.dsn.items():
+            services[s] = {
+                    'dsn'      : dsn,
+                    'instance' : self.uuid,
+                    'name'     : "%s service on %s" % (s.capitalize(), self.name),
+                    'service'  : s,
+                    'uuid'     : self.uuid,
+                    }
+        return services
+
+    def instance(self):
+        '''Return a MachinekitInstance with all the simulator's endpoints, no discovery required.'''
+        instance = None
+        for s, props in self.services().items():
+            properties = {k.encode(): v.encode() for k, v in props.items()}
+            if instance is None:
+                instance = MachinekitInstance.MachinekitInstance(properties[b'uuid'], properties)
+            dsn = props['dsn'].split(':')
+            instance._addService(properties, props['name'], dsn[1].strip('/'), int(dsn[2]))
+        return instance
+
+    def suspend(self):
+        '''Stop responding and publishing, as if the network went down.'''
+        self.suspended = True
+
+    def resume(self):
+        '''Resume after suspend(), everything received in the meantime gets processed.'''
+        self.suspended = False
+
+    def error(self, msg):
+        '''Send an operator error notification.'''
+        self._call(self._notify, 'error', TYPES.MT_EMC_OPERATOR_ERROR, msg)
+
+    def text(self, msg):
+        '''Send an operator text notification.'''
+        self._call(self._notify, 'text', TYPES.MT_EMC_OPERATOR_TEXT, msg)
+
+    def display(self, msg):
+        '''Send an operator display notification.'''
+        self._call(self._notify, 'display', TYPES.MT_EMC_OPERATOR_DISPLAY, msg)
+
+    def toolChange(self, nr):
+        '''Request a manual tool change for tool nr through fc_manualtoolchange.'''
+        self._call(self._setPins, {'number': nr, 'change': True, 'changed': False})
+
+    # status containers
+
+    def _config(self, c):
+        config = c.emc_status_config
+        config.name = self.name
+        config.remote_path = '/tmp'
+        config.increments = '1.0000 mm,0.1000 mm,0.0100 mm'
+        config.axis_mask = 7
+        config.linear_units = STATUS.LINEAR_UNITS_MM
+        config.angular_units = STATUS.ANGULAR_UNITS_DEGREES
+        config.time_units = STATUS.TIME_UNITS_SECOND
+        config.max_velocity = 50
+        config.default_velocity = 10
+        config.min_feed_override = 0
+        config.max_feed_override = 2
+        config.min_spindle_override = 0
+        config.max_spindle_override = 1
+        config.default_spindle_speed = 1000
+        config.min_linear_velocity = 0
+        config.max_linear_velocity = 50
+        config.default_linear_velocity = 10
+        config.min_angular_velocity = 0
+        config.max_angular_velocity = 50
+        config.default_angular_velocity = 10
+        for i, name in enumerate(Axes):
+            axis = config.axis.add()
+            axis.index = i
+            axis.axis_type = 1
+            axis.min_position_limit = -200
+            axis.max_position_limit = 200
+            axis.min_ferror = 0.5
+            axis.max_ferror = 1
+            axis.home_sequence = 0 if name == 'z' else 1
+            axis.max_velocity = 50
+            axis.max_acceleration = 500
+
+    def _motionAxes(self, motion, full):
+        for i, name in enumerate(Axes):
+            axis = motion.axis.add()
+            axis.index = i
+            axis.homed = self.homed[i]
+            axis.velocity = self.jog.get(i, 0.0)
+            if full:
+                axis.enabled = True
+                axis.fault = False
+                axis.ferror_current = 0
+                axis.ferror_highmark = 0
+                axis.homing = False
+                axis.inpos = True
+                axis.input = self.position[name]
+                axis.output = self.position[name]
+                axis.override_limits = False
+                axis.min_soft_limit = False
+                axis.max_soft_limit = False
+                axis.min_hard_limit = False
+                axis.max_hard_limit = False
+
+    def _motionPosition(self, motion):
+        for name in Axes:
+            motion.actual_position.__setattr__(name, self.position[name])
+            motion.position.__setattr__(name, self.position[name])
+
+    def _motion(self, c):
+        motion = c.emc_status_motion
+        motion.enabled = self.enabled
+        motion.state = TYPES.RCS_DONE
+        motion.feedrate = self.feedrate
+        motion.rapidrate = 1.0
+        motion.feed_override_enabled = True
+        motion.spindle_enabled = False
+        motion.spindle_speed = 0
+        motion.motion_line = self.line
+        motion.current_vel = 0
+        motion.distance_to_go = 0
+        motion.g5x_index = 1
+        for name in Axes:
+            motion.g5x_offset.__setattr__(name, 0.0)
+            motion.g92_offset.__setattr__(name, 0.0)
+        self._motionAxes(motion, True)
+        self._motionPosition(motion)
+
+    def _io(self, c):
+        io = c.emc_status_io
+        io.estop = self.estop
+        io.flood = False
+        io.mist = False
+        io.lube = False
+        io.lube_level = 1
+        io.tool_in_spindle = self.pin['number'][3]
+        io.pocket_prepped = 0
+        for i in range(2):
+            tool = io.tool_table.add()
+            tool.index = i
+            tool.id = i
+            tool.diameter = 3.0 * i
+            tool.pocket = i
+
+    def _task(self, c):
+        task = c.emc_status_task
+        task.task_mode = self.mode
+        task.task_state = STATUS.EMC_TASK_STATE_ON if self.enabled else (STATUS.EMC_TASK_STATE_ESTOP if self.estop else STATUS.EMC_TASK_STATE_ESTOP_RESET)
+        task.exec_state = STATUS.EMC_TASK_EXEC_DONE
+        task.file = ''
+        task.total_lines = 0
+        task.read_line = 0
+
+    def _interp(self, c):
+        interp = c.emc_status_interp
+        interp.interp_state = STATUS.EMC_TASK_INTERP_IDLE
+        interp.program_units = STATUS.CANON_UNITS_MM
+        for i, value in enumerate([0, 800, 0, 170, 400, 200, 900, 940, 210, 1, 490, 990, 640, 400, 540, 21]):
+            code = interp.gcodes.add()
+            code.index = i
+            code.value = value
+        for i, value in enumerate([0, 5, 9, 48, 53]):
+            code = interp.mcodes.add()
+            code.index = i
+            code.value = value
+
+    # protocol
+
+    def _bind(self, service, typ):
+        socket = self.context.socket(typ)
+        if typ == zmq.XPUB:
+            socket.setsockopt(zmq.XPUB_VERBOSE, 1)
+        port = socket.bind_to_random_port("tcp://%s" % self.host)
+        self.socket[service] = socket
+        self.dsn[service] = "tcp://%s:%d" % (self.host, port)
+
+    def _call(self, fn, *args):
+        self.pending.put((fn, args))
+
+    def _publish(self, service, topic, container):
+        self.socket[service].send_multipart([topic.encode(), container.SerializeToString()])
+        self.published += 1
+
+    def _status(self, topic, full):
+        c = MESSAGE.Container()
+        c.type = TYPES.MT_EMCSTAT_FULL_UPDATE if full else TYPES.MT_EMCSTAT_INCREMENTAL_UPDATE
+        if full:
+            c.pparams.keepalive_timer = self.KeepaliveMS
+        getattr(self, "_%s" % topic)(c)
+        return c
+
+    def _statusIncremental(self, topic, fill):
+        c = MESSAGE.Container()
+        c.type = TYPES.MT_EMCSTAT_INCREMENTAL_UPDATE
+        fill(c)
+        self._publish('status', topic, c)
+
+    def _notify(self, topic, typ, msg):
+        c = MESSAGE.Container()
+        c.type = typ
+        c.note.append(msg)
+        self._publish('error', topic, c)
+
+    def _component(self):
+        c = MESSAGE.Container()
+        c.type = TYPES.MT_HALRCOMP_FULL_UPDATE
+        c.pparams.keepalive_timer = self.KeepaliveMS
+        comp = c.comp.add()
+        comp.name = 'fc_manualtoolchange'
+        comp.comp_id = 1
+        comp.type = 0
+        for name, (handle, typ, direction, value) in self.pin.items():
+            pin = comp.pin.add()
+            pin.name = "fc_manualtoolchange.%s" % name
+            pin.handle = handle
+            pin.type = typ
+            pin.dir = direction
+            self._pinValue(pin, typ, value)
+        return c
+
+    def _pinValue(self, pin, typ, value):
+        if typ == TYPES.HAL_BIT:
+            pin.halbit = value
+        else:
+            pin.hals32 = value
+
+    def _setPins(self, values):
+        c = MESSAGE.Container()
+        c.type = TYPES.MT_HALRCOMP_INCREMENTAL_UPDATE
+        for name, value in values.items():
+            p = self.pin[name]
+            p[3] = value
+            pin = c.pin.add()
+            pin.handle = p[0]
+            self._pinValue(pin, p[1], value)
+        self._publish('halrcomp', 'fc_manualtoolchange', c)
+
+    def _subscribed(self, service, msg):
+        if msg and msg[0] == 1:
+            topic = msg[1:].decode()
+            if service == 'status':
+                self._publish(service, topic, self._status(topic, True))
+            elif service == 'halrcomp':
+                if topic == 'fc_manualtoolchange':
+                    self._publish(service, topic, self._component())
+                else:
+                    c = MESSAGE.Container()
+                    c.type = TYPES.MT_HALRCOMP_ERROR
+                    c.note.append("component %s does not exist" % topic)
+                    self._publish(service, topic, c)
+
+    def _reply(self, service, identity, ticket, typ):
+        c = MESSAGE.Container()
+        c.type = typ
+        c.reply_ticket = ticket
+        self.socket[service].send_multipart([identity, c.SerializeToString()])
+
+    def _acknowledge(self, service, identity):
+        c = MESSAGE.Container()
+        c.type = TYPES.MT_PING_ACKNOWLEDGE
+        self.socket[service].send_multipart([identity, c.SerializeToString()])
+
+    def _command(self, identity, buf):
+        rx = MESSAGE.Container()
+        rx.ParseFromString(buf)
+        if rx.type == TYPES.MT_PING:
+            self._acknowledge('command', identity)
+            return
+        self._reply('command', identity, rx.ticket, TYPES.MT_EMCCMD_EXECUTED)
+        params = rx.emc_command_params
+        if rx.type == TYPES.MT_EMC_TASK_SET_STATE:
+            if params.task_state == STATUS.EMC_TASK_STATE_ESTOP:
+                self.estop = True
+                self.enabled = False
+            elif params.task_state == STATUS.EMC_TASK_STATE_ESTOP_RESET:
+                self.estop = False
+            elif params.task_state == STATUS.EMC_TASK_STATE_ON:
+                self.enabled = not self.estop
+            elif params.task_state == STATUS.EMC_TASK_STATE_OFF:
+                self.enabled = False
+            self._statusIncremental('io', lambda c: setattr(c.emc_status_io, 'estop', self.estop))
+            self._statusIncremental('motion', lambda c: setattr(c.emc_status_motion, 'enabled', self.enabled))
+            self._statusIncremental('task', self._task)
+        elif rx.type == TYPES.MT_EMC_TASK_SET_MODE:
+            self.mode = params.task_mode
+            self._statusIncremental('task', lambda c: setattr(c.emc_status_task, 'task_mode', self.mode))
+        elif rx.type in [TYPES.MT_EMC_AXIS_HOME, TYPES.MT_EMC_AXIS_UNHOME]:
+            self.homed[params.index] = rx.type == TYPES.MT_EMC_AXIS_HOME
+            self._statusIncremental('motion', lambda c: self._motionAxes(c.emc_status_motion, False))
+        elif rx.type == TYPES.MT_EMC_AXIS_JOG:
+            self.jog[params.index] = params.velocity
+        elif rx.type == TYPES.MT_EMC_AXIS_INCR_JOG:
+            self.position[Axes[params.index]] += params.distance
+        elif rx.type == TYPES.MT_EMC_AXIS_ABORT:
+            self.jog.pop(params.index, None)
+        elif rx.type == TYPES.MT_EMC_TRAJ_SET_SCALE:
+            self.feedrate = params.scale
+            self._statusIncremental('motion', lambda c: setattr(c.emc_status_motion, 'feedrate', self.feedrate))
+        self._reply('command', identity, rx.ticket, TYPES.MT_EMCCMD_COMPLETED)
+
+    def _halCommand(self, identity, buf):
+        rx = MESSAGE.Container()
+        rx.ParseFromString(buf)
+        if rx.type == TYPES.MT_PING:
+            self._acknowledge('halrcmd', identity)
+        elif rx.type == TYPES.MT_HALRCOMP_SET:
+            values = {}
+            for pin in rx.pin:
+                for name, p in self.pin.items():
+                    if p[0] == pin.handle:
+                        values[name] = pin.halbit if p[1] == TYPES.HAL_BIT else pin.hals32
+            if values.get('changed'):
+                values['change'] = False
+                self._statusIncremental('io', lambda c: setattr(c.emc_status_io, 'tool_in_spindle', self.pin['number'][3]))
+            self._setPins(values)
+
+    def _ping(self):
+        c = MESSAGE.Container()
+        c.type = TYPES.MT_PING
+        c.pparams.keepalive_timer = self.KeepaliveMS
+        for topic in ['motion', 'config', 'io', 'task', 'interp']:
+            self._publish('status', topic, c)
+        for topic in ['error', 'text', 'display']:
+            self._publish('error', topic, c)
+        self._publish('halrcomp', 'fc_manualtoolchange', c)
+
+    def _move(self, dt):
+        moved = False
+        for index, velocity in self.jog.items():
+            self.position[Axes[index]] += velocity * dt
+            moved = True
+        if self.circle:
+            self.angle += dt
+            self.position['x'] = 50 * math.cos(self.angle)
+            self.position['y'] = 50 * math.sin(self.angle)
+            self.line += 1
+            moved = True
+        if moved:
+            def fill(c):
+                self._motionPosition(c.emc_status_motion)
+                c.emc_status_motion.motion_line = self.line
+            self._statusIncremental('motion', fill)
+
+    def run(self):
+        poller = zmq.Poller()
+        for socket in self.socket.values():
+            poller.register(socket, zmq.POLLIN)
+        service = {socket: s for s, socket in self.socket.items()}
+        period = 1.0 / self.rate
+        last = time.monotonic()
+        lastPing = last
+        while not self.quit:
+            if self.suspended:
+                time.sleep(0.05)
+                last = time.monotonic()
+                continue
+            timeout = max(0, last + period - time.monotonic())
+            for socket, event in poller.poll(1000 * timeout):
+                s = service[socket]
+                try:
+                    if socket.type == zmq.XPUB:
+                        self._subscribed(s, socket.recv())
+                    elif s == 'command':
+                        self._command(*socket.recv_multipart())
+                    else:
+                        self._halCommand(*socket.recv_multipart())
+                except Exception:
+                    traceback.print_exc()
+            while not self.pending.empty():
+                fn, args = self.pending.get()
+                fn(*args)
+            now = time.monotonic()
+            if (now - last) >= period:
+                self._move(now - last)
+                last = now
+            if (now - lastPing) * 1000 >= self.KeepaliveMS:
+                self._ping()
+                lastPing = now
+
+    def _requestHandler(self):
+        simulator = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                services = simulator.services()
+                req = self.path[1:]
+                if req != 'machinekit':
+                    services = {s: p for s, p in services.items() if req in [s, p['uuid'], p['instance']]}
+                self.send_response(200 if services else 404)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps(services, indent=2).encode())
+                self.wfile.write(b'\n')
+
+            def log_message(self, format, *args):
+                pass
+
+        return RequestHandler
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulated Machinekit instance')
+    parser.add_argument('--name', help='name of the simulated MK instance', default='mksim')
+    parser.add_argument('--rate', help='motion updates per second', type=float, default=50)
+    parser.add_argument('--circle', help='continuously move the tool on a circle', action='store_true')
+    parser.add_argument('--host', help='address to bind all services to', default='127.0.0.1')
+    parser.add_argument('--http', help='port to announce the services on (rest-services)', type=int, default=8088)
+    args = parser.parse_args()
+
+    sim = MKSimulator(args.name, args.rate, args.circle, args.host, args.http).start()
+    for s, props in sorted(sim.services().items()):
+        print("%-10s %s" % (s, props['dsn']))
+    print("announced on http://%s:%d/machinekit" % (args.host, sim.httpPort))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sim.stop()
@@ -0,0 +1,121 @@
+# Immutable versioned snapshots of the MK status.
+#
+# The status handlers merge updates into their containers in place, a reader in a different
+# thread than the I/O thread could observe a half merged update. Machinekit.snapshot returns
+# an MKStatusSnapshot of the status at that moment, it is never modified and can be read from
+# any thread without holding a lock. Once snapshots are in use MKServiceStatus keeps track of
+# the paths updated by each message and the I/O thread publishes a new snapshot after each
+# batch it processed, reading the current one is a plain attribute access.
+#
+# Each snapshot holds a read-only mapping per topic of all status paths to their frozen
+# values, mappings become read-only dictionaries, lists and containers become tuples. A new
+# snapshot only copies the mappings of the topics which were updated and only freezes the
+# updated values, everything else is shared with the previous snapshot. Which is also why
+# the diff of two snapshots only has to look at the topics which changed:
+#
+#   before = mk.snapshot()
+#   ...
+#   after = mk.snapshot()
+#   print(after.version - before.version, after.diff(before), after['motion.position.actual.x'])
+
+import collections.abc
+import types
+
+_Missing = object()
+_Internal = ['valid', 'observers'] # slots of MKServiceContainer which aren't part of the status
+_Slots = {}
+
+def _slots(cls):
+    slots = _Slots.get(cls)
+    if slots is None:
+        slots = []
+        for c in cls.__mro__:
+            slots.extend([s for s in getattr(c, '__slots__', ()) if not s in _Internal and not s in slots])
+        _Slots[cls] = slots
+    return slots
+
+_Scalars = set([type(None), bool, int, float, str, bytes])
+
+def freeze(value):
+    '''freeze(value) ... return an immutable copy of the status value.'''
+    cls = type(value)
+    if cls in _Scalars:
+        return value
+    if hasattr(cls, 'asDict'):
+        # MKPosition, a mapping of floats
+        return types.MappingProxyType(value.asDict())
+    if isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, collections.abc.Mapping):
+        return types.MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple([freeze(v) for v in value])
+    return types.MappingProxyType({s: freeze(getattr(value, s)) for s in _slots(type(value)) if hasattr(value, s)})
+
+class MKStatusSnapshot(object):
+    '''Immutable state of all status topics at the given version.'''
+
+    __slots__ = ('version', 'topics')
+
+    def __init__(self, version, topics):
+        self.version = version
+        self.topics = types.MappingProxyType(topics)
+
+    def __getitem__(self, path):
+        '''Return the value of the status path, e.g. 'motion.position.actual', the 'status.' prefix is optional.
+        Raises KeyError if there is no such path.'''
+        if path.startswith('status.'):
+            path = path[7:]
+        topic, _, rest = path.partition('.')
+        values = self.topics[topic]
+        if not rest:
+            return values
+        value = values.get(rest, _Missing)
+        if value is _Missing:
+            # a path below a frozen value, like 'position.actual.x'
+            prefix = rest
+            keys = []
+            while value is _Missing and '.' in prefix:
+                prefix, _, key = prefix.rpartition('.')
+                keys.insert(0, key)
+                value = values.get(prefix, _Missing)
+            if value is _Missing:
+                # or a path above the frozen values, like 'axis.0'
+                below = rest + '.'
+                strip = len(below)
+                value = types.MappingProxyType({p[strip:]: v for p, v in values.items() if p.startswith(below)})
+                if not value:
+                    raise KeyError(path)
+                return value
+            for key in keys:
+                value = value[int(key)] if isinstance(value, tuple) else value[key]
+        return value
+
+    def get(self, path, default=None):
+        '''get(path, default=None) ... return the value of the status path, or default if there is none.'''
+        try:
+            return self[path]
+        except (KeyError, IndexError, ValueError):
+            return default
+
+    def diff(self, other):
+        '''diff(other) ... return the list of status paths whose values differ between the receiver and other.
+        Values are compared by equality, a path updated with the value it already had isn't reported.'''
+        paths = []
+        for topic, values in self.topics.items():
+            others = other.topics.get(topic)
+            if others is values:
+                continue
+            if others is None:
+                others = {}
+            for path, value in values.items():
+                previous = others.get(path, _Missing)
+                if not previous is value and (previous is _Missing or previous != value):
+                    paths.append("status.%s.%s" % (topic, path))
+            for path in others:
+                if not path in values:
+                    paths.append("status.%s.%s" % (topic, path))
+        for topic, others in other.topics.items():
+            if not topic in self.topics:
+                paths.extend(["status.%s.%s" % (topic, path) for path in others])
+        return paths
@@ -0,0 +1,167 @@
+# Persistent copy of the last full status of a MK instance.
+#
+# Nothing is known about a MK instance until the full updates of all status topics have been
+# received. To have something to show right away the status of each instance is saved to a
+# file named after its UUID (see Machinekit.statusStorePath). On startup an instance is created
+# for each of them, showing the saved status before MK is discovered, and the saved status is
+# preloaded again when the live status service gets connected. The preloaded status is stale
+# until the live full update of each topic replaced it, see MKServiceStatus.isStale.
+#
+# The store keeps the full update of each topic as it was received and merges all subsequent
+# incremental updates into it. All repeated fields of the status protos are indexed, an
+# element of an incremental update replaces the values of the element with the same index.
+# So the store always holds a single, compact full update per topic, which is what gets saved
+# as is. Incremental updates of status.motion arrive at servo rate and merging them would
+# double the cost of processing them, the store keeps the last full update of status.motion
+# only - the positions would be stale in any case, the axes are what is of interest.
+#
+# The file starts with Magic, followed by
+#   <d   ... time.time() the status was saved
+# and a record per topic:
+#   <B   ... length of the topic name
+#   <I   ... length of the serialised Container
+#   the topic name ('config', 'motion', ...)
+#   the Container of the full update
+#
+# A store file can also be loaded standalone for offline diagnosis:
+#
+#   python3 MKStatusStore.py ~/.cache/machinekit/<uuid>.mkstat
+#   status = MKStatusStore.status('<uuid>.mkstat')
+#   print(status['config.name'], status['io.tool_table'])
+
+import machinetalk.protobuf.message_pb2 as MESSAGE
+import machinetalk.protobuf.types_pb2 as TYPES
+import os
+import struct
+import time
+
+Magic  = b'MKSTAT\x01\n'
+Header = struct.Struct('<d')
+Record = struct.Struct('<BI')
+
+Topics = {
+        'config' : 'emc_status_config',
+        'interp' : 'emc_status_interp',
+        'io'     : 'emc_status_io',
+        'motion' : 'emc_status_motion',
+        'task'   : 'emc_status_task',
+        }
+
+def mergeIndexed(full, update):
+    '''mergeIndexed(full, update) ... merge the incremental status proto update into full. Unlike
+    MergeFrom the elements of repeated fields are merged into the element with the same index.'''
+    for field, value in update.ListFields():
+        if field.label == field.LABEL_REPEATED:
+            target = getattr(full, field.name)
+            byIndex = {element.index: element for element in target}
+            for element in value:
+                existing = byIndex.get(element.index)
+                if existing is None:
+                    target.add().CopyFrom(element)
+                else:
+                    mergeIndexed(existing, element)
+        elif field.message_type:
+            mergeIndexed(getattr(full, field.name), value)
+        else:
+            setattr(full, field.name, value)
+
+class MKStatusStore(object):
+    '''Keeps the full update of each status topic up to date, so it can be saved at any time.'''
+
+    Incremental = ['config', 'interp', 'io', 'task'] # topics whose incremental updates are merged
+
+    def __init__(self):
+        self.full = {}      # topic -> Container holding the full update of topic
+        self.dirty = False  # True if the status changed since it was saved last
+        self.saved = None   # time.monotonic() of the last save
+
+    def track(self, topic, container):
+        '''track(topic, container) ... account for the status update container of topic.'''
+        if container.type == TYPES.MT_EMCSTAT_FULL_UPDATE:
+            full = MESSAGE.Container()
+            full.CopyFrom(container)
+            self.full[topic] = full
+        elif topic in self.Incremental:
+            full = self.full.get(topic)
+            if full is None:
+                return
+            field = Topics[topic]
+            mergeIndexed(getattr(full, field), getattr(container, field))
+        else:
+            return
+        self.dirty = True
+
+    def serialise(self):
+        '''Return the contents of a store file with the current status.'''
+        buf = [Magic, Header.pack(time.time())]
+        for topic, container in self.full.items():
+            name = topic.encode()
+            data = container.SerializeToString()
+            buf.append(Record.pack(len(name), len(data)))
+            buf.append(name)
+            buf.append(data)
+        return b''.join(buf)
+
+    def save(self, path):
+        '''save(path) ... write the current status to the file path, replacing it atomically.'''
+        data = self.serialise()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = "%s.tmp" % path
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.dirty = False
+        self.saved = time.monotonic()
+
+def load(path):
+    '''load(path) ... return the time the store file path was saved and the list of its full update
+    Containers. Raises ValueError if path is not a status store file.'''
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(Magic) or len(data) < len(Magic) + Header.size:
+        raise ValueError("%s is not a MK status store" % path)
+    saved, = Header.unpack_from(data, len(Magic))
+    i = len(Magic) + Header.size
+    containers = []
+    while i + Record.size <= len(data):
+        nlen, dlen = Record.unpack_from(data, i)
+        i += Record.size
+        topic = data[i:i+nlen].decode()
+        i += nlen
+        if i + dlen > len(data) or not topic in Topics:
+            raise ValueError("%s is corrupt" % path)
+        container = MESSAGE.Container()
+        container.ParseFromString(data[i:i+dlen])
+        i += dlen
+        containers.append(container)
+    return saved, containers
+
+def status(path, context=None):
+    '''status(path, context=None) ... return a MKServiceStatus, which isn't connected to anything,
+    preloaded with the status of the store file path.'''
+    import zmq
+    from MKServiceStatus import MKServiceStatus
+    if context is None:
+        context = zmq.Context.instance()
+    properties = {b'service': b'status', b'uuid': b'store', b'dsn': b'inproc://status-store'}
+    service = MKServiceStatus(context, 'status', properties)
+    service.preload(load(path)[1])
+    return service
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Print the status saved in a MK status store file')
+    parser.add_argument('store', help='status store file')
+    args = parser.parse_args()
+
+    saved, containers = load(args.store)
+    service = status(args.store)
+    print("saved %s" % time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(saved)))
+    for topic in service.topicNames():
+        handler = service.handler[topic]
+        if handler.isValid():
+            for path in sorted(handler.fullUpdated):
+                print("status.%s.%s = %s" % (topic, path, service.get("%s.%s" % (topic, path))))
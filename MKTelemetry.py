@@ -0,0 +1,116 @@
+# Fixed memory ring buffer of motion telemetry.
+#
+# Once enabled (see Machinekit.enableTelemetry) the motion handler appends a sample after each
+# update it merged. A sample is a row of doubles:
+#   time           ... wall clock time of the update, time.time()
+#   x .. w         ... status.motion.position.actual
+#   current_vel    ... status.motion.current_vel
+#   feed.rate      ... status.motion.feed.rate
+#   spindle.speed  ... status.motion.spindle.speed
+#   velocity.N     ... status.motion.axis.N.velocity, for each axis
+#   ferror.N       ... status.motion.axis.N.ferror_current, for each axis
+#
+# All rows live in a single array which is allocated up front, once it's full the oldest
+# samples get overwritten. Appending a sample doesn't allocate anything, which is why the
+# telemetry can stay enabled in production and be looked at after a crash or a bad finish:
+#
+#   telemetry = mk.enableTelemetry(60000)
+#   ...
+#   telemetry.writeCSV(open('/tmp/telemetry.csv', 'w'))
+#   t = telemetry.asNumpy(last=1000)
+#
+# Samples are appended by the I/O thread, hold Machinekit.lock while exporting to make sure
+# the most recent row isn't written at the same time.
+
+import array
+import time
+
+from MKServiceStatus import MKPosition
+
+class MKTelemetry(object):
+    '''Ring buffer of the last length samples of the motion status.'''
+
+    Length = 30000
+
+    def __init__(self, length=None):
+        self.length = length if length else self.Length
+        self.axes = None
+        self.count = 0 # number of samples appended in total
+
+    def _layout(self, axes):
+        self.axes = list(axes)
+        self.columns = ['time'] + list(MKPosition.Axes) + ['current_vel', 'feed.rate', 'spindle.speed']
+        self.columns += ["velocity.%d" % i for i in self.axes]
+        self.columns += ["ferror.%d" % i for i in self.axes]
+        self.width = len(self.columns)
+        self.data = array.array('d', bytes(8 * self.width * self.length))
+        self.count = 0
+
+    def sample(self, motion):
+        '''sample(motion) ... append the current state of the motion handler.'''
+        axis = motion.axis
+        if self.axes is None or len(self.axes) != len(axis):
+            self._layout([a.index for a in axis])
+        width = self.width
+        o = (self.count % self.length) * width
+        data = self.data
+        data[o] = time.time()
+        data[o+1:o+10] = motion.position['actual'].data
+        data[o+10] = motion.current_vel
+        data[o+11] = motion.feed.get('rate', 0.0)
+        data[o+12] = motion.spindle.get('speed', 0.0)
+        o += 13
+        n = len(axis)
+        for i, a in enumerate(axis):
+            data[o+i] = a.velocity
+            data[o+n+i] = a.ferror_current
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.length)
+
+    def _ranges(self, last=None):
+        '''Return the (begin, end) row ranges of the last samples in chronological order.'''
+        size = len(self)
+        if not last is None and last < size:
+            size = last
+        end = self.count % self.length if self.count else 0
+        begin = end - size
+        if begin >= 0:
+            ranges = [(begin, end)]
+        else:
+            ranges = [(begin + self.length, self.length), (0, end)]
+        return [(b, e) for b, e in ranges if b < e]
+
+    def rows(self, last=None):
+        '''rows(last=None) ... iterator over the last samples, or all of them, in chronological order.
+        Each row is a memoryview of the buffer, no history is copied.'''
+        view = memoryview(self.data)
+        width = self.width
+        for begin, end in self._ranges(last):
+            for row in range(begin, end):
+                yield view[row * width:(row + 1) * width]
+
+    def asNumpy(self, last=None):
+        '''asNumpy(last=None) ... return the last samples, or all of them, as numpy array of shape
+        (samples, columns). The array is a view of the buffer unless the samples wrap around its end.'''
+        import numpy
+        if self.axes is None:
+            return numpy.zeros((0, 0))
+        rows = numpy.frombuffer(self.data).reshape(self.length, self.width)
+        parts = [rows[begin:end] for begin, end in self._ranges(last)]
+        if not parts:
+            return rows[0:0]
+        if len(parts) == 1:
+            return parts[0]
+        return numpy.concatenate(parts)
+
+    def writeCSV(self, out, last=None):
+        '''writeCSV(out, last=None) ... write the last samples, or all of them, as CSV to the file out.'''
+        if self.axes is None:
+            return
+        out.write(','.join(self.columns))
+        out.write('\n')
+        for row in self.rows(last):
+            out.write(','.join([repr(v) for v in row]))
+            out.write('\n')
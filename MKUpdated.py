@@ -0,0 +1,259 @@
+# Interned representation of the set of updated status paths.
+#
+# Every status path ('status.motion.position.actual', 'status.motion.axis.0.velocity', ...)
+# is registered once with Paths and assigned a bit. The paths updated by a message, a
+# batch or a frame are then just an integer mask: building the set doesn't format any
+# strings, merging sets is an or and testing for a path is a dictionary lookup and an and.
+# For each dotted prefix of the registered paths the registry also keeps the mask of all
+# paths below it, which makes prefix queries just as cheap.
+#
+# A scope is the view of the registry relative to a prefix, the status handlers report
+# their updates relative to their topic ('feed.rate' rather than 'status.motion.feed.rate').
+# MKUpdated behaves like the list of path names observers got before:
+#
+#   if 'feed.rate' in updated: ...
+#   if updated.any('status.config.velocity.linear'): ...
+#   for path in updated: ...
+#
+# MKSubscription resolves a list of path patterns into a mask, see Machinekit.subscribe.
+# Optionally it holds back notifications of numeric values which barely changed, like the
+# position jittering with servo noise. A change is only notified if any value changed by
+# more than deadband since the last notification, or if interval seconds have passed:
+#
+#   mk.subscribe(['status.motion.position.actual'], dro, deadband=0.001, interval=0.033)
+
+import collections.abc
+import numbers
+import re
+import threading
+import time
+
+class MKPathRegistry(object):
+    '''Interns status paths and assigns each path a bit.'''
+
+    def __init__(self):
+        self.bit = {}    # path -> bit mask of the path
+        self.path = []   # bit number -> path
+        self.prefix = {} # path or any dotted prefix of it -> mask of all paths below and including it
+        self.scopes = {}
+        self.lock = threading.Lock()
+        self.root = self.scope('')
+
+    def register(self, path):
+        '''register(path) ... return the bit of path, which gets registered if it isn't yet.'''
+        bit = self.bit.get(path)
+        if bit is None:
+            with self.lock:
+                bit = self.bit.get(path)
+                if bit is None:
+                    bit = 1 << len(self.path)
+                    self.path.append(path)
+                    prefix = path
+                    while prefix:
+                        self.prefix[prefix] = self.prefix.get(prefix, 0) | bit
+                        prefix = prefix.rpartition('.')[0]
+                    self.bit[path] = bit
+        return bit
+
+    def scope(self, name):
+        '''scope(name) ... return the MKPathScope of all paths below name.'''
+        scope = self.scopes.get(name)
+        if scope is None:
+            with self.lock:
+                scope = self.scopes.setdefault(name, MKPathScope(self, name))
+        return scope
+
+class MKPathScope(object):
+    '''View of a MKPathRegistry for paths relative to name.'''
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.strip = len(name) + 1 if name else 0
+        self.bit = registry.bit if not name else {} # relative path -> bit
+        self.prefix = {} # relative prefix -> absolute prefix
+        self.names = {}  # bit number -> relative path
+
+    def absolute(self, path):
+        '''absolute(path) ... return the absolute path of the relative path.'''
+        return "%s.%s" % (self.name, path) if self.name else path
+
+    def register(self, path):
+        '''register(path) ... return the bit of the relative path.'''
+        bit = self.bit.get(path)
+        if bit is None:
+            bit = self.registry.register(self.absolute(path))
+            self.bit[path] = bit
+        return bit
+
+    def mask(self, paths):
+        '''mask(paths) ... return the mask of all given relative paths.'''
+        bit = self.bit
+        mask = 0
+        for path in paths:
+            b = bit.get(path)
+            if b is None:
+                b = self.register(path)
+            mask |= b
+        return mask
+
+    def prefixMask(self, prefix):
+        '''prefixMask(prefix) ... return the mask of all paths below and including the relative prefix.'''
+        absolute = self.prefix.get(prefix)
+        if absolute is None:
+            absolute = self.prefix.setdefault(prefix, self.absolute(prefix))
+        return self.registry.prefix.get(absolute, 0)
+
+    def pathName(self, number):
+        '''pathName(number) ... return the relative path of the given bit number.'''
+        name = self.names.get(number)
+        if name is None:
+            name = self.names.setdefault(number, self.registry.path[number][self.strip:])
+        return name
+
+    def updated(self, paths):
+        '''updated(paths) ... return the MKUpdated of the given relative paths.'''
+        return MKUpdated(self.mask(paths), self)
+
+class MKUpdated(object):
+    '''Immutable set of updated paths, relative to the scope it was created for.'''
+
+    __slots__ = ('mask', 'scope')
+
+    def __init__(self, mask, scope):
+        self.mask = mask
+        self.scope = scope
+
+    def __contains__(self, path):
+        bit = self.scope.bit.get(path)
+        return not bit is None and (self.mask & bit) != 0
+
+    def any(self, prefix):
+        '''any(prefix) ... return True if prefix or any path below it was updated.'''
+        return (self.mask & self.scope.prefixMask(prefix)) != 0
+
+    def __iter__(self):
+        mask = self.mask
+        pathName = self.scope.pathName
+        while mask:
+            low = mask & -mask
+            yield pathName(low.bit_length() - 1)
+            mask ^= low
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __or__(self, other):
+        return MKUpdated(self.mask | other.mask, self.scope)
+
+    def absolute(self):
+        '''Return the same set of paths relative to the root of the registry.'''
+        return MKUpdated(self.mask, self.scope.registry.root)
+
+    def __repr__(self):
+        return "MKUpdated(%s)" % list(self)
+
+Paths = MKPathRegistry()
+
+def _exceeds(last, value, deadband):
+    '''Return True if value differs from last by more than deadband, any change of a value which
+    isn't a number, or a mapping of numbers, exceeds the deadband.'''
+    if isinstance(value, numbers.Real) and not isinstance(value, bool) and isinstance(last, numbers.Real):
+        return abs(value - last) > deadband
+    if isinstance(value, collections.abc.Mapping) and isinstance(last, collections.abc.Mapping):
+        for key, v in value.items():
+            if _exceeds(last.get(key), v, deadband):
+                return True
+        return False
+    return value != last
+
+class MKSubscription(object):
+    '''Subscription of callback to the given path patterns. A pattern matches the path itself and
+    all paths below it, '*' matches any single element of a path, e.g. 'status.motion.axis.*.homed'.
+    If deadband or interval are given, value(path) is used to look up the values of updated paths.'''
+
+    def __init__(self, patterns, callback, registry=Paths, value=None, deadband=None, interval=None):
+        self.patterns = list(patterns)
+        self.callback = callback
+        self.registry = registry
+        self.value = value
+        self.deadband = deadband
+        self.interval = interval
+        self.pending = 0   # mask of updated paths held back
+        self.notified = 0  # time of the last notification
+        self.last = {}     # path -> value at the last notification
+        self.exact = [p for p in self.patterns if not '*' in p]
+        self.wildcard = [self._compile(p) for p in self.patterns if '*' in p]
+        self.wildcardMask = 0
+        self.resolved = 0 # number of registered paths the mask was resolved for
+        self.mask = 0
+
+    @classmethod
+    def _compile(cls, pattern):
+        elements = ['[^.]+' if e == '*' else re.escape(e) for e in pattern.split('.')]
+        return re.compile(r"%s(\..*)?$" % r'\.'.join(elements))
+
+    def resolve(self):
+        '''Return the mask of all registered paths matching the receiver's patterns.'''
+        registry = self.registry
+        count = len(registry.path)
+        if count != self.resolved:
+            # only paths registered since the last time need to be matched against the wildcards
+            for number, path in enumerate(registry.path[self.resolved:count], self.resolved):
+                if any(w.match(path) for w in self.wildcard):
+                    self.wildcardMask |= 1 << number
+            mask = self.wildcardMask
+            for pattern in self.exact:
+                mask |= registry.prefix.get(pattern, 0)
+            self.mask = mask
+            self.resolved = count
+        return self.mask
+
+    def isFiltered(self):
+        '''Return True if the receiver holds back notifications.'''
+        return not (self.deadband is None and self.interval is None)
+
+    def due(self):
+        '''Return the time when the pending notification is due, None if there is none or it's
+        only going to be notified once a value exceeds the deadband.'''
+        if self.pending and not self.interval is None:
+            return self.notified + self.interval
+        return None
+
+    def _isDue(self, mask, now):
+        if not self.interval is None and now - self.notified >= self.interval:
+            return True
+        if not self.deadband is None:
+            last = self.last
+            for path in MKUpdated(mask, self.registry.root):
+                if _exceeds(last.get(path), self.value(path), self.deadband):
+                    return True
+        return False
+
+    def _notify(self, mask, now):
+        self.pending = 0
+        if self.isFiltered():
+            self.notified = now
+            for path in MKUpdated(mask, self.registry.root):
+                value = self.value(path)
+                self.last[path] = value.copy() if hasattr(value, 'copy') else value
+        self.callback(MKUpdated(mask, self.registry.root))
+
+    def dispatch(self, updated, always=False):
+        '''dispatch(updated, always=False) ... invoke the callback with the paths of updated the receiver
+        subscribed to, if there are any and they are due, or always is True.'''
+        mask = (updated.mask & self.resolve()) | self.pending
+        if mask or always:
+            now = time.monotonic()
+            if always or not self.isFiltered() or self._isDue(mask, now):
+                self._notify(mask, now)
+            else:
+                self.pending = mask
+
+    def flush(self):
+        '''Notify all pending updates, regardless of whether they are due or not.'''
+        if self.pending:
+            self._notify(self.pending, time.monotonic())
@@ -18,6 +18,8 @@ import machinekit
 class Combo(object):
     '''Combination of all MK views for a single MK instance.'''
 
+    StatusPaths = ['status.config.name']
+
     def __init__(self, mk):
         self.mk = mk
         self.ui = FreeCADGui.PySideUic.loadUi(machinekit.FileResource('combo.ui'))
@@ -32,11 +34,11 @@ class Combo(object):
         self.ui.tabWidget.addTab(self.status.ui.dockWidgetContents, 'Status')
 
         self.hud = MachinekitHud.Hud(mk, FreeCADGui.ActiveDocument.ActiveView)
-        self.mk.statusUpdate.connect(self.changed)
+        self.subscription = self.mk.subscribe(self.StatusPaths, self.changed)
         self.updateTitle()
 
     def terminate(self):
-        self.mk.statusUpdate.disconnect(self.changed)
+        self.mk.unsubscribe(self.subscription)
         self.mk = None
         self.jog.terminate()
         self.jog = None
@@ -51,11 +53,12 @@ class Combo(object):
     def updateTitle(self):
         if self.mk.isValid():
             self.ui.setWindowTitle(self.mk['status.config.name'])
+        elif self.mk.isStale():
+            self.ui.setWindowTitle("%s (stale)" % self.mk['status.config.name'])
         else:
             self.ui.setWindowTitle('Machinekit')
 
-    def changed(self, service, msg):
+    def changed(self, updated):
         if self.mk:
-            if 'status' in service.topicName():
-                self.updateTitle()
+            self.updateTitle()
 
@@ -20,28 +20,32 @@
 
 import FreeCAD
 import FreeCADGui
-import MachinekitCombo
-import MachinekitExecute
-import MachinekitHud
-import MachinekitJog
+import MKSignal
 import MachinekitPreferences
+import MachinekitQt
+import MachinekitResources
+import MachinekitStartup
 import PathScripts.PathLog as PathLog
 import PySide.QtCore
 import PySide.QtGui
-import machinekit
+import importlib
+import sys
 
 #PathLog.setLevel(PathLog.Level.DEBUG, PathLog.thisModule())
 #PathLog.trackModule(PathLog.thisModule())
 
-MachinekitUpdateMS  = 50  # update machinekit every 50ms
-MachinekitUiHoldoff = 20  # menus and toolbars once a second (20 * 50ms)
+MachinekitUpdateMS  = 1000 # discovery, menus and toolbars once a second, MK I/O has its own thread
 
 MK = None
+_discoveryStarted = False # discovery and the I/O thread start on first use, see _machinekit
+
+# all MK notifications are processed in the GUI thread
+MKSignal.setBackend(MachinekitQt.QtBackend())
 
 def _mkerror(mk, msg):
     '''Helper function to display an error in a message box.'''
     mb = PySide.QtGui.QMessageBox()
-    mb.setWindowIcon(machinekit.IconResource('machinekiticon.svg'))
+    mb.setWindowIcon(MachinekitResources.IconResource('machinekiticon.svg'))
     mb.setWindowTitle('Machinekit')
     mb.setTextFormat(PySide.QtCore.Qt.TextFormat.RichText)
     mb.setText("<div align='center'>%s</div>" % '<br/>'.join([mk.name(), ''] + list(msg.messages())))
@@ -54,6 +58,26 @@ def _mkerror(mk, msg):
     mb.setStandardButtons(PySide.QtGui.QMessageBox.Ok)
     mb.exec_()
 
+def _machinekit(start=False):
+    '''Return the machinekit module if discovery was started, or start it if start is True. Returns None
+    otherwise - loading the protocol stack and starting discovery is left to the first use of MK.'''
+    global _discoveryStarted
+    if not (start or _discoveryStarted):
+        return None
+    import machinekit
+    if not _discoveryStarted:
+        machinekit._start()
+        _discoveryStarted = True
+    return machinekit
+
+def _dock(name):
+    '''Return the dock module with the given name - it is imported when it's used for the first time.'''
+    module = sys.modules.get(name)
+    if module is None:
+        module = importlib.import_module(name)
+        MachinekitStartup.mark("%s loaded" % name)
+    return module
+
 def SetMK(mk):
     global MK
     if MK:
@@ -64,6 +88,9 @@ def SetMK(mk):
 def ActiveMK(setIfNone=False):
     if MK:
         return MK
+    machinekit = _machinekit(setIfNone)
+    if machinekit is None:
+        return None
     mks = [mk for mk in machinekit.Instances() if mk.isValid()]
     if 1 == len(mks):
         if setIfNone:
@@ -125,12 +152,12 @@ class MachinekitCommandJog(MachinekitCommand):
 
     def activate(self, mk):
         PathLog.track()
-        return MachinekitJog.Jog(mk)
+        return _dock('MachinekitJog').Jog(mk)
 
     def GetResources(self):
         PathLog.track()
         return {
-                'Pixmap'    : machinekit.FileResource('machinekiticon-jog.svg'),
+                'Pixmap'    : MachinekitResources.FileResource('machinekiticon-jog.svg'),
                 'MenuText'  : 'Jog',
                 'ToolTip'   : 'Jog and DRO interface for machine setup'
                 }
@@ -142,11 +169,11 @@ class MachinekitCommandExecute(MachinekitCommand):
         super(self.__class__, self).__init__('Exe', ['command', 'status'])
 
     def activate(self, mk):
-        return MachinekitExecute.Execute(mk)
+        return _dock('MachinekitExecute').Execute(mk)
 
     def GetResources(self):
         return {
-                'Pixmap'    : machinekit.FileResource('machinekiticon-execute.svg'),
+                'Pixmap'    : MachinekitResources.FileResource('machinekiticon-execute.svg'),
                 'MenuText'  : 'Execute',
                 'ToolTip'   : 'Interface for controlling file execution'
                 }
@@ -161,11 +188,11 @@ class MachinekitCommandHud(MachinekitCommand):
         return not (ActiveMK() is None or FreeCADGui.ActiveDocument is None)
 
     def activate(self, mk):
-        MachinekitHud.ToggleHud(mk)
+        _dock('MachinekitHud').ToggleHud(mk)
 
     def GetResources(self):
         return {
-                'Pixmap'    : machinekit.FileResource('machinekiticon-hud.svg'),
+                'Pixmap'    : MachinekitResources.FileResource('machinekiticon-hud.svg'),
                 'MenuText'  : 'Hud',
                 'ToolTip'   : 'HUD DRO interface for machine setup'
                 }
@@ -191,14 +218,14 @@ class MachinekitCommandCombo(MachinekitCommand):
         if dock:
             dock.activate()
             return None
-        dock = MachinekitCombo.Combo(mk)
+        dock = _dock('MachinekitCombo').Combo(mk)
         self.combo[mk] = dock
         self.mk.errorUpdate.connect(_mkerror)
         return dock
 
     def GetResources(self):
         return {
-                'Pixmap'    : machinekit.FileResource('machinekiticon.svg'),
+                'Pixmap'    : MachinekitResources.FileResource('machinekiticon.svg'),
                 'MenuText'  : 'Combo',
                 'ToolTip'   : 'Combo interface with all sub-interfaces'
                 }
@@ -306,7 +333,6 @@ class MachinekitCommandCenter(object):
         self.active = [cmd.IsActive() for cmd in self.commands]
         self.comboTB = {}
         self.comboID = 0
-        self.holdoff = 0
 
     def _addCommand(self, name, cmd):
         self.commands.append(cmd)
@@ -324,27 +350,27 @@ class MachinekitCommandCenter(object):
     def tick(self):
         '''Periodically called by the timer to updated menus and tool bars depending on
         discovered and lost MK instances.'''
-        self.holdoff = self.holdoff - 1
-        if machinekit.Instances() or self.holdoff < 1:
+        machinekit = _machinekit()
+        if machinekit:
             machinekit._update()
-        if self.holdoff < 1:
-            active = [cmd.IsActive() for cmd in self.commands]
-            def aString(activation):
-                return '.'.join(['1' if a else '0' for a in activation])
-            if self.active != active:
-                PathLog.info("Command activation changed from %s to %s" % (aString(self.active), aString(active)))
-                FreeCADGui.updateCommands()
-                self.active = active
-            self.refreshActivationMenu()
-            if MachinekitPreferences.addToPathWB():
-                self.refreshComboWB()
-            self.holdoff = MachinekitUiHoldoff
+        active = [cmd.IsActive() for cmd in self.commands]
+        def aString(activation):
+            return '.'.join(['1' if a else '0' for a in activation])
+        if self.active != active:
+            PathLog.info("Command activation changed from %s to %s" % (aString(self.active), aString(active)))
+            FreeCADGui.updateCommands()
+            self.active = active
+        self.refreshActivationMenu()
+        if MachinekitPreferences.addToPathWB():
+            self.refreshComboWB()
 
     def refreshActivationMenu(self):
         modified = False
         menu = FreeCADGui.getMainWindow().menuBar().findChild(PySide.QtGui.QMenu, MenuName)
         if menu:
-            mks = [mk for mk in machinekit.Instances() if mk.isValid()]
+            # instances showing their saved status are listed before MK is discovered
+            machinekit = _machinekit()
+            mks = [mk for mk in machinekit.Instances(stale=True) if mk.isValid() or mk.isStale()] if machinekit else []
             ma = menu.findChild(PySide.QtGui.QMenu, MachinekitCommandActivate.MenuText)
             actions = ma.actions()
             if mks:
@@ -382,7 +408,8 @@ class MachinekitCommandCenter(object):
             if hasattr(wb, '__Workbench__'):
                 MachinekitPreferences.Setup()
                 mks = {}
-                for mk in [mk for mk in machinekit.Instances() if mk.isValid()]:
+                machinekit = _machinekit()
+                for mk in [mk for mk in machinekit.Instances(stale=True) if mk.isValid() or mk.isStale()] if machinekit else []:
                     if self.comboTB.get(mk) is None:
                         name = "%s_%d" % (MachinekitCommandCombo.__name__, self.comboID)
                         cmd = MachinekitCommandCombo(mk)
@@ -401,7 +428,7 @@ class MachinekitCommandCenter(object):
                                 PathLog.track('removing', mk.name())
                                 tb.removeAction(action)
                     for mk in [mk for mk in mks if not mk in self.comboTB]:
-                        icon =  machinekit.IconResource('machinekiticon.svg')
+                        icon =  MachinekitResources.IconResource('machinekiticon.svg')
                         PathLog.track('adding', mk.name())
                         tb.addAction(icon, mk.name(), mks[mk][1].Activated)
                 elif mks:
@@ -410,7 +437,7 @@ class MachinekitCommandCenter(object):
                         tb = PySide.QtGui.QToolBar()
                         tb.setObjectName('MachinekitCombo')
                         for mk in [mk for mk in mks if not mk in self.comboTB]:
-                            icon =  machinekit.IconResource('machinekiticon.svg')
+                            icon =  MachinekitResources.IconResource('machinekiticon.svg')
                             PathLog.track('adding+', mk.name(), icon)
                             tb.addAction(icon, mk.name(), mks[mk][1].Activated)
                         FreeCADGui.getMainWindow().addToolBar(tb)
@@ -432,6 +459,8 @@ if MachinekitPreferences.startOnLoad():
 
 def Activated():
     PathLog.track()
+    # activating the workbench is the first use of MK
+    _machinekit(True)
     if not _commandCenter.isActive():
         _commandCenter.start()
 
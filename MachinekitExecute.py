@@ -44,6 +44,20 @@ class TreeSelectionObserver(object):
 class Execute(object):
     '''Dock widget to load and manage an FC job into MK.'''
 
+    StatusPaths = [
+            'status.io.estop',
+            'status.motion.enabled',
+            'status.motion.feed',
+            'status.motion.line',
+            'status.motion.state',
+            'status.motion.type',
+            'status.interp.state',
+            'status.task.file',
+            'status.task.line.total',
+            'status.task.state',
+            'status.config.override.feed',
+            ]
+
     def __init__(self, mk):
         self.mk = mk
         self.ui = FreeCADGui.PySideUic.loadUi(machinekit.FileResource('execute.ui'), self)
@@ -121,14 +135,14 @@ class Execute(object):
         self.updateUI()
         self.toolChange = MachinekitManualToolChange.Controller(self.mk)
         machinekit.execute = self
-        self.mk.statusUpdate.connect(self.changed)
+        self.subscription = self.mk.subscribe(self.StatusPaths, self.changed)
         self.mk.jobUpdate.connect(self.updateJob)
         if not self.mk.getJob():
             self.mk.updateJob()
 
     def terminate(self):
         '''Called when the dock is closed.'''
-        self.mk.statusUpdate.disconnect(self.changed)
+        self.mk.unsubscribe(self.subscription)
         self.mk = None
         FreeCADGui.Selection.removeObserver(self.observer)
         if machinekit.execute == self:
@@ -310,11 +324,10 @@ class Execute(object):
         self.title.setText(title)
         self.ui.execute.setTitle(title)
 
-    def changed(self, service, updated):
+    def changed(self, updated):
         '''Callback by the framework on status changes.'''
         if self.mk:
-            if not updated is None:
-                if service.topicName() == 'status.motion' and 'feed.rate' in updated:
-                    self.updateOverride()
+            if 'status.motion.feed.rate' in updated:
+                self.updateOverride()
 
             self.updateUI()
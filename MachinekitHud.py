@@ -401,12 +401,28 @@ class Hud(object):
     '''Coordinator class to manage a visual HUD and integrate it with the MK status updates
     and FC's framework.'''
 
+    StatusPaths = [
+            'status.io.estop',
+            'status.io.tool.nr',
+            'status.motion.enabled',
+            'status.motion.axis.*.homed',
+            'status.motion.position.actual',
+            'status.motion.offset.g5x',
+            'status.motion.spindle',
+            'status.motion.line',
+            'status.motion.distance_left',
+            'status.task.task.mode',
+            'status.config.velocity.max',
+            ]
+    Deadband = 0.0005 # position changes which don't show in the 3 decimals displayed
+    Interval = 0.25   # but make sure the display catches up eventually
+
     def __init__(self, mk, view):
         self.mk = mk
         self.tool = 0
         self.hud = None
         self.setView(view)
-        self.mk.statusUpdate.connect(self.changed)
+        self.subscription = self.mk.subscribe(self.StatusPaths, self.changed, self.Deadband, self.Interval)
         self.mk.preferencesUpdate.connect(self.preferencesChanged)
         self.mk.jobUpdate.connect(self.jobChanged)
 
@@ -423,7 +439,7 @@ class Hud(object):
 
     def terminate(self):
         '''Hide the HUD and take all structures down.'''
-        self.mk.statusUpdate.disconnect(self.changed)
+        self.mk.unsubscribe(self.subscription)
         self.mk = None
         self.hud.hide()
 
@@ -473,7 +489,7 @@ class Hud(object):
     def jobChanged(self, job):
         self.hud.updateJob(self.mk)
 
-    def changed(self, service, msg):
+    def changed(self, updated):
         '''Callback invoked when MK sends a status update.'''
         if self.mk:
             self.updateUI()
@@ -3,7 +3,6 @@
 # The classes in this file deal with service discovery and keep track of all discovered Machinekit
 # instances and their associated endpoints.
 
-import MachinekitPreferences
 import copy
 import itertools
 import json
@@ -12,6 +11,8 @@ import time
 import urllib.request
 import zeroconf
 
+from MKLog import PathLog
+
 class ServiceEndpoint(object):
     '''POD for describing a service end point.'''
 
@@ -113,7 +114,7 @@ def serviceThread(monitor):
                 # this happens when MK isn't running or the host isn't even routable
                 err = str(e)
                 if issue.get(host) != err:
-                    print("%s - %s" % (host, err))
+                    PathLog.warning("%s - %s" % (host, err))
                     issue[host] = err
 
         time.sleep(1)
@@ -128,11 +129,19 @@ class ServiceMonitor(object):
         self.zc = zeroconf.Zeroconf()
         self.browser = zeroconf.ServiceBrowser(self.zc, "_machinekit._tcp.local.", self)
         self.instance = {}
-        self.explicit = explicit if explicit else MachinekitPreferences.restServers()
+        self.explicit = explicit if explicit else self.restServers()
         self.lock = threading.Lock()
         self.thread = threading.Thread(target=serviceThread, args=(self,), daemon=True)
         self.thread.start()
 
+    def restServers(self):
+        '''Return the REST servers configured in the preferences, if they are available.'''
+        try:
+            import MachinekitPreferences
+            return MachinekitPreferences.restServers()
+        except ImportError:
+            return []
+
     # zeroconf.ServiceBrowser interface
     def remove_service(self, zc, typ, name):
         with self.lock:
@@ -28,6 +28,20 @@ class Jog(object):
     '''Dock widget to control jogging and work coordinate offset.'''
     JogContinuous = 'Continuous'
 
+    StatusPaths = [
+            'status.io.estop',
+            'status.motion.enabled',
+            'status.motion.axis.*.homed',
+            'status.motion.position.actual',
+            'status.motion.offset.g5x',
+            'status.interp.state',
+            'status.config.name',
+            'status.config.increments',
+            'status.config.velocity.linear',
+            ]
+    Deadband = 0.0005 # position changes which don't show in the 3 decimals displayed
+    Interval = 0.25   # but make sure the DRO catches up eventually
+
     def __init__(self, mk):
         PathLog.track()
         self.mk = mk
@@ -89,13 +103,15 @@ class Jog(object):
         self.isSetup = False
         self.updateUI()
 
-        self.mk.statusUpdate.connect(self.changed)
+        self.subscription = self.mk.subscribe(self.StatusPaths, self.changed, self.Deadband, self.Interval)
+        self.mk.jobUpdate.connect(self.jobChanged)
         machinekit.jog = self
 
     def terminate(self):
         '''Remove receiver from FC's UI.'''
         PathLog.track()
-        self.mk.statusUpdate.disconnect(self.changed)
+        self.mk.unsubscribe(self.subscription)
+        self.mk.jobUpdate.disconnect(self.jobChanged)
         self.mk = None
         FreeCADGui.Selection.removeObserver(self)
         if machinekit.jog == self:
@@ -308,12 +324,20 @@ class Jog(object):
             w.setValue(pos)
 
         if connected and powered:
-            actual = self.mk['status.motion.position.actual']
-            off = self.mk['status.motion.offset.g5x']
-            axis = self.mk['status.motion.axis']
-            updateAxisWidget(self.ui.posX, actual['x'] - off['x'], axis[0].homed)
-            updateAxisWidget(self.ui.posY, actual['y'] - off['y'], axis[1].homed)
-            updateAxisWidget(self.ui.posZ, actual['z'] - off['z'], axis[2].homed)
+            # only use the arrays if somebody else already enabled them
+            arrays = self.mk.motionArrays(create=False)
+            if arrays:
+                pos = arrays.workPosition()
+                homed = [arrays.homed[arrays.row[index]] for index in range(3)]
+            else:
+                actual = self.mk['status.motion.position.actual']
+                off = self.mk['status.motion.offset.g5x']
+                pos = [actual[a] - off[a] for a in ['x', 'y', 'z']]
+                axes = self.mk['status.motion.axis']
+                homed = [axes.element(index).homed for index in range(3)]
+            updateAxisWidget(self.ui.posX, pos[0], homed[0])
+            updateAxisWidget(self.ui.posY, pos[1], homed[1])
+            updateAxisWidget(self.ui.posZ, pos[2], homed[2])
 
     def updateUI(self):
         '''Callback invoked on any changes to update the view.'''
@@ -338,13 +362,17 @@ class Jog(object):
         self.ui.dockWidgetContents.setEnabled(powered and isIdle)
 
 
-    def changed(self, service, updated):
+    def jobChanged(self, job):
+        '''Callback invoked when the job changed, which determines if the job can be scanned.'''
+        if self.mk:
+            self.updateUI()
+
+    def changed(self, updated):
         '''Callback invoked whenever MK sent an update.'''
-        PathLog.track(service, updated)
+        PathLog.track(updated)
         if self.mk:
-            if 'status' in service.topicName():
-                self.updateUI()
-            if updated and 'status.config.velocity.linear' in updated:
+            self.updateUI()
+            if updated.any('status.config.velocity.linear'):
                 self.updateJogVelocity()
 
     def scanJob(self, forward):
@@ -176,8 +176,8 @@ class PageGeneral(object):
 
     def __init__(self, parent=None):
         import FreeCADGui
-        import machinekit
-        self.form = FreeCADGui.PySideUic.loadUi(machinekit.FileResource('preferences.ui'))
+        import MachinekitResources
+        self.form = FreeCADGui.PySideUic.loadUi(MachinekitResources.FileResource('preferences.ui'))
         self.form.restServers.itemChanged.connect(self.itemChanged)
 
     def saveSettings(self):
@@ -221,8 +221,8 @@ class PageHUD(object):
 
     def __init__(self, parent=None):
         import FreeCADGui
-        import machinekit
-        self.form = FreeCADGui.PySideUic.loadUi(machinekit.FileResource('preferences-hud.ui'))
+        import MachinekitResources
+        self.form = FreeCADGui.PySideUic.loadUi(MachinekitResources.FileResource('preferences-hud.ui'))
 
     def saveSettings(self):
         '''Store preferences from the UI back to the model so they can be saved.'''
@@ -265,9 +265,9 @@ def Setup():
     global _setup
     if not _setup:
         import FreeCADGui
-        import machinekit
+        import MachinekitResources
 
-        icon = machinekit.FileResource('machinekiticon.svg')
+        icon = MachinekitResources.FileResource('machinekiticon.svg')
         FreeCADGui.addIcon('preferences-machinekit', icon)
         FreeCADGui.addPreferencePage(PageGeneral, 'Machinekit')
         FreeCADGui.addPreferencePage(PageHUD,     'Machinekit')
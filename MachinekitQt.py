@@ -0,0 +1,29 @@
+# Qt backend for the core classes' notifications (see MKSignal).
+#
+# All notifications are handed over to the thread the backend was created in, which is
+# supposed to be the GUI thread. That way any UI can be updated directly from within a
+# signal handler.
+
+import PySide.QtCore
+
+class QtBackend(PySide.QtCore.QObject):
+    '''MKSignal backend processing all notifications in the GUI thread.'''
+
+    posted = PySide.QtCore.Signal(object, object)
+
+    def __init__(self):
+        super().__init__()
+        # AutoConnection: queued when posted by a different thread, direct otherwise
+        self.posted.connect(self._invoke)
+
+    def post(self, fn, *args):
+        '''post(fn, *args) ... invoke fn(*args) in the GUI thread.'''
+        self.posted.emit(fn, args)
+
+    def postDelayed(self, ms, fn):
+        '''postDelayed(ms, fn) ... invoke fn() in ms milliseconds, must be called from the GUI thread.'''
+        PySide.QtCore.QTimer.singleShot(ms, fn)
+
+    @PySide.QtCore.Slot(object, object)
+    def _invoke(self, fn, args):
+        fn(*args)
@@ -0,0 +1,19 @@
+# Resource lookup for the workbench.
+#
+# Deliberately free of any dependencies, so icons and ui files can be resolved without
+# loading the protocol stack - which is what FreeCAD needs when it registers the workbench.
+
+import os
+
+def PathSource():
+    '''PathSource() ... return the path to the workbench'''
+    return os.path.dirname(__file__)
+
+def FileResource(filename):
+    '''FileResource(filename) ... return the full path of the given resource file.'''
+    return "%s/Resources/%s" % (PathSource(), filename)
+
+def IconResource(filename):
+    '''IconResource(filename) ... return a QtGui.QIcon from the given resource file (which must exist in the Resource directory).'''
+    import PySide.QtGui
+    return PySide.QtGui.QIcon(FileResource(filename))
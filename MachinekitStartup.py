@@ -0,0 +1,26 @@
+# Startup timing of the workbench.
+#
+# Loading the workbench is supposed to be cheap. The expensive parts - the protocol stack,
+# service discovery and the dock widgets - are only loaded once they are used. Each of
+# those steps is recorded here, relative to the time the workbench started loading, so
+# regressions are visible in the report:
+#
+#   import MachinekitStartup
+#   print(MachinekitStartup.report())
+
+import time
+
+_Start  = time.monotonic()
+_Events = []
+
+def mark(event):
+    '''mark(event) ... record that event happened just now.'''
+    _Events.append((event, time.monotonic() - _Start))
+
+def events():
+    '''Return a list of all recorded (event, seconds) tuples.'''
+    return list(_Events)
+
+def report():
+    '''Return a printable report of all recorded events.'''
+    return '\n'.join(["%9.1fms  %s" % (1000 * t, event) for event, t in _Events])
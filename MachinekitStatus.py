@@ -27,6 +27,14 @@ class Status(object):
     '''A class used by the Combo view to interact with the MK instance itself.
     Currently it's only used to turn MK on/off and home the axes.'''
 
+    StatusPaths = [
+            'status.io.estop',
+            'status.motion.enabled',
+            'status.motion.axis.*.homed',
+            'status.motion.axis.*.velocity',
+            'status.motion.current_vel',
+            'status.task.task.mode',
+            ]
 
     def __init__(self, mk):
         self.mk = mk
@@ -41,10 +49,10 @@ class Status(object):
         self.ui.statusHome.clicked.connect(self.toggleHomed)
 
         self.updateUI()
-        self.mk.statusUpdate.connect(self.changed)
+        self.subscription = self.mk.subscribe(self.StatusPaths, self.changed)
 
     def terminate(self):
-        self.mk.statusUpdate.disconnect(self.changed)
+        self.mk.unsubscribe(self.subscription)
         self.mk = None
 
     def toggleEstop(self):
@@ -65,8 +73,9 @@ class Status(object):
             self.mk.home()
 
     def updateUI(self):
-        if self.mk.isValid():
-            self.ui.dockWidgetContents.setEnabled(True)
+        if self.mk.isValid() or self.mk.isStale():
+            # a stale status is shown but can't be acted upon
+            self.ui.dockWidgetContents.setEnabled(self.mk.isValid())
             self.ui.statusEStop.setChecked(self.mk['status.io.estop'])
             self.ui.statusPower.setChecked(self.mk.isPowered())
             self.ui.statusHome.setChecked(self.mk.isHomed())
@@ -80,6 +89,6 @@ class Status(object):
         else:
             self.ui.dockWidgetContents.setEnabled(False)
 
-    def changed(self, service, updated):
+    def changed(self, updated):
         if self.mk:
             self.updateUI()
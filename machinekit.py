@@ -1,4 +1,8 @@
-# The main controller classes for the Machinekit workbench and Qt integration.
+# The main controller classes for the Machinekit workbench.
+#
+# Neither FreeCAD nor Qt are required to use this module, which makes it usable for
+# scripts and tools running outside of FreeCAD. Inside FreeCAD the workbench installs
+# a Qt backend for the signals (see MKSignal and MachinekitQt).
 #
 # Client classes are expected to connect to the signals provided by the Machinekit
 # class and access each service and their attributes through their hierarchical name.
@@ -14,27 +18,60 @@
 #
 # The only component currently tracked in 'halrcomp' is 'fc_manualtoolchange',
 # should it exist.
-
-import FreeCAD
+#
+# All communication with MK is done by a dedicated I/O thread (see IOThread) which blocks
+# on the Poller and processes messages the moment they arrive. The results are posted to
+# the signal backend, with the Qt backend the signals are always emitted in the GUI thread
+# and clients don't have to worry about threads at all.
+#
+# Each service's heartbeat is supervised by the I/O thread (see MKHeartbeat). A service which
+# stops receiving anything, not even pings, is declared stale and its socket is replaced
+# with backoff until MK responds again - subscriptions get a fresh full update that way.
+# State changes are signalled through heartbeatUpdate.
+#
+# UI clients should connect to statusFrameUpdate rather than statusUpdate. It is emitted
+# at most once per frame (FrameMS) with the set of all status paths which changed since
+# the last frame (e.g. 'status.motion.position.actual'), which means a burst of updates
+# results in a single UI refresh. The set is an MKUpdated, the paths are interned and
+# testing for a path or a prefix of paths doesn't depend on the number of updates.
+# Better still, clients subscribe to the paths they actually display (see subscribe) and
+# don't get invoked at all for updates they aren't interested in.
+#
+# The last full status of each instance is saved (see MKStatusStore). On startup an instance
+# is created for each saved status, before any MK is discovered, its status service is offline
+# and holds the saved status. Once MK is discovered the live status service takes over, which
+# preloads the saved status again until MK sent its own. Until then the status is stale (see
+# isStale) and the instance isn't valid.
+
+import MKSignal
+import MKStatusStore
 import MKUtils
 import MachinekitInstance
-import PathScripts.PathLog as PathLog
-import PySide.QtCore
-import PySide.QtGui
+import MachinekitStartup
 import ftplib
 import io
 import machinetalk.protobuf.message_pb2 as MESSAGE
 import machinetalk.protobuf.types_pb2 as TYPES
 import os
+import queue
 import threading
 import time
+import traceback
 import zmq
 
 from MKCommand          import *
+from MKLog              import PathLog
 from MKServiceCommand   import *
 from MKServiceError     import *
 from MKServiceHal       import *
 from MKServiceStatus    import *
+from MKUpdated          import MKSubscription, MKUpdated, Paths
+from MachinekitResources import PathSource, FileResource, IconResource
+
+try:
+    import FreeCAD
+except ImportError:
+    FreeCAD = None # running without FreeCAD, there are no jobs to look for
 
 PathLog.setLevel(PathLog.Level.INFO, PathLog.thisModule())
 #PathLog.trackModule(PathLog.thisModule())
@@ -53,40 +90,33 @@ _MKServiceRegister = {
         '': None
         }
 
-def PathSource():
-    '''PathSource() ... return the path to the workbench'''
-    return os.path.dirname(__file__)
-
-def FileResource(filename):
-    '''FileResource(filename) ... return the full path of the given resource file.'''
-    return "%s/Resources/%s" % (PathSource(), filename)
-
-def IconResource(filename):
-    '''IconResource(filename) ... return a QtGui.QIcon from the given resource file (which must exist in the Resource directory).'''
-    return PySide.QtGui.QIcon(FileResource(filename))
-
-class Machinekit(PySide.QtCore.QObject):
-    '''Class representing a MK instance and provide connection to Qt framework:
+class Machinekit(object):
+    '''Class representing a MK instance:
       * managing all services
       * providing access to all services 
       * deal with all the zeroconf and proto buf settings
-      * trigger Qt signals on changes and upates from MK
+      * trigger signals on changes and upates from MK
       '''
-    statusUpdate      = PySide.QtCore.Signal(object, object)
-    errorUpdate       = PySide.QtCore.Signal(object, object)
-    commandUpdate     = PySide.QtCore.Signal(object, object)
-    halUpdate         = PySide.QtCore.Signal(object, object)
-    jobUpdate         = PySide.QtCore.Signal(object)
-    preferencesUpdate = PySide.QtCore.Signal()
+    statusUpdate      = MKSignal.MKSignal(object, object)
+    statusFrameUpdate = MKSignal.MKSignal(object)
+    errorUpdate       = MKSignal.MKSignal(object, object)
+    commandUpdate     = MKSignal.MKSignal(object, object)
+    halUpdate         = MKSignal.MKSignal(object, object)
+    jobUpdate         = MKSignal.MKSignal(object)
+    heartbeatUpdate   = MKSignal.MKSignal(object, object)
+    preferencesUpdate = MKSignal.MKSignal()
 
     Context = zmq.Context()
     Poller  = zmq.Poller()
+    Sockets = {} # socket -> (Machinekit, service) of all sockets registered with Poller
 
     RemoteFilename = 'FreeCAD.ngc'
+    FrameMS        = 20  # status updates are coalesced into one statusFrameUpdate per frame
+    ReceiveBatch   = 100 # max number of messages processed per socket in one go
+    StatusStoreDir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'machinekit')
+    StatusSaveS    = 30  # min number of seconds between saves of the status
 
     def __init__(self, instance):
-        super().__init__() # for qt signals
-
         self.instance = instance
         self.nam = None
         self.lock = threading.Lock()
@@ -102,30 +132,71 @@ class Machinekit(PySide.QtCore.QObject):
                 self.service[service] = None
         self.lastPing = time.monotonic()
 
+        self.frameUpdated = 0 # mask of all status paths updated in the current frame, see MKUpdated
+        self.framePending = False
+        self.frameValid = False
+        self.subscriptions = []
+        self.flushPending = False
+        self.recorder = None
+        self.stats = None
+        self.heartbeatState = {}
+        self.metricsCollected = None
+        self.telemetryRecorded = None
+        with self.lock:
+            self._preloadOfflineLocked()
+
     def __str__(self):
         with self.lock:
             return "%s(%s): %s" % (self.name(), self.instance.uuid.decode(), sorted(self.instance.services()))
 
     def __getitem__(self, index):
-        path = index.split('.')
-        service = self.service.get(path[0])
+        name, _, path = index.partition('.')
+        service = self.service.get(name)
         if service:
-            if len(path) > 1:
-                return service[path[1:]]
+            if path:
+                return service.get(path)
             return service
         return None
 
-    def _receiveContainer(self, socket):
+    def get(self, *paths):
+        '''get(*paths) ... return a list with the values of all given paths, e.g.
+        mk.get('status.motion.position.actual', 'status.io.tool.nr').'''
+        values = []
+        service = self.service
+        for index in paths:
+            name, _, path = index.partition('.')
+            s = service.get(name)
+            if s and path:
+                values.append(s.get(path))
+            else:
+                values.append(s)
+        return values
+
+    def _receiveContainer(self, socket, service, flags=0):
         msg = None
         rx = MESSAGE.Container()
         try:
-            msg = socket.recv_multipart()[-1]
-            rx.ParseFromString(msg)
+            frames = socket.recv_multipart(flags)
+            if self.recorder:
+                self.recorder.record(service.name, frames)
+            msg = frames[-1]
+            stats = self.stats
+            if stats:
+                metrics = stats[service.name]
+                metrics.received(frames)
+                begin = time.perf_counter()
+                rx.ParseFromString(msg)
+                metrics.parse.add(time.perf_counter() - begin)
+            else:
+                rx.ParseFromString(msg)
+        except zmq.Again:
+            raise
         except Exception as e:
             PathLog.error("%s exception: %s" % (service.name, e))
             PathLog.error("    msg = '%s'" % msg)
         else:
-            # ignore all ping messages for now
+            service.heartbeatReceived(rx, time.monotonic())
+            # pings only feed the heartbeat
             if rx.type != TYPES.MT_PING:
                 return rx
         return None
@@ -133,8 +204,14 @@ class Machinekit(PySide.QtCore.QObject):
     def _updateServicesLocked(self):
         def removeService(s, service):
             if s and service:
-                self.Poller.unregister(service.socket)
-                del self.socket[service.socket]
+                if s == 'status':
+                    self._saveStatusLocked(True)
+                if self.isConnected(service):
+                    self.Poller.unregister(service.socket)
+                    del self.Sockets[service.socket]
+                    del self.socket[service.socket]
+                else:
+                    service.socket.close(linger=0)
                 self.service[s] = None
                 service.detach(self)
             return None
@@ -145,12 +222,13 @@ class Machinekit(PySide.QtCore.QObject):
             ep = self.instance.endpointFor(s)
             service = self.service.get(s)
             if ep is None:
-                if not service is None:
+                # an offline service holds the saved status until MK shows up
+                if not service is None and self.isConnected(service):
                     PathLog.debug("Removing stale service: %s.%s (%s)" % (self.name(), s, type(s)))
                     removeService(s, service)
                     if s == 'status':
                         for tn in service.topicNames():
-                            self.statusUpdate.emit(service[tn], None)
+                            self.changed(service[tn], None)
             else:
                 if service and ep.dsn != service.dsn:
                     PathLog.debug("Removing stale service: %s.%s" % (self.name(), s))
@@ -161,61 +239,269 @@ class Machinekit(PySide.QtCore.QObject):
                         PathLog.error("service %s not supported" % s)
                     else:
                         service = cls(self.Context, s, ep.properties)
+                        service.engine = _MachinekitIO
                         PathLog.info("Connecting to %s.%-10s\t%08x" % (self.name(), s, id(service.socket)))
                         self.socket[service.socket] = service
+                        self.Sockets[service.socket] = (self, service)
                         self.service[s] = service
                         service.attach(self)
+                        if s == 'status':
+                            self._preloadStatusLocked(service)
                         self.Poller.register(service.socket, zmq.POLLIN)
                         poll = True
                 else:
                     poll = True
         return poll
 
-    def _receiveMessage(self, socket):
-        with self.lock:
-            msg = None
-            rx = MESSAGE.Container()
-            try:
-                msg = socket.recv_multipart()[-1]
-                rx.ParseFromString(msg)
-            except Exception as e:
-                PathLog.error("%s exception: %s" % (service.name, e))
-                PathLog.error("    msg = '%s'" % msg)
-            else:
-                # ignore all ping messages for now
-                if rx.type != TYPES.MT_PING:
-                    self.socket[socket].process(rx)
+    def _receiveMessage(self, socket, service):
+        # Drain everything pending on the socket and let the service apply it as a batch. If MK
+        # sends updates faster than they can be processed the observers get notified once with
+        # the merged changes, instead of working through a growing backlog of notifications.
+        containers = []
+        try:
+            for i in range(self.ReceiveBatch):
+                rx = self._receiveContainer(socket, service, zmq.NOBLOCK)
+                if rx:
+                    containers.append(rx)
+        except zmq.Again:
+            pass
+        if containers:
+            with self.lock:
+                stats = self.stats
+                if stats:
+                    metrics = stats[service.name]
+                    metrics.batches += 1
+                    begin = time.perf_counter()
+                    service.processBatch(containers)
+                    metrics.process.add(time.perf_counter() - begin)
+                else:
+                    service.processBatch(containers)
 
     def _update(self, now):
+        '''Called by the I/O thread for housekeeping of the receiver's services.'''
         if (now - self.lastPing) > 0.5:
-            self._updateServicesLocked()
-            if self.needUpdateJob:
-                self.updateJob()
-            for service in self.service.values():
-                if service:
-                    service.ping()
+            with self.lock:
+                self._updateServicesLocked()
+                for s, service in self.service.items():
+                    if service and self.isConnected(service):
+                        service.ping()
+                        self._superviseLocked(s, service, now)
+                self._saveStatusLocked()
+            if self.recorder:
+                self.recorder.flush()
             self.lastPing = now
 
+    def statusStorePath(self):
+        '''Return the path of the file the receiver's status is saved to, see MKStatusStore.'''
+        return os.path.join(self.StatusStoreDir, "%s.mkstat" % self.instance.uuid.decode())
+
+    def isConnected(self, service):
+        '''isConnected(service) ... return True if service is connected to MK, False for an offline service.'''
+        return service.socket in self.socket
+
+    def _preloadOfflineLocked(self):
+        '''Internal - create an offline status service holding the saved status, if there is one.'''
+        if self.service.get('status') is None and os.path.exists(self.statusStorePath()):
+            uuid = self.instance.uuid
+            properties = {b'service': b'status', b'uuid': uuid, b'dsn': b'inproc://offline-' + uuid}
+            service = MKServiceStatus(self.Context, 'status', properties)
+            service.attach(self)
+            self.service['status'] = service
+            self._preloadStatusLocked(service)
+
+    def _preloadStatusLocked(self, service):
+        '''Internal - preload the saved status into the newly created status service and start tracking it.'''
+        path = self.statusStorePath()
+        service.store = MKStatusStore.MKStatusStore()
+        if os.path.exists(path):
+            try:
+                saved, containers = MKStatusStore.load(path)
+                service.preload(containers)
+                PathLog.info("Preloaded status of %s from %s" % (self.name(), time.ctime(saved)))
+            except Exception as e:
+                PathLog.warning("Preloading status from %s failed: %s" % (path, e))
+
+    def _saveStatusLocked(self, force=False):
+        '''Internal - save the status if it changed, at most every StatusSaveS seconds unless force is set.
+        A stale status is never saved, it's what was loaded in the first place.'''
+        status = self.service.get('status')
+        if status is None or status.store is None or not status.store.dirty:
+            return
+        if not status.isValid() or status.isStale():
+            return
+        store = status.store
+        if force or store.saved is None or (time.monotonic() - store.saved) >= self.StatusSaveS:
+            try:
+                store.save(self.statusStorePath())
+            except OSError as e:
+                PathLog.warning("Saving status to %s failed: %s" % (self.statusStorePath(), e))
+                store.saved = time.monotonic()
+
+    def _superviseLocked(self, s, service, now):
+        '''Internal - checks the heartbeat of the given service and reconnects it if it went stale.'''
+        heartbeat = service.heartbeat
+        if heartbeat.pingDue(now):
+            service.sendPing()
+        state = heartbeat.check(now)
+        if self.heartbeatState.get(s, heartbeat.Unknown) != state:
+            self.heartbeatState[s] = state
+            if state == heartbeat.Stale:
+                PathLog.warning("%s.%s is stale" % (self.name(), s))
+            MKSignal.post(self.heartbeatUpdate.emit, service, heartbeat)
+        if heartbeat.reconnectDue(now):
+            PathLog.info("Reconnecting %s.%s (%d)" % (self.name(), s, heartbeat.reconnects + 1))
+            self.Poller.unregister(service.socket)
+            del self.Sockets[service.socket]
+            del self.socket[service.socket]
+            service.reconnect(self.Context)
+            self.socket[service.socket] = service
+            self.Sockets[service.socket] = (self, service)
+            self.Poller.register(service.socket, zmq.POLLIN)
+            heartbeat.reconnected(now)
+
+    def heartbeats(self):
+        '''Return a dictionary with the MKHeartbeat of each connected service.'''
+        with self.lock:
+            return {s: service.heartbeat for s, service in self.service.items() if service and self.isConnected(service)}
+
+    def startRecording(self, path):
+        '''startRecording(path) ... append all messages received from MK to the recording file path (see MKRecorder).'''
+        import MKRecorder
+        recorder = MKRecorder.MKRecorder(path)
+        self.stopRecording()
+        self.recorder = recorder
+
+    def stopRecording(self):
+        '''Stop recording, if a recording is in progress.'''
+        recorder = self.recorder
+        self.recorder = None
+        if recorder:
+            recorder.close()
+
     def changed(self, service, msg):
-        '''Callback invoked by the framework when one of the services received an update.'''
+        '''Callback invoked by the framework when one of the services received an update.
+        Typically this happens in the I/O thread, the update is posted to the signal backend.'''
+        MKSignal.post(self._serviceChanged, service, msg)
+
+    def _serviceChanged(self, service, msg):
+        '''Internal - processes a posted service update and emits the appropriate signal.'''
+        stats = self.stats
+        if stats:
+            begin = time.perf_counter()
+            self._emitServiceChanged(service, msg)
+            stats[service.topicName().split('.')[0]].emit.add(time.perf_counter() - begin)
+        else:
+            self._emitServiceChanged(service, msg)
+
+    def _emitServiceChanged(self, service, msg):
         if 'status.' in service.topicName():
-            if ('status.task' == service.topicName() and 'file' in msg) or ('status.config' == service.topicName() and 'remote_path' in msg):
+            if msg and (('status.task' == service.topicName() and 'file' in msg) or ('status.config' == service.topicName() and 'remote_path' in msg)):
                 self.updateJob()
             self.statusUpdate.emit(service, msg)
+            if msg:
+                self.frameUpdated |= msg.mask
+            else:
+                self.frameUpdated |= Paths.register(service.topicName())
+            if not self.framePending:
+                self.framePending = True
+                MKSignal.postDelayed(self.FrameMS, self._statusFrameChanged)
         elif 'hal' in service.topicName():
             self.halUpdate.emit(service, msg)
         elif 'error' in service.topicName():
-            self.errorUpdate.emit(self, msg)
-            display = PathLog.info
-            if msg.isError():
-                display = PathLog.error
-            if msg.isText():
-                display = PathLog.notice
-            for m in msg.messages():
-                display(m)
+            self._emitError(msg)
         elif 'command' in service.topicName():
             self.commandUpdate.emit(service, msg)
 
+    def _emitError(self, msg):
+        self.errorUpdate.emit(self, msg)
+        display = PathLog.info
+        if msg.isError():
+            display = PathLog.error
+        if msg.isText():
+            display = PathLog.notice
+        for m in msg.messages():
+            display(m)
+
+    def _followingErrorAlert(self, msg):
+        '''Internal - called by the following error monitor in the I/O thread.'''
+        MKSignal.post(self._emitError, msg)
+
+    def _statusFrameChanged(self):
+        '''Internal - emits all status updates of the last frame as a single statusFrameUpdate.'''
+        updated = MKUpdated(self.frameUpdated, Paths.root)
+        self.frameUpdated = 0
+        self.framePending = False
+        stats = self.stats
+        if stats:
+            begin = time.perf_counter()
+            self._emitStatusFrame(updated)
+            stats['status'].frame.add(time.perf_counter() - begin)
+        else:
+            self._emitStatusFrame(updated)
+
+    def _emitStatusFrame(self, updated):
+        self.statusFrameUpdate.emit(updated)
+        # subscribers typically depend on isValid as well, they get notified whenever that changes
+        valid = self.isValid()
+        always = valid != self.frameValid
+        self.frameValid = valid
+        due = None
+        for subscription in list(self.subscriptions):
+            subscription.dispatch(updated, always)
+            d = subscription.due()
+            if not d is None and (due is None or d < due):
+                due = d
+        if not due is None and not self.flushPending:
+            # make sure changes held back get notified even if nothing changes anymore
+            self.flushPending = True
+            MKSignal.postDelayed(max(0, int(1000 * (due - time.monotonic())) + 1), self._flushSubscriptions)
+
+    def _flushSubscriptions(self):
+        '''Internal - notifies all subscriptions of the changes they held back, those which aren't due yet
+        are notified a little early rather than scheduling another flush.'''
+        self.flushPending = False
+        for subscription in list(self.subscriptions):
+            if not subscription.due() is None:
+                subscription.flush()
+
+    def subscribe(self, paths, callback, deadband=None, interval=None):
+        '''subscribe(paths, callback, deadband=None, interval=None) ... invoke callback(updated) at the end of
+        each frame in which one of the given status paths, or a path below them, changed - and whenever the
+        validity of the status changes. Paths may contain '*' for any single element, e.g.
+        'status.motion.axis.*.homed'.
+        If deadband is given numeric changes are only notified once a value differs by more than deadband
+        from the one last notified. If interval is given changes are notified at most every interval
+        seconds, unless they exceed the deadband. Changes held back are notified once the interval
+        has passed, at the latest.
+        Returns the subscription, which is needed to unsubscribe.'''
+        subscription = MKSubscription(paths, callback, value=self.__getitem__, deadband=deadband, interval=interval)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        '''unsubscribe(subscription) ... stop notifying the given subscription.'''
+        self.subscriptions = [s for s in self.subscriptions if s != subscription]
+
+    def enableMetrics(self, enable=True):
+        '''enableMetrics(enable=True) ... start or stop collecting metrics for all services (see MKMetrics).
+        Metrics collected so far are kept when disabled and continued when enabled again.'''
+        if enable:
+            if self.metricsCollected is None:
+                import MKMetrics
+                self.metricsCollected = MKMetrics.MKMetrics()
+            self.stats = self.metricsCollected
+        else:
+            self.stats = None
+
+    def metrics(self):
+        '''Return the collected MKMetrics, or None if metrics were never enabled.'''
+        return self.metricsCollected
+
+    def resetMetrics(self):
+        '''Reset all collected metrics.'''
+        if self.metricsCollected:
+            self.metricsCollected.reset()
+
     def providesServices(self, services):
         '''Return True if the given services are detected by the receiver.'''
         if services is None:
@@ -228,17 +514,103 @@ class Machinekit(PySide.QtCore.QObject):
             return False
         if not self['status'].isValid():
             return False
+        if self['status'].isStale():
+            return False
         if self['command'] is None:
             return False
         return True
 
+    def isStale(self):
+        '''Return True if the status shown is the preloaded one, MK hasn't sent its own yet.'''
+        status = self['status']
+        return not status is None and status.isStale()
+
     def isPowered(self):
         '''Return True if MK is powered on and ready to be used.'''
         return self.isValid() and (not self['status.io.estop']) and self['status.motion.enabled']
 
     def isHomed(self):
         '''Return True if all axes are homed.'''
-        return self.isPowered() and all([axis.homed != 0 for axis in self['status.motion.axis']])
+        if not self.isPowered():
+            return False
+        arrays = self['status'].handler['motion'].arrays
+        if arrays:
+            return arrays.isHomed()
+        return all([axis.homed != 0 for axis in self['status.motion.axis']])
+
+    def snapshot(self):
+        '''Return the MKStatusSnapshot of the current status, which can be read from any thread without
+        holding a lock. Returns None if there is no status yet.
+        Snapshots are published by the I/O thread, only the first call has to enable them.'''
+        status = self['status']
+        if status is None:
+            return None
+        snapshot = status.snapshot
+        if snapshot is None:
+            with self.lock:
+                status.enableSnapshots()
+                snapshot = status.snapshot
+        return snapshot
+
+    def enableTelemetry(self, length=None, enable=True):
+        '''enableTelemetry(length=None, enable=True) ... start or stop recording the motion telemetry of the
+        last length samples, see MKTelemetry. Returns the telemetry, which is kept when disabled.'''
+        status = self['status']
+        if status is None:
+            return None
+        motion = status.handler['motion']
+        with self.lock:
+            if enable:
+                telemetry = self.telemetryRecorded
+                if telemetry is None or (length and length != telemetry.length):
+                    import MKTelemetry
+                    telemetry = MKTelemetry.MKTelemetry(length)
+                motion.telemetry = telemetry
+                self.telemetryRecorded = telemetry
+            else:
+                motion.telemetry = None
+        return self.telemetryRecorded
+
+    def enableFollowingErrorMonitor(self, fraction=None, enable=True):
+        '''enableFollowingErrorMonitor(fraction=None, enable=True) ... start or stop monitoring the following
+        error of all axes during program runs, see MKFollowingError. Crossing fraction of the following error
+        limit is notified through errorUpdate. Returns the MKFollowingErrorMonitor.'''
+        status = self['status']
+        if status is None:
+            return None
+        motion = status.handler['motion']
+        with self.lock:
+            if enable:
+                if motion.monitor is None:
+                    import MKFollowingError
+                    motion.monitor = MKFollowingError.MKFollowingErrorMonitor(status, self._followingErrorAlert, fraction)
+                elif fraction:
+                    motion.monitor.fraction = fraction
+            else:
+                motion.monitor = None
+            return motion.monitor
+
+    def telemetry(self):
+        '''Return the MKTelemetry recorded, or None if telemetry was never enabled.'''
+        return self.telemetryRecorded
+
+    def motionArrays(self, create=True):
+        '''motionArrays(create=True) ... return the MKMotionArrays of status.motion, which are maintained from
+        now on. Returns None if numpy is not available or status.motion has not been received yet. If create
+        is False the arrays are only returned if they are already maintained.'''
+        status = self['status']
+        if status is None or not status.isValid(['motion']):
+            return None
+        if not create:
+            return status.handler['motion'].arrays
+        import MKMotionArrays
+        if MKMotionArrays.numpy is None:
+            return None
+        motion = status.handler['motion']
+        with self.lock:
+            if motion.arrays is None:
+                motion.arrays = MKMotionArrays.MKMotionArrays(motion)
+        return motion.arrays
 
     def setJob(self, job):
         '''setJob(job) ... set the given job as the one currently loaded into MK.'''
@@ -253,9 +625,13 @@ class Machinekit(PySide.QtCore.QObject):
     def name(self):
         '''Convenience function to return a good name for the receiver.'''
         if self.nam is None:
-            self.nam = self['status.config.name']
-            if self.nam is None:
+            name = self['status.config.name']
+            if name is None:
                 return self.instance.uuid.decode()
+            if self['status'].isStale('config'):
+                # MK might have been renamed since
+                return name
+            self.nam = name
         return self.nam
 
     def mdi(self, cmd):
@@ -308,6 +684,8 @@ class Machinekit(PySide.QtCore.QObject):
 
     def boundBox(self):
         '''Return a BoundBox as defined by MK's x, y and z axes limits.'''
+        if FreeCAD is None:
+            return None
         x = self['status.config.axis.0.limit']
         y = self['status.config.axis.1.limit']
         z = self['status.config.axis.2.limit']
@@ -349,7 +727,7 @@ class Machinekit(PySide.QtCore.QObject):
                 buf.seek(0)
                 self.gcode = [line.decode().strip() for line in buf]
 
-                if len(self.gcode) > 2 and self.gcode[0].startswith('(FreeCAD.Job: ') and self.gcode[1].startswith('(FreeCAD.File: ') and self.gcode[2].startswith('(FreeCAD.Signature: '):
+                if FreeCAD and len(self.gcode) > 2 and self.gcode[0].startswith('(FreeCAD.Job: ') and self.gcode[1].startswith('(FreeCAD.File: ') and self.gcode[2].startswith('(FreeCAD.Signature: '):
                     title     = self.gcode[0][14:-1]
                     filename  = self.gcode[1][15:-1]
                     signature = self.gcode[2][20:-1]
@@ -367,43 +745,124 @@ class Machinekit(PySide.QtCore.QObject):
 
         self.setJob(job)
 
-_MachinekitInstanceMonitor = MachinekitInstance.ServiceMonitor()
+class IOThread(object):
+    '''Singleton running all communication with MK on a dedicated thread. DO NOT USE.
+    The thread blocks on the Poller and processes each message as soon as it arrives. Buffers
+    sent from any other thread are queued and the I/O thread is woken up to send them, that
+    way all sockets are exclusively used by the I/O thread.'''
+
+    HousekeepingInterval = 0.5
+
+    def __init__(self):
+        self.outbox = queue.Queue()
+        self.wakeupRx, self.wakeupTx = os.pipe()
+        Machinekit.Poller.register(self.wakeupRx, zmq.POLLIN)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def send(self, socket, buf):
+        '''send(socket, buf) ... send buf through socket from the I/O thread.'''
+        if threading.current_thread() == self.thread:
+            socket.send(buf)
+        else:
+            self.outbox.put((socket, buf))
+            os.write(self.wakeupTx, b'\0')
+
+    def _sendQueued(self):
+        os.read(self.wakeupRx, 4096)
+        while not self.outbox.empty():
+            socket, buf = self.outbox.get()
+            try:
+                socket.send(buf)
+            except zmq.ZMQError as e:
+                PathLog.error("send failed: %s" % e)
+
+    def _housekeeping(self, now):
+        for mk in list(_Machinekit.values()):
+            mk._update(now)
+
+    def _receive(self, socket):
+        receiver = Machinekit.Sockets.get(socket)
+        if receiver is None:
+            PathLog.debug("Unconnected socket? %08x" % id(socket))
+        else:
+            mk, service = receiver
+            mk._receiveMessage(socket, service)
+
+    def run(self):
+        last = 0
+        while True:
+            try:
+                now = time.monotonic()
+                if (now - last) >= self.HousekeepingInterval:
+                    self._housekeeping(now)
+                    last = now
+                timeout = (last + self.HousekeepingInterval - time.monotonic()) * 1000
+                for socket, event in Machinekit.Poller.poll(max(0, timeout)):
+                    if socket == self.wakeupRx:
+                        self._sendQueued()
+                    else:
+                        self._receive(socket)
+            except Exception as e:
+                # don't let a single bad message take down all communication with MK
+                PathLog.error("I/O thread: %s" % e)
+                traceback.print_exc()
+
+# discovery and the I/O thread are started on first use, by Instances() and Any()
+_MachinekitInstanceMonitor = None
+_MachinekitIO = None
 _Machinekit = {}
 
+def _start():
+    '''Internal - start service discovery and the I/O thread, unless they are already running.'''
+    global _MachinekitInstanceMonitor, _MachinekitIO
+    if _MachinekitIO is None:
+        _MachinekitIO = IOThread()
+        _MachinekitInstanceMonitor = MachinekitInstance.ServiceMonitor()
+        _preloadInstances()
+        MachinekitStartup.mark('discovery started')
+        PathLog.info("startup:\n%s" % MachinekitStartup.report())
+
+def _preloadInstances():
+    '''Internal - create an instance for each saved status, they show the saved status until MK is discovered.'''
+    if os.path.isdir(Machinekit.StatusStoreDir):
+        for name in sorted(os.listdir(Machinekit.StatusStoreDir)):
+            if name.endswith('.mkstat'):
+                uuid = name[:-len('.mkstat')].encode()
+                if _Machinekit.get(uuid) is None:
+                    _Machinekit[uuid] = Machinekit(MachinekitInstance.MachinekitInstance(uuid, {b'uuid': uuid}))
+    MachinekitStartup.mark('saved status loaded')
+
 def _update():
-    '''Internal callback periodically invoked for houskeeping tasks.'''
+    '''Internal callback periodically invoked by the GUI for houskeeping tasks, once discovery was started.'''
+    if _MachinekitInstanceMonitor is None:
+        return
+
     # first make sure we know about all MK instances
     for inst in _MachinekitInstanceMonitor.instances(None):
-        if _Machinekit.get(inst.uuid) is None:
+        mk = _Machinekit.get(inst.uuid)
+        if mk is None:
             _Machinekit[inst.uuid] = Machinekit(inst)
-
-    # then let each MK instance update itself
-    now = time.monotonic()
-    for mk in _Machinekit.values():
-        mk._update(now)
-
-    # now check for any messages that need to be processed
-    poll = True
-    while poll:
-        # As it turns out the poller most often returns a single pair so we want to call it
-        # in a loop to get all pending updates.
-        poll = dict(Machinekit.Poller.poll(0))
-        for socket in poll:
-            processed = False
-            for mk in _Machinekit.values():
-                if socket in mk.socket:
-                    mk._receiveMessage(socket)
-                    processed = True
-            if not processed:
-                PathLog.debug("Unconnected socket? %08x" % id(socket))
-
-def Instances(services=None):
-    '''Instances(services=None) ... Answer a list of all discovered Machinekit instances which provide all services listed.
-    If no services are requested all discovered MK instances are returned.'''
-    return [mk for mk in _Machinekit.values() if mk.providesServices(services)]
+        elif mk.instance is not inst:
+            # instance created from its saved status, see _preloadInstances
+            mk.instance = inst
+
+    # downloading the job has to be done in the GUI thread
+    for mk in list(_Machinekit.values()):
+        if mk.needUpdateJob:
+            mk.updateJob()
+
+def Instances(services=None, stale=False):
+    '''Instances(services=None, stale=False) ... Answer a list of all discovered Machinekit instances which provide all services listed.
+    If no services are requested all discovered MK instances are returned. If stale is True the instances showing
+    their saved status, which haven't been discovered yet, are included as well.
+    Starts service discovery on first use.'''
+    _start()
+    return [mk for mk in _Machinekit.values() if mk.providesServices(services) or (stale and mk.isStale())]
 
 def Any():
-    '''Any() ... returns a Machinekit instance, if at least one was discovered.'''
+    '''Any() ... returns a Machinekit instance, if at least one was discovered. Starts service discovery on first use.'''
+    _start()
     for mk in _Machinekit.values():
         return mk
     return None
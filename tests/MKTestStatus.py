@@ -0,0 +1,32 @@
+# Status updates for the tests, as the simulator sends them.
+
+import machinetalk.protobuf.message_pb2 as MESSAGE
+import machinetalk.protobuf.types_pb2 as TYPES
+import zmq
+
+from MKServiceStatus import MKServiceStatus
+from MKSimulator import MKSimulator
+
+Topics = ['config', 'interp', 'io', 'motion', 'task']
+
+def fullUpdates():
+    '''Return a dictionary with the full update Container of each status topic.'''
+    sim = MKSimulator()
+    try:
+        return {topic: sim._status(topic, True) for topic in Topics}
+    finally:
+        sim.context.term()
+
+def incrementalUpdate():
+    '''Return an empty incremental status update Container.'''
+    container = MESSAGE.Container()
+    container.type = TYPES.MT_EMCSTAT_INCREMENTAL_UPDATE
+    return container
+
+def statusService(containers=None):
+    '''Return a MKServiceStatus which isn't connected to anything, with the given containers applied.'''
+    properties = {b'service': b'status', b'uuid': b'test', b'dsn': b'inproc://status-test'}
+    service = MKServiceStatus(zmq.Context.instance(), 'status', properties)
+    if containers:
+        service.processBatch(containers)
+    return service
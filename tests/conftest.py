@@ -0,0 +1,7 @@
+# The workbench modules live in the root of the repository, which is where FreeCAD expects
+# them - make them importable for the tests regardless of where pytest is invoked from.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,99 @@
+# Tests for the following error monitor and its histograms.
+
+import types
+import unittest
+
+from MKFollowingError import MKFerrorHistogram, MKFollowingErrorMonitor
+
+class TestMKFerrorHistogram(unittest.TestCase):
+
+    def test_bins(self):
+        h = MKFerrorHistogram()
+        h.add(0.0)
+        h.add(1e-9)  # below the smallest bin
+        h.add(1e-3)
+        h.add(1e3)   # above the largest bin
+        self.assertEqual(h.bins[0], 1)
+        self.assertEqual(h.bins[1], 1)
+        self.assertEqual(h.bins[-1], 1)
+        self.assertEqual(sum(h.bins), 4)
+        self.assertEqual(h.max, 1e3)
+
+    def test_percentile(self):
+        h = MKFerrorHistogram()
+        for i in range(100):
+            h.add(0.001 * (i + 1))
+        self.assertLessEqual(h.percentile(50), 0.05 * 10 ** (1 / h.BinsPerDecade))
+        self.assertGreaterEqual(h.percentile(50), 0.05)
+        self.assertEqual(h.percentile(100), h.max)
+        self.assertAlmostEqual(h.mean(), 0.0505)
+        self.assertEqual(MKFerrorHistogram().percentile(99), 0.0)
+
+class Axis(object):
+    def __init__(self, index):
+        self.index = index
+        self.ferror_current = 0.0
+        self.velocity = 1.0
+
+class TestMKFollowingErrorMonitor(unittest.TestCase):
+
+    def setUp(self):
+        limits = types.SimpleNamespace(maxV=1.0, ferror=types.SimpleNamespace(min=0.1, max=1.0))
+        config = types.SimpleNamespace(axis=types.SimpleNamespace(element=lambda index: limits))
+        self.interp = types.SimpleNamespace(state=2)
+        status = types.SimpleNamespace(handler={'config': config, 'interp': self.interp, 'task': types.SimpleNamespace(file='job.ngc')})
+        self.alerts = []
+        self.monitor = MKFollowingErrorMonitor(status, self.alerts.append, 0.5)
+        self.motion = types.SimpleNamespace(axis=[Axis(0), Axis(1)], line=1)
+
+    def sample(self, updated):
+        self.monitor.sample(self.motion, updated)
+
+    def test_updated(self):
+        self.sample([])
+        self.motion.axis[0].ferror_current = 0.3
+        self.sample(['axis.0.ferror_current'])
+        self.sample(['line'])
+        run = self.monitor.runs[-1]
+        self.assertEqual(run.file, 'job.ngc')
+        self.assertEqual({index: h.count for index, h in run.histogram.items()}, {0: 2, 1: 1})
+        self.assertEqual(run.max[0], (0.3, 1))
+
+    def test_lines(self):
+        self.sample([])
+        self.motion.axis[0].ferror_current = 0.3
+        self.sample(['axis.0.ferror_current'])
+        self.motion.line = 2
+        self.motion.axis[1].ferror_current = -0.2
+        self.sample(['axis.1.ferror_current'])
+        run = self.monitor.runs[-1]
+        self.assertEqual(list(run.lines[1]), [0.3, 0.0])
+        self.assertEqual(list(run.lines[2]), [0.3, 0.2])
+        self.assertEqual(run.worstLines(1), [(2, 0.2), (1, 0.0)])
+        self.assertEqual(run.summary()[1]['line'], 2)
+
+    def test_alert(self):
+        self.sample([])
+        self.motion.axis[1].ferror_current = 0.6
+        self.sample(['axis.1.ferror_current'])
+        self.sample(['axis.1.ferror_current'])
+        self.assertEqual(len(self.alerts), 1)
+        self.assertEqual(self.alerts[0].index, 1)
+        self.motion.axis[1].ferror_current = 0.1
+        self.sample(['axis.1.ferror_current'])
+        self.motion.axis[1].ferror_current = 0.7
+        self.sample(['axis.1.ferror_current'])
+        self.assertEqual(len(self.alerts), 2)
+
+    def test_runs(self):
+        self.sample([])
+        self.interp.state = 1
+        self.sample([])
+        self.assertIsNone(self.monitor.run)
+        self.assertIsNotNone(self.monitor.runs[-1].finished)
+        self.interp.state = 2
+        self.sample([])
+        self.assertEqual(len(self.monitor.runs), 2)
+
+if __name__ == '__main__':
+    unittest.main()
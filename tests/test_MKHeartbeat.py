@@ -0,0 +1,69 @@
+# Tests for the heartbeat supervision of a service.
+
+import unittest
+
+from MKHeartbeat import MKHeartbeat
+
+class TestMKHeartbeat(unittest.TestCase):
+
+    def test_unknown(self):
+        heartbeat = MKHeartbeat(0.0)
+        heartbeat.received(1.0)
+        self.assertEqual(heartbeat.check(100.0), MKHeartbeat.Unknown)
+        self.assertFalse(heartbeat.reconnectDue(100.0))
+
+    def test_alive(self):
+        heartbeat = MKHeartbeat(0.0)
+        heartbeat.received(0.0, keepalive=1000)
+        self.assertEqual(heartbeat.keepalive, 1.0)
+        self.assertEqual(heartbeat.check(1.5), MKHeartbeat.Alive)
+        heartbeat.received(1.5, ping=True)
+        self.assertEqual(heartbeat.check(3.0), MKHeartbeat.Alive)
+
+    def test_reconnect(self):
+        heartbeat = MKHeartbeat(0.0)
+        heartbeat.received(0.0, keepalive=1000)
+        self.assertEqual(heartbeat.check(2.5), MKHeartbeat.Stale)
+        self.assertTrue(heartbeat.reconnectDue(2.5))
+        heartbeat.reconnected(2.5)
+        self.assertEqual(heartbeat.reconnects, 1)
+        self.assertFalse(heartbeat.reconnectDue(2.5 + MKHeartbeat.BackoffMin / 2))
+        self.assertTrue(heartbeat.reconnectDue(2.5 + MKHeartbeat.BackoffMin))
+
+    def test_backoff(self):
+        heartbeat = MKHeartbeat(0.0)
+        heartbeat.received(0.0, keepalive=1000)
+        now = heartbeat.Liveness + 1.0
+        heartbeat.check(now)
+        delays = []
+        for i in range(8):
+            delays.append(heartbeat.backoff)
+            heartbeat.reconnected(now)
+            now = heartbeat.nextReconnect
+        self.assertEqual(delays[:3], [MKHeartbeat.BackoffMin, 2 * MKHeartbeat.BackoffMin, 4 * MKHeartbeat.BackoffMin])
+        self.assertEqual(delays[-1], MKHeartbeat.BackoffMax)
+        # MK responding again resets the backoff
+        heartbeat.received(now)
+        self.assertEqual(heartbeat.check(now), MKHeartbeat.Alive)
+        self.assertEqual(heartbeat.backoff, MKHeartbeat.BackoffMin)
+        self.assertFalse(heartbeat.reconnectDue(now + 100))
+
+    def test_ping(self):
+        heartbeat = MKHeartbeat(0.0, pingInterval=2.0)
+        self.assertTrue(heartbeat.pingDue(0.0))
+        self.assertFalse(heartbeat.pingDue(1.0))
+        heartbeat.acknowledged(0.25)
+        self.assertEqual(heartbeat.rtt, 0.25)
+        self.assertEqual(heartbeat.check(0.25), MKHeartbeat.Alive)
+        self.assertTrue(heartbeat.pingDue(2.0))
+
+    def test_jitter(self):
+        heartbeat = MKHeartbeat(0.0)
+        for now in [0.0, 1.0, 2.0, 3.0]:
+            heartbeat.received(now, ping=True, keepalive=1000)
+        self.assertEqual(heartbeat.jitter, 0.0)
+        heartbeat.received(5.0, ping=True)
+        self.assertGreater(heartbeat.jitter, 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+# Tests for the histograms of the metrics.
+
+import unittest
+
+from MKMetrics import MKHistogram, MKMetrics
+
+class TestMKHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        h = MKHistogram()
+        h.add(0.0000005) # below 1µs
+        h.add(0.000003)  # 3µs
+        h.add(0.001)     # 1ms
+        self.assertEqual(h.count, 3)
+        self.assertEqual(h.buckets[0], 1)
+        self.assertEqual(h.buckets[2], 1)
+        self.assertEqual(h.buckets[10], 1)
+        self.assertEqual(h.max, 0.001)
+        self.assertAlmostEqual(h.mean(), (0.0000005 + 0.000003 + 0.001) / 3)
+
+    def test_overflow(self):
+        h = MKHistogram()
+        h.add(1e6)
+        self.assertEqual(h.buckets[-1], 1)
+
+    def test_percentile(self):
+        h = MKHistogram()
+        for i in range(99):
+            h.add(0.000003)
+        h.add(0.001)
+        self.assertEqual(h.percentile(50), 4e-6)
+        self.assertEqual(h.percentile(99), 4e-6)
+        self.assertEqual(h.percentile(100), 1024e-6)
+        self.assertEqual(MKHistogram().percentile(50), 0.0)
+
+    def test_reset(self):
+        metrics = MKMetrics()
+        metrics['status'].received([b'topic', b'1234'])
+        metrics['status'].batches += 1
+        metrics['status'].parse.add(0.001)
+        self.assertEqual(metrics.asDict()['status']['bytes'], 9)
+        metrics.reset()
+        self.assertEqual(metrics.asDict(), {'status': {'messages': 0, 'bytes': 0, 'batches': 0}})
+        self.assertEqual(metrics['status'].parse.count, 0)
+        self.assertEqual(sum(metrics['status'].parse.buckets), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# Tests for decoding the modal state of the interpreter.
+
+import unittest
+
+from MKServiceStatus import MKModalState, gcodeName, mergeCodes
+from MKTestStatus import fullUpdates, incrementalUpdate, statusService
+
+# index 0 is the sequence number, 1 the motion mode and 2 the non-modal code of the block
+GCodes = [(0, 0), (1, 10), (2, -1), (3, 180), (4, 410), (5, 200), (6, 910), (7, 930), (8, 591), (9, 430), (10, 980), (11, 640)]
+MCodes = [(0, 0), (1, 3), (2, 7), (3, 8), (4, 49)]
+
+class TestMKModalState(unittest.TestCase):
+
+    def test_gcodeName(self):
+        self.assertEqual(gcodeName(170), 'G17')
+        self.assertEqual(gcodeName(591), 'G59.1')
+        self.assertEqual(gcodeName(0), 'G0')
+
+    def test_decode(self):
+        modal = MKModalState(GCodes, MCodes)
+        self.assertEqual(modal.motion, 'G1')
+        self.assertEqual(modal.plane, 'G18')
+        self.assertEqual(modal.cutterComp, 'G41')
+        self.assertEqual(modal.units, 'G20')
+        self.assertEqual(modal.distance, 'G91')
+        self.assertEqual(modal.feedMode, 'G93')
+        self.assertEqual(modal.wcs, 'G59.1')
+        self.assertEqual(modal.toolLength, 'G43')
+        self.assertEqual(modal.retract, 'G98')
+        self.assertEqual(modal.pathControl, 'G64')
+        self.assertIsNone(modal.arcDistance)
+        self.assertIsNone(modal.latheMode)
+        self.assertEqual(modal.spindle, 'M3')
+        self.assertTrue(modal.mist)
+        self.assertTrue(modal.flood)
+        self.assertEqual(modal.overrides, 'M49')
+        self.assertFalse(modal.isMetric())
+        self.assertFalse(modal.isAbsolute())
+
+    def test_codes(self):
+        modal = MKModalState(GCodes, MCodes)
+        self.assertEqual(modal.codes(), ['G1', 'G18', 'G20', 'G91', 'G93', 'G59.1', 'G41', 'G43', 'G98', 'G64', 'M3', 'M7', 'M8', 'M49'])
+        self.assertEqual(MKModalState([(1, -1)], [(1, 5)]).codes(), ['M5', 'M9'])
+
+    def test_equality(self):
+        self.assertEqual(MKModalState(GCodes, MCodes), MKModalState(list(reversed(GCodes)), MCodes))
+        self.assertEqual(hash(MKModalState(GCodes, MCodes)), hash(MKModalState(GCodes, MCodes)))
+        self.assertNotEqual(MKModalState(GCodes, MCodes), MKModalState(GCodes, [(1, 5)]))
+        self.assertNotEqual(MKModalState(GCodes, MCodes), None)
+
+    def test_mergeCodes(self):
+        codes = [(0, 0), (1, 10)]
+        incremental = incrementalUpdate()
+        code = incremental.emc_status_interp.gcodes.add()
+        code.index = 1
+        code.value = 10
+        self.assertIsNone(mergeCodes(codes, incremental.emc_status_interp.gcodes))
+        code.value = 0
+        self.assertEqual(mergeCodes(codes, incremental.emc_status_interp.gcodes), [(0, 0), (1, 0)])
+
+    def test_interp(self):
+        status = statusService(list(fullUpdates().values()))
+        modal = status.get('interp.modal')
+        self.assertTrue(modal.isMetric())
+        self.assertTrue(modal.isAbsolute())
+        self.assertEqual(modal.plane, 'G17')
+        self.assertEqual(modal.spindle, 'M5')
+
+        container = incrementalUpdate()
+        code = container.emc_status_interp.gcodes.add()
+        code.index = 3
+        code.value = 190
+        status.processBatch([container])
+        self.assertEqual(status.get('interp.modal').plane, 'G19')
+        self.assertIsNot(status.get('interp.modal'), modal)
+
+if __name__ == '__main__':
+    unittest.main()
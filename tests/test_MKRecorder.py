@@ -0,0 +1,92 @@
+# Tests for recording and replaying the traffic of a MK instance.
+
+import os
+import tempfile
+import unittest
+
+import MKRecorder
+import machinekit
+
+from MKTestStatus import fullUpdates, incrementalUpdate
+
+class TestMKRecording(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'test.mkrec')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self, messages):
+        recorder = MKRecorder.MKRecorder(self.path)
+        for service, frames in messages:
+            recorder.record(service, frames)
+        recorder.close()
+
+    def test_round_trip(self):
+        messages = [('status', [b'motion', b'1234']), ('error', [b'']), ('status', [b'config', b'x' * 300])]
+        self.record(messages)
+        recording = MKRecorder.MKRecording(self.path)
+        self.assertEqual([(service, frames) for t, service, frames in recording], messages)
+        self.assertEqual(recording.services(), ['error', 'status'])
+
+    def test_append(self):
+        self.record([('status', [b'1'])])
+        self.record([('status', [b'2'])])
+        records = list(MKRecorder.MKRecording(self.path))
+        self.assertEqual([frames for t, s, frames in records], [[b'1'], [b'2']])
+        self.assertLessEqual(records[0][0], records[1][0])
+
+    def test_truncated(self):
+        self.record([('status', [b'motion', b'1234']), ('status', [b'motion', b'5678'])])
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        first = len(MKRecorder.Magic) + MKRecorder.Record.size + len(b'status') + 2 * MKRecorder.Frame.size + len(b'motion1234')
+        # cut the file at every byte, in the middle of the header, the name, a frame length and a frame
+        for end in range(len(MKRecorder.Magic), len(data)):
+            with open(self.path, 'wb') as f:
+                f.write(data[:end])
+            records = list(MKRecorder.MKRecording(self.path))
+            self.assertEqual(len(records), 1 if end >= first else 0, end)
+            if records:
+                self.assertEqual(records[0][2], [b'motion', b'1234'])
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a recording')
+        with self.assertRaises(ValueError):
+            MKRecorder.MKRecording(self.path)
+
+class TestMKReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'test.mkrec')
+        self.storeDir = machinekit.Machinekit.StatusStoreDir
+        machinekit.Machinekit.StatusStoreDir = self.tmp.name
+
+    def tearDown(self):
+        machinekit.Machinekit.StatusStoreDir = self.storeDir
+        self.tmp.cleanup()
+
+    def test_replay(self):
+        recorder = MKRecorder.MKRecorder(self.path)
+        for topic, container in fullUpdates().items():
+            recorder.record('status', [topic.encode(), container.SerializeToString()])
+        for x in range(1, 4):
+            container = incrementalUpdate()
+            container.emc_status_motion.actual_position.x = x
+            recorder.record('status', [b'motion', container.SerializeToString()])
+        recorder.close()
+
+        replay = MKRecorder.MKReplay(self.path, speed=None)
+        mk = MKRecorder.MKReplay.machinekit(b'replay-test')
+        replay.replay(mk, batch=2)
+        self.assertEqual(replay.count, 8)
+        self.assertTrue(mk['status'].isValid())
+        self.assertEqual(mk['status.config.name'], 'mksim')
+        self.assertEqual(mk['status.motion.position.actual.x'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
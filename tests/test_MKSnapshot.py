@@ -0,0 +1,78 @@
+# Tests for the immutable status snapshots.
+
+import collections.abc
+import unittest
+
+from MKSnapshot import MKStatusSnapshot, freeze
+from MKTestStatus import fullUpdates, incrementalUpdate, statusService
+
+class TestFreeze(unittest.TestCase):
+
+    def test_scalars(self):
+        for value in [None, True, 3, 2.5, 'G17', b'uuid']:
+            self.assertIs(freeze(value), value)
+
+    def test_containers(self):
+        frozen = freeze({'a': [1, {'b': 2}]})
+        self.assertIsInstance(frozen, collections.abc.Mapping)
+        self.assertEqual(frozen['a'], (1, {'b': 2}))
+        with self.assertRaises(TypeError):
+            frozen['a'] = None
+        with self.assertRaises(TypeError):
+            frozen['a'][1]['b'] = None
+
+class TestMKStatusSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.full = fullUpdates()
+        self.status = statusService(list(self.full.values()))
+        self.status.enableSnapshots()
+
+    def move(self, x):
+        container = incrementalUpdate()
+        container.emc_status_motion.actual_position.x = x
+        self.status.processBatch([container])
+
+    def test_published(self):
+        before = self.status.snapshot
+        self.assertEqual(before['status.config.name'], 'mksim')
+        self.move(5.0)
+        after = self.status.snapshot
+        self.assertIsNot(before, after)
+        self.assertGreater(after.version, before.version)
+        self.assertEqual(after['motion.position.actual.x'], 5.0)
+        self.assertEqual(before['motion.position.actual.x'], 0.0)
+        # topics which weren't updated are shared
+        self.assertIs(before.topics['config'], after.topics['config'])
+        self.assertIsNot(before.topics['motion'], after.topics['motion'])
+
+    def test_lookup(self):
+        snapshot = self.status.snapshot
+        self.assertEqual(snapshot['motion.axis.1.homed'], False)
+        self.assertIn('homed', snapshot['motion.axis.1'])
+        self.assertIsNone(snapshot.get('motion.no.such.path'))
+        with self.assertRaises(KeyError):
+            snapshot['motion.no.such.path']
+
+    def test_diff(self):
+        before = self.status.snapshot
+        self.move(5.0)
+        after = self.status.snapshot
+        self.assertEqual(after.diff(before), ['status.motion.position.actual'])
+        self.assertEqual(after.diff(after), [])
+
+    def test_diff_by_value(self):
+        before = self.status.snapshot
+        # a full update refreezes all values of the topic, but none of them changed
+        self.status.processBatch([self.full['config']])
+        after = self.status.snapshot
+        self.assertIsNot(before.topics['config'], after.topics['config'])
+        self.assertEqual(after.diff(before), [])
+
+    def test_diff_missing(self):
+        empty = MKStatusSnapshot(0, {})
+        self.assertIn('status.config.name', self.status.snapshot.diff(empty))
+        self.assertIn('status.config.name', empty.diff(self.status.snapshot))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# Tests for saving and loading the status of a MK instance.
+
+import os
+import tempfile
+import unittest
+
+import MKStatusStore
+
+from MKTestStatus import fullUpdates, incrementalUpdate
+
+class TestMKStatusStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache', 'test.mkstat')
+        self.full = fullUpdates()
+        self.store = MKStatusStore.MKStatusStore()
+        for topic, container in self.full.items():
+            self.store.track(topic, container)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        self.assertTrue(self.store.dirty)
+        self.store.save(self.path)
+        self.assertFalse(self.store.dirty)
+        saved, containers = MKStatusStore.load(self.path)
+        self.assertEqual(sorted([c.SerializeToString() for c in containers]), sorted([c.SerializeToString() for c in self.full.values()]))
+        status = MKStatusStore.status(self.path)
+        self.assertEqual(status.get('config.name'), 'mksim')
+        self.assertTrue(status.isStale('config'))
+
+    def test_incremental(self):
+        container = incrementalUpdate()
+        container.emc_status_config.name = 'renamed'
+        tool = container.emc_status_io.tool_table.add()
+        tool.index = 1
+        tool.diameter = 5.0
+        self.store.track('config', container)
+        self.store.track('io', container)
+        self.store.save(self.path)
+        status = MKStatusStore.status(self.path)
+        self.assertEqual(status.get('config.name'), 'renamed')
+        tools = self.store.full['io'].emc_status_io.tool_table
+        self.assertEqual(len(tools), 2)
+        self.assertEqual(tools[1].diameter, 5.0)
+        self.assertEqual(tools[1].id, 1)
+
+    def test_motion_incremental(self):
+        # incremental motion updates are not merged, see MKStatusStore.Incremental
+        self.store.dirty = False
+        container = incrementalUpdate()
+        container.emc_status_motion.actual_position.x = 5.0
+        self.store.track('motion', container)
+        self.assertFalse(self.store.dirty)
+        self.assertEqual(self.store.full['motion'].emc_status_motion.actual_position.x, 0.0)
+
+    def test_incremental_without_full(self):
+        store = MKStatusStore.MKStatusStore()
+        store.track('config', incrementalUpdate())
+        self.assertFalse(store.dirty)
+        self.assertEqual(store.full, {})
+
+    def test_invalid(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b'not a status store')
+        with self.assertRaises(ValueError):
+            MKStatusStore.load(self.path)
+
+    def test_corrupt(self):
+        self.store.save(self.path)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(data[:-1])
+        with self.assertRaises(ValueError):
+            MKStatusStore.load(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# Tests for the interned sets of updated status paths and subscriptions.
+
+import unittest
+
+from MKUpdated import MKPathRegistry, MKSubscription, MKUpdated
+
+class TestMKUpdated(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MKPathRegistry()
+        self.motion = self.registry.scope('status.motion')
+
+    def test_register(self):
+        bit = self.registry.register('status.motion.feed.rate')
+        self.assertEqual(bit, self.registry.register('status.motion.feed.rate'))
+        self.assertNotEqual(bit, self.registry.register('status.motion.feed.override'))
+        self.assertEqual(self.registry.prefix['status.motion.feed'], self.registry.prefix['status.motion.feed.rate'] | self.registry.prefix['status.motion.feed.override'])
+
+    def test_scope(self):
+        self.assertEqual(self.motion.register('feed.rate'), self.registry.register('status.motion.feed.rate'))
+        self.assertIs(self.motion, self.registry.scope('status.motion'))
+
+    def test_contains(self):
+        updated = self.motion.updated(['feed.rate', 'axis.0.homed'])
+        self.assertIn('feed.rate', updated)
+        self.assertIn('axis.0.homed', updated)
+        self.assertNotIn('feed.override', updated)
+        self.assertNotIn('never.registered', updated)
+
+    def test_any(self):
+        self.motion.register('feed.override')
+        updated = self.motion.updated(['axis.0.homed'])
+        self.assertTrue(updated.any('axis'))
+        self.assertTrue(updated.any('axis.0'))
+        self.assertFalse(updated.any('axis.1'))
+        self.assertFalse(updated.any('feed'))
+
+    def test_iter(self):
+        paths = ['feed.rate', 'axis.0.homed', 'line']
+        updated = self.motion.updated(paths)
+        self.assertEqual(sorted(updated), sorted(paths))
+        self.assertEqual(len(updated), 3)
+        self.assertTrue(updated)
+        self.assertFalse(self.motion.updated([]))
+
+    def test_or(self):
+        updated = self.motion.updated(['feed.rate']) | self.motion.updated(['line'])
+        self.assertEqual(sorted(updated), ['feed.rate', 'line'])
+
+    def test_absolute(self):
+        updated = self.motion.updated(['feed.rate']).absolute()
+        self.assertEqual(list(updated), ['status.motion.feed.rate'])
+        self.assertTrue(updated.any('status.motion'))
+
+class TestMKSubscription(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MKPathRegistry()
+        self.scope = self.registry.scope('status.motion')
+        self.values = {}
+        self.notified = []
+
+    def subscribe(self, patterns, **kwargs):
+        return MKSubscription(patterns, self.notified.append, self.registry, self.values.get, **kwargs)
+
+    def dispatch(self, subscription, paths, always=False):
+        subscription.dispatch(self.scope.updated(paths).absolute(), always)
+
+    def test_prefix(self):
+        subscription = self.subscribe(['status.motion.feed'])
+        self.dispatch(subscription, ['feed.rate', 'line'])
+        self.dispatch(subscription, ['line'])
+        self.assertEqual([list(u) for u in self.notified], [['status.motion.feed.rate']])
+
+    def test_wildcard(self):
+        subscription = self.subscribe(['status.motion.axis.*.homed'])
+        self.dispatch(subscription, ['axis.0.homed', 'axis.0.velocity'])
+        # paths registered after the subscription was resolved are matched as well
+        self.dispatch(subscription, ['axis.1.homed'])
+        self.assertEqual([list(u) for u in self.notified], [['status.motion.axis.0.homed'], ['status.motion.axis.1.homed']])
+
+    def test_always(self):
+        subscription = self.subscribe(['status.motion.feed'])
+        self.dispatch(subscription, ['line'], True)
+        self.assertEqual(len(self.notified), 1)
+        self.assertFalse(self.notified[0])
+
+    def test_deadband(self):
+        path = 'status.motion.current_vel'
+        subscription = self.subscribe([path], deadband=0.1)
+        self.values[path] = 1.0
+        self.dispatch(subscription, ['current_vel'], True)
+        self.values[path] = 1.05
+        self.dispatch(subscription, ['current_vel'])
+        self.assertEqual(len(self.notified), 1)
+        self.assertIsNone(subscription.due())
+        self.values[path] = 1.2
+        self.dispatch(subscription, ['current_vel'])
+        self.assertEqual(len(self.notified), 2)
+
+    def test_deadband_mapping(self):
+        path = 'status.motion.position.actual'
+        subscription = self.subscribe([path], deadband=0.1)
+        self.values[path] = {'x': 1.0, 'y': 2.0}
+        self.dispatch(subscription, ['position.actual'], True)
+        self.values[path] = {'x': 1.0, 'y': 2.05}
+        self.dispatch(subscription, ['position.actual'])
+        self.assertEqual(len(self.notified), 1)
+        self.values[path] = {'x': 1.0, 'y': 2.5}
+        self.dispatch(subscription, ['position.actual'])
+        self.assertEqual(len(self.notified), 2)
+
+    def test_interval(self):
+        path = 'status.motion.line'
+        subscription = self.subscribe([path], interval=3600)
+        self.values[path] = 1
+        self.dispatch(subscription, ['line'], True)
+        self.assertEqual(len(self.notified), 1)
+        self.values[path] = 2
+        self.dispatch(subscription, ['line'])
+        self.assertEqual(len(self.notified), 1)
+        self.assertEqual(subscription.due(), subscription.notified + 3600)
+        subscription.flush()
+        self.assertEqual([list(u) for u in self.notified], [[path], [path]])
+        self.assertIsNone(subscription.due())
+
+if __name__ == '__main__':
+    unittest.main()